@@ -6,9 +6,14 @@ pip install -r requirements.txt
 # make migrations
 python3 manage.py makemigrations
 python3 manage.py migrate
+python3 manage.py createcachetable # Só cria a tabela quando CACHE_BACKEND=db
 
 # collectstatic
 python3 manage.py collectstatic
 
+# Página de documentação pré-renderizada. O artefato (documentation/prerendered/) também é versionado,
+# porque o deploy na Vercel (vercel.json) não roda este script; regravá-lo aqui o mantém em dia
+python3 manage.py prerender_docs
+
 echo "Build script completed"
 
@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cyber_civics_api.settings')
+os.environ.setdefault('ASYNC_POLL_VIEWS', '1') # Voto e resultados pelas views assíncronas (polls.async_views)
 
 application = get_asgi_application()
+
+if settings.POLL_EXPIRY_SWEEP_INTERVAL:
+    # Servidores de longa duração encerram as enquetes vencidas sem depender do cron
+    from polls.expiry import start_expiry_sweeper
+    start_expiry_sweeper(settings.POLL_EXPIRY_SWEEP_INTERVAL)
+
+if settings.VOTE_WRITE_BEHIND:
+    # Descarrega o buffer de votos (e regrava o que sobrou de uma execução interrompida)
+    from polls.vote_buffer import start_vote_buffer_flusher
+    start_vote_buffer_flusher(settings.VOTE_BUFFER_FLUSH_INTERVAL)
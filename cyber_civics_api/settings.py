@@ -13,13 +13,17 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 import dj_database_url
-from dotenv import load_dotenv
-load_dotenv()
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Variáveis do .env do projeto (desenvolvimento local). No deploy as variáveis vêm do ambiente e o arquivo não
+# existe: sem ele, a partida a frio não paga o import do python-dotenv nem a busca do .env pelos diretórios.
+if (BASE_DIR / '.env').is_file():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -61,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Adicionei esta linha
+    'polls.middleware.HashTimingMiddleware', # Server-Timing com a fila e a duração dos hashes de senha
 ]
 
 ROOT_URLCONF = 'cyber_civics_api.urls'
@@ -105,6 +110,55 @@ DATABASES = {
 
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# LocMem por padrão (um cache por processo). Use CACHE_BACKEND=file ou CACHE_BACKEND=db
+# para compartilhar o cache entre processos (o backend db exige `manage.py createcachetable`).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+# Entradas por cache antes de o Django descartar as mais antigas (o padrão do Django, 300, não comporta
+# a versão e o payload de resultados de cada enquete consultada)
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '20000'))
+
+CACHES = {
+    'default': {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/cyber_civics_api_cache'),
+        },
+        'db': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', 'cyber_civics_cache'),
+        },
+    }[CACHE_BACKEND]
+}
+CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': CACHE_MAX_ENTRIES}
+
+# Tempo (em segundos) que o payload de resultados de uma versão fica em cache. Um voto troca a versão
+# só no cache do processo que o gravou: com o LocMem, os demais workers servem os resultados antigos
+# até este prazo, então o padrão é curto; com um cache compartilhado (file/db) a troca vale para
+# todos e o payload pode ficar mais tempo.
+POLL_RESULTS_CACHE_TIMEOUT = int(os.getenv('POLL_RESULTS_CACHE_TIMEOUT', '5' if CACHE_BACKEND == 'locmem' else '300'))
+
+
+# Cache de autenticação por token (polls.authentication): número máximo de tokens em memória por processo
+# e por quantos segundos cada um é reaproveitado sem consultar o banco. Logout, exclusão do token e
+# alterações no usuário invalidam a entrada no processo que as fez; nos demais, valem após o TTL.
+TOKEN_AUTH_CACHE_SIZE = int(os.getenv('TOKEN_AUTH_CACHE_SIZE', '10000'))
+TOKEN_AUTH_CACHE_TTL = float(os.getenv('TOKEN_AUTH_CACHE_TTL', '60'))
+
+
+# Login (usado pelo obtain_auth_token e pelo admin): o ModelBackend com a senha verificada no pool de hashes
+AUTHENTICATION_BACKENDS = ['polls.authentication.PooledModelBackend']
+
+# Máximo de hashes de senha simultâneos por processo (login e registro, polls.hashing). Os demais esperam
+# na fila do pool; o padrão, metade dos núcleos, deixa CPU livre para o resto da API durante um surto de logins.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', '0')) or max(1, (os.cpu_count() or 1) // 2)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -157,13 +211,83 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Configuração do Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication', # Usa autenticação por Token
+        'polls.authentication.CachedTokenAuthentication', # Autenticação por Token, com cache dos tokens em memória
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated', # Default: exige autenticação para todos os endpoints
-    ]
+    ],
+    # Paginação padrão das listagens (PollViewSet usa paginação por cursor, ver polls/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'PAGE_SIZE': 20,
 }
 
+# Contadores de votos distribuídos: com N > 1, cada voto incrementa uma de N linhas
+# de contador por opção (escolhida ao acaso) em vez da própria linha da opção, evitando
+# que enquetes muito disputadas serializem todas as transações de voto num único lock.
+# As fatias são consolidadas periodicamente com `manage.py compact_vote_shards`.
+VOTE_COUNTER_SHARDS = int(os.getenv('VOTE_COUNTER_SHARDS', '0'))
+
+# Listagem e detalhe de enquetes serializados direto de linhas de .values() (polls.serializers.PollValuesSerializer),
+# sem instanciar modelos/serializers por objeto. A saída é a mesma do PollSerializer; use 0 para desligar.
+FAST_POLL_READS = os.getenv('FAST_POLL_READS', '1') == '1'
+
+# Tamanho do lote da ingestão em massa de votos (POST /api/votes/bulk/ e `manage.py ingest_votes`):
+# cada lote é validado com poucas consultas por conjunto e gravado com um único bulk_create.
+BULK_VOTE_CHUNK_SIZE = int(os.getenv('BULK_VOTE_CHUNK_SIZE', '1000'))
+
+# Cadastro em massa de eleitores (POST /api/users/bulk/ e `manage.py import_voters`): registros por lote
+# (um bulk_create de usuários e um de tokens cada) e processos que calculam os hashes das senhas
+# (0 = um por núcleo).
+VOTER_IMPORT_CHUNK_SIZE = int(os.getenv('VOTER_IMPORT_CHUNK_SIZE', '1000'))
+VOTER_IMPORT_WORKERS = int(os.getenv('VOTER_IMPORT_WORKERS', '0'))
+
+# Gravação adiada dos votos (polls.vote_buffer): o voto é validado, guardado num buffer SQLite local e
+# confirmado com 202; uma thread de cada processo do servidor o grava no banco em lotes de
+# BULK_VOTE_CHUNK_SIZE a cada VOTE_BUFFER_FLUSH_INTERVAL segundos. Todos os processos de uma máquina
+# devem usar o mesmo VOTE_BUFFER_PATH, num disco local que sobreviva a reinícios.
+VOTE_WRITE_BEHIND = os.getenv('VOTE_WRITE_BEHIND', '0') == '1'
+VOTE_BUFFER_PATH = os.getenv('VOTE_BUFFER_PATH', str(BASE_DIR / 'vote_buffer.sqlite3'))
+VOTE_BUFFER_FLUSH_INTERVAL = float(os.getenv('VOTE_BUFFER_FLUSH_INTERVAL', '0.5'))
+
+# Número máximo de pares (usuário, enquete) no índice em memória de quem já votou (polls.voted_index),
+# por processo: novas tentativas de voto e GET /api/polls/<id>/my-vote/ são respondidas sem ir ao banco.
+VOTED_INDEX_SIZE = int(os.getenv('VOTED_INDEX_SIZE', '100000'))
+# Segundos que uma entrada do índice vale: um voto excluído em outro processo continua contando como
+# "já votou" neste processo por no máximo esse tempo.
+VOTED_INDEX_TTL = float(os.getenv('VOTED_INDEX_TTL', '60'))
+
+# Listas do admin (votos, enquetes, opções): acima deste número estimado de linhas o total da paginação
+# é a estimativa do banco (polls.pagination.EstimatedCountPaginator) em vez de um COUNT(*) da tabela.
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', '10000'))
+
+# Por quanto tempo (em segundos) o cliente pode reutilizar os resultados de uma enquete encerrada
+# (servidos do snapshot congelado) sem revalidar. Reabrir a enquete só é visto após esse prazo.
+POLL_SNAPSHOT_MAX_AGE = int(os.getenv('POLL_SNAPSHOT_MAX_AGE', '86400'))
+
+# Intervalo (em segundos) da varredura que encerra as enquetes com prazo vencido numa thread do próprio
+# servidor (iniciada em wsgi.py/asgi.py). 0 desliga: nesse caso agende `manage.py close_expired_polls` no cron.
+# Cada processo do servidor roda a sua varredura; rodar várias ao mesmo tempo é seguro.
+POLL_EXPIRY_SWEEP_INTERVAL = int(os.getenv('POLL_EXPIRY_SWEEP_INTERVAL', '0'))
+
+# Atende voto e resultados das enquetes com as views assíncronas (polls.async_views) em vez das actions
+# do DRF. O asgi.py liga por padrão; sob WSGI as views síncronas continuam sendo as mais eficientes.
+ASYNC_POLL_VIEWS = os.getenv('ASYNC_POLL_VIEWS', '0') == '1'
+
+# Resultados ao vivo (GET /api/polls/<id>/results/stream/, somente sob ASGI). O broker diz se os
+# resultados de uma enquete mudaram: 'polls.live.LocalBroker' (no próprio processo) ou
+# 'polls.live.CacheBroker' (pelo cache do Django; compartilhado entre workers com CACHE_BACKEND=file/db).
+LIVE_RESULTS_BROKER = os.getenv('LIVE_RESULTS_BROKER', 'polls.live.LocalBroker')
+# Intervalo (em segundos) entre as verificações de cada enquete transmitida
+LIVE_RESULTS_TICK = float(os.getenv('LIVE_RESULTS_TICK', '1'))
+# Intervalo máximo (em segundos) sem eventos antes de enviar um comentário de keepalive
+LIVE_RESULTS_KEEPALIVE = float(os.getenv('LIVE_RESULTS_KEEPALIVE', '15'))
+
+# Página de documentação da raiz, pré-renderizada pelo `manage.py prerender_docs` (build.sh) neste diretório
+# (documentation.prerender). Por quanto tempo (em segundos) navegadores e CDNs podem reutilizá-la sem
+# revalidar; a URL não muda entre deploys, então uma nova versão só é vista após esse prazo.
+DOCUMENTATION_PRERENDER_DIR = Path(os.getenv('DOCUMENTATION_PRERENDER_DIR', BASE_DIR / 'documentation' / 'prerendered'))
+DOCUMENTATION_CACHE_MAX_AGE = int(os.getenv('DOCUMENTATION_CACHE_MAX_AGE', '86400'))
+
 CORS_ALLOW_ALL_ORIGINS = True
 # CORS_ALLOWED_ORIGINS = [
 #     # "http://localhost:3000", # Exemplo para React dev server padrão
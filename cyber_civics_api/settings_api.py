@@ -0,0 +1,43 @@
+"""
+Settings enxutas para instâncias que só atendem a API (ex.: as funções serverless da Vercel).
+
+Use com ``DJANGO_SETTINGS_MODULE=cyber_civics_api.settings_api``. Partem das
+settings completas e desligam o que a API com autenticação por token não usa,
+para que cada partida a frio importe e inicialize menos: o admin, sessões,
+mensagens, arquivos estáticos (whitenoise), templates (e com eles a API
+navegável do DRF, que passa a responder só JSON) e a página de documentação.
+``/admin/`` e ``/`` não existem neste perfil; sirva-os com as settings completas.
+
+Compare as duas com ``manage.py bench_cold_start --settings-module
+cyber_civics_api.settings cyber_civics_api.settings_api``.
+"""
+from .settings import * # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+_DISABLED_APPS = {
+    'whitenoise.runserver_nostatic',
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'documentation',
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in _DISABLED_APPS]
+
+# Sem sessões não há usuário de sessão (AuthenticationMiddleware) nem CSRF a verificar: as views da API
+# autenticam por token e são isentas de CSRF
+_DISABLED_MIDDLEWARE = {
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+}
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in _DISABLED_MIDDLEWARE]
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'], # A API navegável exige templates
+}
@@ -13,13 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token # View para obter token
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('polls.urls')), # Inclui as URLs da sua aplicação polls
     path('api/auth/login/', obtain_auth_token, name='api_token_auth'), # Endpoint para login e obter token
-    path('', include('documentation.urls')), # Link para a Documentação
-]
\ No newline at end of file
+]
+
+# O admin e a documentação ficam de fora nas settings só da API (cyber_civics_api.settings_api)
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+if apps.is_installed('documentation'):
+    urlpatterns.append(path('', include('documentation.urls'))) # Link para a Documentação
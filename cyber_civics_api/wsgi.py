@@ -9,10 +9,21 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cyber_civics_api.settings')
 
 application = get_wsgi_application()
 
+if settings.POLL_EXPIRY_SWEEP_INTERVAL:
+    # Servidores de longa duração encerram as enquetes vencidas sem depender do cron
+    from polls.expiry import start_expiry_sweeper
+    start_expiry_sweeper(settings.POLL_EXPIRY_SWEEP_INTERVAL)
+
+if settings.VOTE_WRITE_BEHIND:
+    # Descarrega o buffer de votos (e regrava o que sobrou de uma execução interrompida)
+    from polls.vote_buffer import start_vote_buffer_flusher
+    start_vote_buffer_flusher(settings.VOTE_BUFFER_FLUSH_INTERVAL)
+
 app = application
\ No newline at end of file
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from documentation.prerender import build
+
+class Command(BaseCommand):
+    help = (
+        'Renders the documentation page once and writes it, with gzip (and brotli, when installed) variants, '
+        'to DOCUMENTATION_PRERENDER_DIR. Run it after collectstatic so the page links to the hashed static files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Directory to write to (default: DOCUMENTATION_PRERENDER_DIR).')
+
+    def handle(self, *args, **options):
+        page = build(options['output'])
+        sizes = ', '.join(f'{encoding} {len(body)} bytes' for encoding, body in sorted(page.variants.items()))
+        self.stdout.write(self.style.SUCCESS(f'Prerendered documentation page ({sizes}).'))
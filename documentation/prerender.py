@@ -0,0 +1,150 @@
+"""
+Página de documentação pré-renderizada.
+
+A página da raiz (``documentation/index.html``, ~100 KB) não depende da
+requisição: ``manage.py prerender_docs`` (rodado pelo build.sh, depois do
+``collectstatic``, para que as URLs dos estáticos já sejam as do manifesto) a
+renderiza uma vez e grava em ``DOCUMENTATION_PRERENDER_DIR`` o HTML, as
+variantes comprimidas (gzip e, com o pacote ``brotli`` instalado, brotli) e um
+``index.json`` com o hash do conteúdo e o do template de origem.
+
+A view serve esses bytes prontos, sem renderizar template: cada processo lê os
+arquivos na primeira requisição. Se o artefato não existe ou foi gerado a partir
+de outra versão do template, a página é renderizada em memória uma vez por
+processo (com um aviso no log) até o próximo ``prerender_docs``. Com ``DEBUG`` a
+data de modificação do template é verificada a cada requisição, e uma edição
+aparece no recarregamento seguinte.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+
+try:
+    import brotli
+except ImportError: # Opcional: sem ele, só as variantes gzip e sem compressão
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME = 'documentation/index.html'
+IDENTITY = 'identity'
+
+
+class PrerenderedPage:
+    """O HTML da página em cada codificação, com o ETag de cada variante."""
+
+    def __init__(self, variants, template_digest, template_mtime):
+        self.variants = variants # codificação -> bytes
+        self.template_digest = template_digest
+        self.template_mtime = template_mtime
+        digest = hashlib.sha256(variants[IDENTITY]).hexdigest()[:32]
+        # Um ETag por variante (como o mod_deflate do Apache): bytes diferentes, validadores diferentes
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == IDENTITY else f'"{digest}-{encoding}"'
+            for encoding in variants
+        }
+
+    def negotiate(self, accept_encoding):
+        """A melhor codificação disponível entre as aceitas pelo cliente (brotli, gzip ou nenhuma)."""
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return IDENTITY
+
+
+def _accepted_encodings(accept_encoding):
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _template_source():
+    path = Path(get_template(TEMPLATE_NAME).origin.name)
+    return path, path.read_bytes()
+
+
+def _render():
+    path, source = _template_source()
+    html = render_to_string(TEMPLATE_NAME).encode()
+    variants = {IDENTITY: html, 'gzip': gzip.compress(html, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(html, mode=brotli.MODE_TEXT)
+    return PrerenderedPage(variants, hashlib.sha256(source).hexdigest(), os.path.getmtime(path))
+
+
+_SUFFIXES = {IDENTITY: '', 'gzip': '.gz', 'br': '.br'}
+
+
+def build(directory=None):
+    """Renderiza a página e grava o HTML, as variantes comprimidas e o ``index.json``. Retorna a página."""
+    directory = Path(directory or settings.DOCUMENTATION_PRERENDER_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    page = _render()
+    for encoding, body in page.variants.items():
+        (directory / f'index.html{_SUFFIXES[encoding]}').write_bytes(body)
+    (directory / 'index.json').write_text(json.dumps({
+        'encodings': sorted(page.variants),
+        'template_digest': page.template_digest,
+    }))
+    return page
+
+
+def load(directory=None):
+    """
+    A página gravada por ``build``; renderizada em memória se o artefato não existe ou se o
+    template mudou desde que ele foi gerado.
+    """
+    directory = Path(directory or settings.DOCUMENTATION_PRERENDER_DIR)
+    path, source = _template_source()
+    template_digest = hashlib.sha256(source).hexdigest()
+    try:
+        meta = json.loads((directory / 'index.json').read_text())
+        if meta['template_digest'] == template_digest:
+            variants = {
+                encoding: (directory / f'index.html{_SUFFIXES[encoding]}').read_bytes()
+                for encoding in meta['encodings']
+            }
+            return PrerenderedPage(variants, template_digest, os.path.getmtime(path))
+        logger.warning('Prerendered documentation in %s is stale; rendering it in memory. Run manage.py prerender_docs.', directory)
+    except FileNotFoundError:
+        logger.warning('Prerendered documentation not found in %s; rendering it in memory. Run manage.py prerender_docs.', directory)
+    return _render()
+
+
+_page = None
+_page_lock = threading.Lock()
+
+
+def get_page():
+    """A página do processo, carregada na primeira chamada (e recarregada se o template mudar, com DEBUG)."""
+    global _page
+    with _page_lock:
+        if _page is not None and settings.DEBUG:
+            path, _source = _template_source()
+            if os.path.getmtime(path) != _page.template_mtime:
+                _page = None
+        if _page is None:
+            _page = load()
+        return _page
+
+
+def clear_page_cache():
+    global _page
+    with _page_lock:
+        _page = None
@@ -1,3 +1,92 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .prerender import brotli, build, clear_page_cache
+
+
+class PrerenderedDocumentationTestCase(TestCase):
+    """Página de documentação servida do artefato do prerender_docs."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(DOCUMENTATION_PRERENDER_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        clear_page_cache()
+        self.addCleanup(clear_page_cache)
+
+    def test_serves_prerendered_variants_without_rendering(self):
+        out = StringIO()
+        call_command('prerender_docs', stdout=out)
+        self.assertIn('Prerendered documentation page', out.getvalue())
+        html = (self.directory / 'index.html').read_bytes()
+
+        response = self.client.get(reverse('index'), headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.templates, []) # Nenhum template renderizado na requisição
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), html)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=86400', response['Cache-Control'])
+
+        plain = self.client.get(reverse('index'))
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain.content, html)
+        self.assertNotEqual(plain['ETag'], response['ETag']) # Um validador por variante
+        refused = self.client.get(reverse('index'), headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', refused)
+
+        response = self.client.get(reverse('index'), headers={'If-None-Match': plain['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], plain['ETag'])
+        self.assertEqual(self.client.post(reverse('index')).status_code, 405)
+
+    @skipIf(brotli is None, 'brotli não instalado (requirements.txt)')
+    def test_serves_brotli_variant(self):
+        call_command('prerender_docs', stdout=StringIO())
+        response = self.client.get(reverse('index'), headers={'Accept-Encoding': 'gzip, deflate, br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), (self.directory / 'index.html').read_bytes())
+
+    def test_stale_or_missing_artifact_is_rendered_once(self):
+        with self.assertLogs('documentation.prerender', 'WARNING'):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.client.get(reverse('index'))['ETag'])
+
+        call_command('prerender_docs', stdout=StringIO())
+        meta = json.loads((self.directory / 'index.json').read_text())
+        meta['template_digest'] = 'versao-antiga-do-template'
+        (self.directory / 'index.json').write_text(json.dumps(meta))
+        clear_page_cache()
+        with self.assertLogs('documentation.prerender', 'WARNING') as logs:
+            response = self.client.get(reverse('index'))
+        self.assertIn('stale', logs.output[0])
+        self.assertEqual(response.content, (self.directory / 'index.html').read_bytes())
+
+
+class CommittedPrerenderTestCase(TestCase):
+    """O artefato versionado em documentation/prerendered/, o que o deploy na Vercel serve."""
+
+    def test_committed_artifact_is_up_to_date(self):
+        # A Vercel (vercel.json) não roda o build.sh: se o template mudar, rode prerender_docs e versione o resultado
+        committed = Path(settings.DOCUMENTATION_PRERENDER_DIR)
+        with tempfile.TemporaryDirectory() as directory:
+            build(directory)
+            for name in ('index.json', 'index.html', 'index.html.gz'):
+                self.assertEqual(
+                    (committed / name).read_bytes(), (Path(directory) / name).read_bytes(),
+                    f'{committed / name} está desatualizado: rode `python manage.py prerender_docs`.',
+                )
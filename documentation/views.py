@@ -1,9 +1,28 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
 
-# Create your views here.
+from .prerender import IDENTITY, get_page
 
+
+@require_safe
 def index(request):
     """
     View para servir a página de documentação da API na raiz do site.
+
+    Serve o HTML pré-renderizado (documentation.prerender), comprimido conforme o
+    Accept-Encoding do cliente, sem renderizar o template a cada requisição.
     """
-    return render(request, 'documentation/index.html')
\ No newline at end of file
+    page = get_page()
+    encoding = page.negotiate(request.headers.get('Accept-Encoding', ''))
+    etag = page.etags[encoding]
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(page.variants[encoding], content_type='text/html; charset=utf-8')
+        if encoding != IDENTITY:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.DOCUMENTATION_CACHE_MAX_AGE)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
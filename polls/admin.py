@@ -1,11 +1,57 @@
 from django.contrib import admin
 from .models import Poll, Choice, Vote
+from .counters import decrement_vote_counts, increment_vote_count
+from .pagination import EstimatedCountPaginator
+from .caching import bump_results_version
+from .snapshots import refresh_results_snapshots
+from .voted_index import voted_index
+
+
+class ResultsCacheAdminMixin:
+    """
+    Invalida o cache de resultados das enquetes afetadas por alterações feitas no admin
+    e mantém em dia os snapshots dos resultados finais (polls.snapshots).
+    """
+    results_poll_field = 'poll' # FK para a enquete (None quando o próprio objeto é a enquete)
+
+    def _results_poll_id(self, obj):
+        if self.results_poll_field is None:
+            return obj.pk
+        return getattr(obj, f'{self.results_poll_field}_id')
+
+    def save_model(self, request, obj, form, change):
+        poll_ids = {form.initial.get(self.results_poll_field)} if change and self.results_poll_field else set()
+        super().save_model(request, obj, form, change)
+        poll_ids.add(self._results_poll_id(obj))
+        for poll_id in poll_ids - {None}:
+            bump_results_version(poll_id)
+        refresh_results_snapshots(poll_ids)
+
+    def delete_model(self, request, obj):
+        poll_id = self._results_poll_id(obj)
+        bump_results_version(poll_id)
+        super().delete_model(request, obj)
+        refresh_results_snapshots([poll_id])
+
+    def delete_queryset(self, request, queryset):
+        poll_ids = set(queryset.values_list(self.results_poll_field or 'pk', flat=True))
+        for poll_id in poll_ids:
+            bump_results_version(poll_id)
+        super().delete_queryset(request, queryset)
+        refresh_results_snapshots(poll_ids)
+
 
 @admin.register(Poll)
-class PollAdmin(admin.ModelAdmin):
+class PollAdmin(ResultsCacheAdminMixin, admin.ModelAdmin):
+    results_poll_field = None
     list_display = ('title', 'created_by', 'created_at', 'deadline', 'is_active', 'is_proposal')
-    list_filter = ('is_active', 'is_proposal', 'created_at', 'deadline')
+    list_select_related = ('created_by',) # O criador vem no mesmo SELECT da página
+    list_filter = ('is_active', 'is_proposal', 'deadline')
+    date_hierarchy = 'created_at' # Navegação por data sobre o índice (created_at, id)
     search_fields = ('title', 'description')
+    autocomplete_fields = ('created_by',) # Busca o usuário em vez de listar todos num <select> (só superusuários)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False # Sem um segundo COUNT(*) da tabela inteira ao filtrar
     readonly_fields = ('created_at',) # created_at não deve ser editável manualmente
     # Permite que admins editem tudo via admin, incluindo is_active e deadline
     fields = ('title', 'description', 'created_by', 'deadline', 'is_active', 'is_proposal', 'created_at')
@@ -16,6 +62,12 @@ class PollAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs
 
+    def get_autocomplete_fields(self, request):
+        # A busca do autocomplete consulta todos os usuários, ignorando o queryset restrito abaixo
+        if not request.user.is_superuser:
+            return ()
+        return super().get_autocomplete_fields(request)
+
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         # No admin, o campo created_by para Polls criados por admins pode ser selecionado (embora setado automaticamente na API)
         if db_field.name == "created_by" and not request.user.is_superuser:
@@ -25,15 +77,57 @@ class PollAdmin(admin.ModelAdmin):
 
 
 @admin.register(Choice)
-class ChoiceAdmin(admin.ModelAdmin):
+class ChoiceAdmin(ResultsCacheAdminMixin, admin.ModelAdmin):
     list_display = ('choice_text', 'poll')
-    list_filter = ('poll',)
+    list_select_related = ('poll',)
     search_fields = ('choice_text',)
+    autocomplete_fields = ('poll',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Vote)
-class VoteAdmin(admin.ModelAdmin):
-    list_display = ('user', 'poll', 'choice', 'voted_at')
-    list_filter = ('user', 'poll', 'voted_at')
-    search_fields = ('user__username', 'poll__title', 'choice__choice_text')
-    readonly_fields = ('voted_at',) # voted_at não deve ser editável manualmente
\ No newline at end of file
+class VoteAdmin(ResultsCacheAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'poll', 'choice_text', 'voted_at')
+    list_select_related = ('user', 'poll', 'choice') # Sem uma consulta por FK em cada linha
+    # Sem filtros por usuário/enquete (listariam todos na barra lateral): a busca pelo username exato
+    # e os links "?poll__id__exact=" / "?user__id__exact=" usam os índices de Vote
+    date_hierarchy = 'voted_at' # Sobre o índice polls_vote_voted_at_idx
+    search_fields = ('=user__username',)
+    autocomplete_fields = ('user', 'poll', 'choice')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = ('voted_at',) # voted_at não deve ser editável manualmente
+
+    @admin.display(description='choice')
+    def choice_text(self, obj):
+        # str(choice) inclui o título da enquete, que viria de uma consulta por linha
+        return obj.choice.choice_text
+
+    def lookup_allowed(self, lookup, value, request):
+        # Filtra a lista pela enquete ou pelo usuário via URL, sem enumerá-los em list_filter
+        return lookup in ('poll__id__exact', 'user__id__exact') or super().lookup_allowed(lookup, value, request)
+
+    # Os contadores são ajustados antes de super(), para que o snapshot regravado pelo mixin já os inclua
+
+    def save_model(self, request, obj, form, change):
+        # Mantém o contador desnormalizado das opções em sincronia com votos criados/alterados no admin
+        previous_choice_id = form.initial.get('choice') if change else None
+        if previous_choice_id != obj.choice_id:
+            if previous_choice_id is not None:
+                increment_vote_count(previous_choice_id, -1)
+            increment_vote_count(obj.choice_id)
+        super().save_model(request, obj, form, change)
+        voted_index.forget_polls({form.initial.get('poll'), obj.poll_id} - {None})
+
+    def delete_model(self, request, obj):
+        # Mantém o contador desnormalizado da opção em sincronia com a exclusão
+        increment_vote_count(obj.choice_id, -1)
+        super().delete_model(request, obj)
+        voted_index.forget_polls([obj.poll_id])
+
+    def delete_queryset(self, request, queryset):
+        decrement_vote_counts(queryset)
+        poll_ids = set(queryset.values_list('poll_id', flat=True))
+        super().delete_queryset(request, queryset)
+        voted_index.forget_polls(poll_ids)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        # Registra os receptores de sinais em todo processo (servidor, shell, comandos), não só
+        # quando as views são importadas
+        from . import signals, voted_index # noqa: F401
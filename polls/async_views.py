@@ -0,0 +1,238 @@
+"""
+Views assíncronas, servidas sob ASGI (cyber_civics_api.asgi).
+
+O DRF não tem views assíncronas: estas são views do Django, com a mesma
+autenticação por token (cabeçalho ``Authorization: Token <chave>``) e o mesmo
+cache de tokens (polls.authentication) das views do DRF. Com
+``ASYNC_POLL_VIEWS`` (ligado pelo asgi.py) as variantes assíncronas de voto e
+resultados atendem as mesmas URLs das actions do PollViewSet, com as mesmas
+respostas, e login e registro aguardam o hash da senha no pool de hashes
+(polls.hashing) sem prender o event loop.
+
+Só os métodos do caminho quente são reimplementados: um ``OPTIONS`` é atendido
+pela própria view equivalente do DRF, com os metadados que ela sempre respondeu.
+
+Consultas isoladas usam o ORM assíncrono; passos com várias consultas (gravar
+o voto e o contador numa transação, buscar a enquete e os contadores numa falta
+do cache) rodam num único ``sync_to_async`` — o ORM assíncrono do Django também
+delega cada consulta a uma thread, e cada troca de thread tem seu custo.
+"""
+import json
+from functools import cache
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import serializers
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import aauthenticate_credentials
+from .caching import not_modified_response, set_validators
+from .hashing import ahash_password
+from .models import Poll
+from .serializers import LoginSerializer, UserRegistrationSerializer, VoteSerializer
+from .snapshots import cached_poll_results
+
+
+async def authenticate_token(request):
+    """
+    Retorna o usuário dono do token enviado no cabeçalho Authorization, ou None sem
+    credenciais. Credenciais inválidas levantam ``AuthenticationFailed`` com as mesmas
+    mensagens do ``TokenAuthentication`` do DRF.
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b'token':
+        return None
+    if len(auth) == 1:
+        raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+    if len(auth) > 2:
+        raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+    user, _token = await aauthenticate_credentials(key)
+    return user
+
+
+async def _authenticate(request):
+    # (usuário, None) ou (None, resposta 401), com o mesmo corpo que o DRF responderia
+    try:
+        user = await authenticate_token(request)
+    except AuthenticationFailed as exc:
+        return None, _not_authenticated(exc.detail)
+    if user is None:
+        return None, _not_authenticated()
+    return user, None
+
+
+def _json_response(data, status=200):
+    # Mesmo renderizador do DRF: o corpo é idêntico ao das views síncronas
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _not_authenticated(detail='Authentication credentials were not provided.'):
+    response = _json_response({'detail': detail}, status=401)
+    response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def _method_not_allowed(request):
+    return _json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+
+@cache
+def _drf_view(name):
+    # Importadas sob demanda: só um OPTIONS precisa delas
+    from rest_framework.authtoken.views import obtain_auth_token
+
+    from .views import PollViewSet, UserRegistrationView
+
+    if name == 'login':
+        return obtain_auth_token
+    if name == 'register':
+        return UserRegistrationView.as_view()
+    # Como o router do DRF monta a view de uma action de detalhe
+    action = getattr(PollViewSet, name)
+    return PollViewSet.as_view(action.mapping, detail=True, basename='poll', **action.kwargs)
+
+
+async def _drf_options(request, name, **kwargs):
+    """Responde um OPTIONS pela view do DRF equivalente (``name``), com os metadados dela."""
+    def respond():
+        return _drf_view(name)(request, **kwargs).render() # Já renderizada, como as demais respostas daqui
+
+    return await sync_to_async(respond)()
+
+
+def _request_data(request):
+    # JSON ou formulário, como os parsers padrão do DRF
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST.dict()
+
+
+@csrf_exempt
+async def login(request):
+    """Variante assíncrona de ``obtain_auth_token`` (POST /api/auth/login/): ``{"token": <chave>}``."""
+    if request.method == 'OPTIONS':
+        return await _drf_options(request, 'login')
+    if request.method != 'POST':
+        return _method_not_allowed(request)
+    try:
+        data = _request_data(request)
+    except ValueError as exc:
+        return _json_response({'detail': f'JSON parse error - {exc}'}, status=400)
+
+    serializer = LoginSerializer(data=data)
+    if not serializer.is_valid():
+        return _json_response(serializer.errors, status=400)
+    # PooledModelBackend: a senha é verificada no pool de hashes enquanto o loop atende outras requisições
+    user = await aauthenticate(request, **serializer.validated_data)
+    if user is None:
+        return _json_response({'non_field_errors': ['Unable to log in with provided credentials.']}, status=400)
+    token, _created = await Token.objects.aget_or_create(user=user)
+    return _json_response({'token': token.key})
+
+
+@csrf_exempt
+async def register(request):
+    """Variante assíncrona de ``UserRegistrationView`` (POST /api/auth/register/)."""
+    if request.method == 'OPTIONS':
+        return await _drf_options(request, 'register')
+    if request.method != 'POST':
+        return _method_not_allowed(request)
+    try:
+        data = _request_data(request)
+    except ValueError as exc:
+        return _json_response({'detail': f'JSON parse error - {exc}'}, status=400)
+
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)(): # Consulta a unicidade do username
+        return _json_response(serializer.errors, status=400)
+    password_hash = await ahash_password(serializer.validated_data['password'])
+    await sync_to_async(serializer.save)(password_hash=password_hash)
+    return _json_response(serializer.data, status=201)
+
+
+@csrf_exempt # Autenticação só por token, como nas views do DRF
+async def poll_vote(request, pk):
+    """Variante assíncrona de ``PollViewSet.vote``."""
+    if request.method == 'OPTIONS':
+        return await _drf_options(request, 'vote', pk=pk)
+    if request.method != 'POST':
+        return _method_not_allowed(request)
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    try:
+        data = _request_data(request)
+    except ValueError as exc:
+        return _json_response({'detail': f'JSON parse error - {exc}'}, status=400)
+
+    serializer = VoteSerializer(data=data, context={'request': SimpleNamespace(user=user), 'poll_id': pk})
+    if not serializer.is_valid(): # Só valida o formato: nenhuma consulta ao banco
+        return _json_response(serializer.errors, status=400)
+    try:
+        if settings.VOTE_WRITE_BEHIND:
+            # Uma leitura e o buffer local (importado só com o write-behind ligado)
+            from .vote_buffer import enqueue_vote
+            vote = await sync_to_async(enqueue_vote)(user, pk, serializer.validated_data['choice_id'])
+            return _json_response({'status': 'queued', 'vote': VoteSerializer(vote).data}, status=202)
+        # INSERT ... SELECT, contador e invalidação do cache numa só transação
+        await sync_to_async(serializer.save)()
+    except serializers.ValidationError as exc:
+        return _json_response(exc.detail, status=400)
+    except Http404 as exc:
+        return _json_response({'detail': str(exc)}, status=404)
+    return _json_response({'status': 'voted', 'vote': serializer.data}, status=201)
+
+
+async def poll_results(request, pk):
+    """Variante assíncrona de ``PollViewSet.results``."""
+    if request.method == 'OPTIONS':
+        return await _drf_options(request, 'results', pk=pk)
+    if request.method not in ('GET', 'HEAD'):
+        return _method_not_allowed(request)
+    _user, error = await _authenticate(request)
+    if error is not None:
+        return error
+
+    # Cache, e numa falta a enquete e os contadores, numa única troca de thread
+    etag, payload = await sync_to_async(cached_poll_results)(pk)
+    if payload is None:
+        return _json_response({'detail': 'No Poll matches the given query.'}, status=404)
+
+    max_age = None if payload['is_active'] else settings.POLL_SNAPSHOT_MAX_AGE
+    not_modified = not_modified_response(request, etag, max_age=max_age)
+    if not_modified is not None:
+        return not_modified
+    return set_validators(_json_response(payload), etag, max_age=max_age)
+
+
+async def poll_results_stream(request, pk):
+    """Stream SSE dos resultados de uma enquete: os resultados completos e depois só o que mudar."""
+    if not isinstance(request, ASGIRequest):
+        # Sob WSGI o stream infinito seria acumulado em memória em vez de enviado
+        return _json_response({'detail': 'O stream de resultados exige o servidor ASGI (cyber_civics_api.asgi).'}, status=501)
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    _user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    if not await Poll.objects.filter(pk=pk).aexists():
+        return _json_response({'detail': 'No Poll matches the given query.'}, status=404)
+
+    from .live import stream_results # Só sob ASGI: as instâncias WSGI nunca importam o broker
+    response = StreamingHttpResponse(stream_results(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Impede que o nginx acumule os eventos
+    return response
@@ -0,0 +1,200 @@
+"""
+Autenticação por token com cache em memória.
+
+``CachedTokenAuthentication`` substitui o ``TokenAuthentication`` do DRF em
+``DEFAULT_AUTHENTICATION_CLASSES``: a consulta ``Token`` + ``User`` de cada
+requisição autenticada passa a ser feita uma vez por token a cada
+``TOKEN_AUTH_CACHE_TTL`` segundos. O cache é do próprio processo, limitado a
+``TOKEN_AUTH_CACHE_SIZE`` tokens (os menos usados saem primeiro).
+
+Entradas são descartadas quando o token é excluído (logout, rotação) e quando
+o usuário é salvo ou excluído (desativação, mudança de ``is_staff``). Os sinais
+só chegam ao processo que fez a alteração: nos demais workers, e para alterações
+feitas com ``QuerySet.update``, o TTL é o atraso máximo.
+
+``PooledModelBackend`` é o backend de login (``AUTHENTICATION_BACKENDS``): o
+``ModelBackend`` do Django com a verificação da senha no pool de hashes
+(polls.hashing).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .hashing import ahash_password, averify_password, hash_password, verify_password
+
+
+class TokenCache:
+    """Cache LRU com TTL de ``chave do token -> (usuário, token)``, seguro entre threads."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict() # chave -> (expira_em, usuário, token)
+        self._keys_by_user = {} # id do usuário -> chaves em cache
+        self._generation = 0 # Muda a cada invalidação (ver ``set``)
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user, token = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+        # Cópias: atributos atribuídos a request.user não vazam para outras requisições
+        return copy.copy(user), copy.copy(token)
+
+    def set(self, key, user, token, generation):
+        """
+        Guarda o resultado de uma consulta iniciada na geração ``generation``. Se houve uma
+        invalidação no meio tempo, o resultado pode estar desatualizado e é descartado.
+        """
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, user, token)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, key):
+        with self._lock:
+            self._generation += 1
+            self._remove(key)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            self._generation += 1
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            user_id = entry[1].pk
+            keys = self._keys_by_user.get(user_id)
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+token_cache = TokenCache(settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TTL)
+
+
+def _on_token_deleted(sender, instance, **kwargs):
+    token_cache.discard(instance.key)
+
+
+def _on_user_changed(sender, instance, **kwargs):
+    token_cache.discard_user(instance.pk)
+
+
+# post_save do Token também: um token recriado com a mesma chave não reaproveita a entrada antiga
+post_save.connect(_on_token_deleted, sender=Token, dispatch_uid='polls.authentication.token_saved')
+post_delete.connect(_on_token_deleted, sender=Token, dispatch_uid='polls.authentication.token_deleted')
+post_save.connect(_on_user_changed, sender=User, dispatch_uid='polls.authentication.user_saved')
+post_delete.connect(_on_user_changed, sender=User, dispatch_uid='polls.authentication.user_deleted')
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` que consulta o banco só quando o token não está em ``token_cache``."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        generation = token_cache.generation
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, generation)
+        return user, token
+
+
+async def aauthenticate_credentials(key):
+    """
+    Variante assíncrona de ``CachedTokenAuthentication.authenticate_credentials`` para as
+    views assíncronas: retorna ``(usuário, token)`` ou levanta ``AuthenticationFailed``.
+    """
+    cached = token_cache.get(key)
+    if cached is not None:
+        return cached
+    generation = token_cache.generation
+    token = await Token.objects.select_related('user').filter(key=key).afirst()
+    if token is None:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    token_cache.set(key, token.user, token, generation)
+    return token.user, token
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` que verifica a senha em ``verify_password`` em vez de ``User.check_password``.
+    Mesmo comportamento: um hash descartável para usernames inexistentes (o tempo de resposta não
+    revela quem tem conta) e o hash refeito quando ``PASSWORD_HASHERS`` mudou.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            hash_password(password)
+            return None
+        valid, must_update = verify_password(password, user.password)
+        if not valid:
+            return None
+        if must_update:
+            user.password = hash_password(password)
+            user.save(update_fields=['password'])
+        return user if self.user_can_authenticate(user) else None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await User._default_manager.aget_by_natural_key(username)
+        except User.DoesNotExist:
+            await ahash_password(password)
+            return None
+        valid, must_update = await averify_password(password, user.password)
+        if not valid:
+            return None
+        if must_update:
+            user.password = await ahash_password(password)
+            await user.asave(update_fields=['password'])
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,67 @@
+"""
+Utilitários compartilhados pelos comandos de benchmark (``manage.py bench_*``).
+
+Os benchmarks criam dados em massa, então rodam sempre em um banco de testes
+descartável, criado e destruído da mesma forma que o test runner do Django faz.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+
+
+@contextmanager
+def throwaway_database(test_name=None):
+    """
+    Troca a conexão padrão por um banco de testes recém-migrado e o destrói ao final.
+
+    ``test_name`` substitui o nome do banco de testes — por exemplo, um arquivo no
+    lugar do SQLite em memória, para que várias threads possam escrever nele.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if test_name is not None:
+        test_settings['NAME'] = test_name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+
+
+@contextmanager
+def simulated_db_latency(seconds):
+    """Acrescenta ``seconds`` de espera a cada consulta, em todas as conexões, como a latência de rede até o banco."""
+    def delayed(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delayed)
+
+    if not seconds:
+        yield
+        return
+    connection.execute_wrappers.append(delayed)
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for conn in connections.all(initialized_only=True):
+            if delayed in conn.execute_wrappers:
+                conn.execute_wrappers.remove(delayed)
+
+
+def best_of(repeat, func):
+    """Executa ``func`` ``repeat`` vezes e retorna ``(melhor tempo em segundos, último resultado)``."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
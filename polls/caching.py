@@ -0,0 +1,136 @@
+"""
+Cache versionado dos resultados das enquetes e suporte a GET condicional.
+
+Cada enquete tem uma versão de resultados guardada no cache do Django: um
+timestamp em nanossegundos que é trocado (após o commit) sempre que algo que
+aparece nos resultados muda — um voto, uma opção criada/alterada/excluída ou
+a própria enquete atualizada. O payload de resultados fica em cache sob a
+chave da versão, junto com o seu ETag: um hash do próprio payload, calculado
+uma vez ao guardá-lo. Um cliente com o payload atual recebe 304 sem nenhuma
+consulta ao banco. O ETag não sai da versão porque, com um cache por processo
+(LocMem), cada worker tem as suas versões e validaria dados que outro worker
+já sabe estarem velhos; o hash do payload vale igualmente em qualquer worker.
+
+A listagem e o detalhe das enquetes usam validadores mais simples, calculados
+a partir da contagem de linhas e do maior ``updated_at`` de Poll e Choice.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max
+from django.dispatch import Signal
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Choice, Poll
+
+
+def _version_key(poll_id):
+    return f'polls:results-version:{poll_id}'
+
+
+def _results_key(poll_id, version):
+    return f'polls:results:{poll_id}:{version}'
+
+
+def get_results_version(poll_id):
+    """Retorna a versão atual dos resultados da enquete, criando-a se ainda não existir."""
+    version = cache.get(_version_key(poll_id))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_version_key(poll_id), version, timeout=None):
+            # Outro processo criou a versão primeiro
+            version = cache.get(_version_key(poll_id), version)
+    return version
+
+
+# Enviado (após o commit) sempre que os resultados de uma enquete mudam, com ``poll_id``.
+# O stream ao vivo de resultados (polls.live) o usa para avisar os seus assinantes.
+results_changed = Signal()
+
+
+def bump_results_version(poll_id):
+    """Invalida os resultados em cache da enquete quando a transação atual for confirmada."""
+    def bump():
+        cache.set(_version_key(poll_id), time.time_ns(), timeout=None)
+        results_changed.send(sender=Poll, poll_id=poll_id)
+
+    transaction.on_commit(bump)
+
+
+def get_cached_results(poll_id, version):
+    """Retorna ``(etag, payload)`` da versão de resultados em cache, ou None."""
+    return cache.get(_results_key(poll_id, version))
+
+
+def set_cached_results(poll_id, version, payload):
+    """Guarda o payload da versão junto com o seu ETag e retorna ``(etag, payload)``."""
+    entry = results_etag(payload), payload
+    cache.set(_results_key(poll_id, version), entry, settings.POLL_RESULTS_CACHE_TIMEOUT)
+    return entry
+
+
+def results_etag(payload):
+    """ETag de um payload de resultados: o hash do seu conteúdo, igual em todos os processos."""
+    return _etag(json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True))
+
+
+def not_modified_response(request, etag, last_modified=None, max_age=None):
+    """Retorna um 304 se os validadores enviados pelo cliente ainda valem, senão None."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified, max_age)
+    return response
+
+
+def set_validators(response, etag, last_modified=None, max_age=None):
+    """
+    Adiciona ETag/Last-Modified à resposta. Sem ``max_age`` o cliente revalida a cada
+    uso; com ele, pode reutilizar a resposta por ``max_age`` segundos sem perguntar.
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if max_age is None:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+def _etag(*parts):
+    digest = hashlib.md5('|'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def _last_modified(*datetimes):
+    latest = max((value for value in datetimes if value is not None), default=None)
+    return int(latest.timestamp()) if latest else None
+
+
+def _representation(request):
+    # A mesma URL pode ser servida em JSON ou pela API navegável: cada formato tem seu ETag
+    return request.get_full_path(), getattr(getattr(request, 'accepted_renderer', None), 'format', '')
+
+
+def poll_list_validators(request):
+    """Retorna ``(etag, last_modified)`` da listagem de enquetes com duas agregações baratas."""
+    polls = Poll.objects.aggregate(count=Count('id'), last=Max('updated_at'))
+    choices = Choice.objects.aggregate(count=Count('id'), last=Max('updated_at'))
+    etag = _etag(*_representation(request), polls['count'], polls['last'], choices['count'], choices['last'])
+    return etag, _last_modified(polls['last'], choices['last'])
+
+
+def poll_detail_validators(request, poll_id):
+    """Retorna ``(etag, last_modified)`` de uma enquete e suas opções, ou ``(None, None)`` se ela não existir."""
+    poll_updated_at = Poll.objects.filter(pk=poll_id).values_list('updated_at', flat=True).first()
+    if poll_updated_at is None:
+        return None, None
+    choices = Choice.objects.filter(poll_id=poll_id).aggregate(count=Count('id'), last=Max('updated_at'))
+    etag = _etag(*_representation(request), poll_updated_at, choices['count'], choices['last'])
+    return etag, _last_modified(poll_updated_at, choices['last'])
@@ -0,0 +1,125 @@
+"""
+Medição da partida a frio (cold start) do servidor.
+
+No deploy serverless (vercel.json → cyber_civics_api/wsgi.py) cada instância
+nova importa o Django, o DRF e todos os ``INSTALLED_APPS`` antes de atender a
+primeira requisição, e esse tempo entra na latência de quem a fez. As medições
+rodam num interpretador novo, como uma instância recém-criada: importam o
+wsgi.py com o ``DJANGO_SETTINGS_MODULE`` escolhido (ex.:
+``cyber_civics_api.settings_api``) e atendem uma requisição (as URLs e as views
+só são importadas na primeira requisição).
+
+Sem ``token`` a requisição é anônima e a API a recusa com 401 antes de tocar no
+banco: o driver do banco não é importado e nenhuma conexão é aberta, então a
+medição fica abaixo de uma partida a frio real. Com o token de um usuário do
+banco configurado (``DATABASE_URL``) a requisição autentica, conecta e consulta.
+
+Usadas por ``manage.py bench_cold_start`` (tempo e memória, com limites) e
+``manage.py profile_imports`` (custo de importação por módulo, via
+``python -X importtime``).
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+
+# Roda no interpretador novo: importa o wsgi.py e atende uma requisição GET em sys.argv[1]. Com
+# -X importtime, o import_module do importlib passa pelo import comum: o Django importa settings, apps,
+# models e urls com import_module, e o -X importtime só mede os imports feitos pelo caminho comum.
+# O pico de memória vem do VmHWM: no Linux o ru_maxrss de um processo recém-criado herda o pico do
+# processo que o criou (o exec guarda o pico da memória anterior), e o do test runner passa dos 80 MB
+_CHILD_SCRIPT = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if 'importtime' in sys._xoptions:
+    import importlib, importlib.util
+    def import_module(name, package=None):
+        name = importlib.util.resolve_name(name, package)
+        __import__(name)
+        return sys.modules[name]
+    importlib.import_module = import_module
+from wsgiref.util import setup_testing_defaults
+import cyber_civics_api.wsgi
+ready = time.perf_counter()
+environ = {'PATH_INFO': sys.argv[1], 'REQUEST_METHOD': 'GET'}
+if os.environ.get('COLD_START_TOKEN'):
+    environ['HTTP_AUTHORIZATION'] = 'Token ' + os.environ['COLD_START_TOKEN']
+setup_testing_defaults(environ)
+statuses = []
+response = cyber_civics_api.wsgi.application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+b''.join(response)
+response.close()
+print(json.dumps({
+    'ready_ms': (ready - started) * 1000,
+    'request_ms': (time.perf_counter() - ready) * 1000,
+    'status': statuses[0],
+    'rss_kb': peak_rss_kb(),
+}))
+'''
+
+ImportTiming = namedtuple('ImportTiming', 'module self_us cumulative_us depth')
+
+
+def _run_child(settings_module, path, token, *python_options):
+    # O token vai pelo ambiente, e não pela linha de comando (visível a outros usuários no ps)
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module, 'COLD_START_TOKEN': token or ''}
+    result = subprocess.run(
+        [sys.executable, *python_options, '-c', _CHILD_SCRIPT, path],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        # Só o traceback: com -X importtime o stderr também tem uma linha por módulo importado
+        error = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError(f'Cold start with {settings_module} failed:\n' + '\n'.join(error[-20:]))
+    return result
+
+
+def measure_cold_start(settings_module, path='/api/polls/', token=None):
+    """
+    Uma partida a frio: ``{'wall_ms', 'ready_ms', 'request_ms', 'rss_mb', 'status'}``. ``wall_ms`` vai do
+    início do interpretador ao fim da primeira requisição; ``ready_ms`` é a importação do wsgi.py (settings e
+    ``django.setup()``) e ``request_ms`` a primeira requisição; ``rss_mb`` é o pico de memória do processo.
+    """
+    started = time.perf_counter()
+    result = _run_child(settings_module, path, token)
+    wall_ms = (time.perf_counter() - started) * 1000
+    measurement = json.loads(result.stdout.splitlines()[-1])
+    # VmHWM e ru_maxrss são em KB no Linux; ru_maxrss é em bytes no macOS
+    rss_kb = measurement.pop('rss_kb') / (1024 if sys.platform == 'darwin' else 1)
+    return {**measurement, 'wall_ms': wall_ms, 'rss_mb': rss_kb / 1024}
+
+
+def profile_imports(settings_module, path='/api/polls/', token=None):
+    """Os módulos importados numa partida a frio, na ordem de ``-X importtime``, com tempo próprio e acumulado."""
+    result = _run_child(settings_module, path, token, '-X', 'importtime')
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line.removeprefix('import time:').split('|')
+        if not self_us.strip().isdigit(): # Cabeçalho
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us), depth))
+    return timings
+
+
+def package_totals(timings):
+    """Tempo próprio somado por pacote de primeiro nível (``django``, ``rest_framework``, ``polls``...), do maior para o menor."""
+    totals = defaultdict(int)
+    for timing in timings:
+        totals[timing.module.partition('.')[0]] += timing.self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
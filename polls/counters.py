@@ -0,0 +1,136 @@
+"""
+Contadores de votos desnormalizados.
+
+Cada Choice guarda em ``vote_count`` quantos votos recebeu. O contador é
+atualizado com expressões F() na mesma transação que grava o Vote, de modo que
+os resultados de uma enquete são uma leitura das suas opções (O(opções)) em vez
+de uma agregação sobre a tabela de votos (O(votos)).
+
+Com ``settings.VOTE_COUNTER_SHARDS`` > 1 os incrementos vão para uma de N
+linhas de ChoiceVoteShard escolhida ao acaso, para que votos simultâneos na
+mesma opção não disputem o lock de uma única linha. A contagem de uma opção é
+então ``vote_count`` mais a soma das suas fatias, até que ``compact_vote_shards``
+as consolide de volta em ``vote_count``.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .caching import bump_results_version
+from .models import Choice, ChoiceVoteShard, Poll, Vote
+
+
+def increment_vote_count(choice_id, amount=1):
+    """Soma ``amount`` (pode ser negativo) ao contador da opção, de forma atômica no banco."""
+    shards = getattr(settings, 'VOTE_COUNTER_SHARDS', 0)
+    if shards > 1:
+        _increment_shard(choice_id, random.randrange(shards), amount)
+    else:
+        Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + amount)
+
+
+def _increment_shard(choice_id, shard, amount):
+    shard_row = ChoiceVoteShard.objects.filter(choice_id=choice_id, shard=shard)
+    if shard_row.update(vote_count=F('vote_count') + amount):
+        return
+    # Primeira escrita nesta fatia: cria a linha (outro voto pode tê-la criado em paralelo)
+    try:
+        with transaction.atomic():
+            ChoiceVoteShard.objects.create(choice_id=choice_id, shard=shard, vote_count=amount)
+    except IntegrityError:
+        shard_row.update(vote_count=F('vote_count') + amount)
+
+
+def decrement_vote_counts(votes):
+    """Desconta dos contadores os votos de um queryset que está prestes a ser excluído."""
+    per_choice = votes.order_by().values('choice_id').annotate(total=Count('id'))
+    for row in per_choice:
+        increment_vote_count(row['choice_id'], -row['total'])
+
+
+def _with_pending_shards(choices):
+    """Anota cada opção com a soma das fatias ainda não consolidadas (``pending``)."""
+    return choices.annotate(pending=Coalesce(Sum('vote_shards__vote_count'), 0))
+
+
+def poll_vote_counts(poll_id):
+    """Retorna ``[{'choice_text': ..., 'vote_count': ...}]`` para as opções da enquete."""
+    return polls_vote_counts([poll_id]).get(poll_id, [])
+
+
+def polls_vote_counts(poll_ids):
+    """Como ``poll_vote_counts``, para várias enquetes numa única consulta: ``{poll_id: [...]}``."""
+    rows = (
+        _with_pending_shards(Choice.objects.filter(poll_id__in=poll_ids))
+        .order_by('poll_id', 'id')
+        .values_list('poll_id', 'choice_text', 'vote_count', 'pending')
+    )
+    counts = defaultdict(list)
+    for poll_id, choice_text, vote_count, pending in rows:
+        counts[poll_id].append({'choice_text': choice_text, 'vote_count': vote_count + pending})
+    return dict(counts)
+
+
+def _filter_polls(queryset, poll_ids, lookup):
+    if poll_ids:
+        queryset = queryset.filter(**{lookup: poll_ids})
+    return queryset
+
+
+def find_vote_count_mismatches(poll_ids=None):
+    """
+    Compara os contadores gravados (incluindo fatias) com a contagem real na tabela de votos.
+
+    Retorna uma lista de tuplas ``(choice_id, contador_gravado, contagem_real)``
+    apenas para as opções divergentes.
+    """
+    votes = _filter_polls(Vote.objects.all(), poll_ids, 'poll_id__in')
+    actual = dict(votes.order_by().values_list('choice_id').annotate(total=Count('id')))
+
+    choices = _with_pending_shards(_filter_polls(Choice.objects.all(), poll_ids, 'poll_id__in'))
+    mismatches = []
+    for choice_id, vote_count, pending in choices.order_by('id').values_list('id', 'vote_count', 'pending').iterator():
+        stored = vote_count + pending
+        real = actual.get(choice_id, 0)
+        if stored != real:
+            mismatches.append((choice_id, stored, real))
+    return mismatches
+
+
+def rebuild_vote_counts(poll_ids=None):
+    """Recalcula os contadores a partir das linhas de Vote. Retorna o número de opções atualizadas."""
+    votes_per_choice = (
+        Vote.objects.filter(choice=OuterRef('pk'))
+        .order_by()
+        .values('choice')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    choices = _filter_polls(Choice.objects.all(), poll_ids, 'poll_id__in')
+    shards = _filter_polls(ChoiceVoteShard.objects.all(), poll_ids, 'choice__poll_id__in')
+    with transaction.atomic():
+        # Bloqueia as fatias para que nenhum incremento concorrente se perca ao zerá-las
+        shard_ids = list(shards.select_for_update(of=('self',)).values_list('id', flat=True))
+        ChoiceVoteShard.objects.filter(id__in=shard_ids).update(vote_count=0)
+        updated = choices.update(vote_count=Coalesce(Subquery(votes_per_choice), 0))
+        for poll_id in _filter_polls(Poll.objects.all(), poll_ids, 'pk__in').values_list('pk', flat=True).iterator():
+            bump_results_version(poll_id)
+    return updated
+
+
+def compact_vote_shards(poll_ids=None):
+    """Consolida as fatias em Choice.vote_count e as zera. Retorna o número de opções afetadas."""
+    shards = _filter_polls(ChoiceVoteShard.objects.exclude(vote_count=0), poll_ids, 'choice__poll_id__in')
+    with transaction.atomic():
+        locked = list(shards.select_for_update(of=('self',)).values_list('id', 'choice_id', 'vote_count'))
+        folded = defaultdict(int)
+        for _, choice_id, vote_count in locked:
+            folded[choice_id] += vote_count
+        for choice_id, amount in folded.items():
+            Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + amount)
+        ChoiceVoteShard.objects.filter(id__in=[shard_id for shard_id, _, _ in locked]).update(vote_count=0)
+    return len(folded)
@@ -0,0 +1,87 @@
+"""
+Encerramento automático das enquetes cujo prazo passou.
+
+``close_expired_polls`` marca como inativas, num único UPDATE sobre o índice
+parcial ``polls_poll_open_deadline_idx``, as enquetes ativas com prazo vencido,
+congela seus resultados finais (polls.snapshots) e invalida o cache. Assim
+``is_active`` passa a refletir o prazo e pode ser usado como filtro.
+
+Pode rodar pelo cron (``manage.py close_expired_polls``) ou, em servidores de
+longa duração, numa thread do próprio processo (``POLL_EXPIRY_SWEEP_INTERVAL``).
+Rodar em vários processos ao mesmo tempo é seguro: o UPDATE só pega enquetes
+ainda ativas e o snapshot é um upsert.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .caching import bump_results_version
+from .models import Poll
+from .snapshots import snapshot_results
+from .vote_buffer import flush_vote_buffer
+
+logger = logging.getLogger(__name__)
+
+
+def expired_polls(now=None):
+    """Enquetes ainda ativas cujo prazo já passou."""
+    return Poll.objects.filter(is_active=True, deadline__isnull=False, deadline__lt=now or timezone.now())
+
+
+def close_expired_polls(now=None):
+    """Encerra as enquetes vencidas e congela seus resultados. Retorna os ids encerrados."""
+    now = now or timezone.now()
+    if settings.VOTE_WRITE_BEHIND:
+        # Votos confirmados antes do prazo entram nos resultados finais
+        flush_vote_buffer()
+    with transaction.atomic():
+        # Trava as linhas para que uma edição concorrente (ex.: prorrogação do prazo) espere o fim da varredura
+        poll_ids = list(expired_polls(now).select_for_update().values_list('pk', flat=True))
+        if not poll_ids:
+            return []
+        # QuerySet.update() não preenche auto_now: updated_at vai explícito (ETag da listagem/detalhe)
+        Poll.objects.filter(pk__in=poll_ids).update(is_active=False, closed_at=now, updated_at=now)
+        snapshot_results(poll_ids)
+        for poll_id in poll_ids:
+            bump_results_version(poll_id) # is_active aparece nos resultados
+    return poll_ids
+
+
+class ExpirySweeper(threading.Thread):
+    """Thread que chama ``close_expired_polls`` a cada ``interval`` segundos até ``stop()``."""
+
+    def __init__(self, interval):
+        super().__init__(name='poll-expiry-sweeper', daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                closed = close_expired_polls()
+                if closed:
+                    logger.info('Closed %d expired poll(s).', len(closed))
+            except Exception:
+                logger.exception('Expired poll sweep failed.')
+            finally:
+                close_old_connections() # A thread tem sua própria conexão com o banco
+
+    def stop(self):
+        self._stopped.set()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def start_expiry_sweeper(interval):
+    """Inicia (uma única vez por processo) a varredura periódica em segundo plano."""
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = ExpirySweeper(interval)
+            _sweeper.start()
+        return _sweeper
@@ -0,0 +1,104 @@
+"""
+Exportação de votos em CSV ou NDJSON com memória constante.
+
+As linhas vêm de ``.values_list().iterator(chunk_size=...)``, sem instanciar
+modelos, e são convertidas em texto um bloco por vez, de modo que o mesmo
+gerador serve tanto ao ``StreamingHttpResponse`` da API quanto ao comando
+``export_votes``, qualquer que seja o número de votos. Sob ASGI o gerador é
+consumido por ``async_chunks``: um iterador síncrono seria lido inteiro pelo
+Django antes do envio.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from rest_framework import serializers
+
+from .models import Vote
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (cabeçalho, lookup em Vote)
+VOTE_EXPORT_COLUMNS = (
+    ('vote_id', 'id'),
+    ('poll_id', 'poll_id'),
+    ('choice_id', 'choice_id'),
+    ('choice_text', 'choice__choice_text'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('voted_at', 'voted_at'),
+)
+
+_VOTED_AT = [header for header, _ in VOTE_EXPORT_COLUMNS].index('voted_at')
+
+
+def vote_export_queryset(poll_ids=None):
+    """Votos das enquetes informadas (ou de todas) como tuplas na ordem de ``VOTE_EXPORT_COLUMNS``."""
+    votes = Vote.objects.all()
+    if poll_ids:
+        votes = votes.filter(poll_id__in=poll_ids)
+    # (poll, choice, id) segue o índice polls_vote_poll_choice_idx, sem ordenar os votos à parte
+    return votes.order_by('poll_id', 'choice_id', 'id').values_list(*(lookup for _, lookup in VOTE_EXPORT_COLUMNS))
+
+
+def vote_rows(poll_ids=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Itera as linhas de ``vote_export_queryset`` lendo ``chunk_size`` votos por vez do banco."""
+    return vote_export_queryset(poll_ids).iterator(chunk_size=chunk_size)
+
+
+def _blocks(rows, size):
+    rows = iter(rows)
+    while block := list(islice(rows, size)):
+        yield block
+
+
+def _formatted(rows):
+    # Mesmo formato de data/hora das respostas da API
+    voted_at = serializers.DateTimeField()
+    for row in rows:
+        row = list(row)
+        row[_VOTED_AT] = voted_at.to_representation(row[_VOTED_AT])
+        yield row
+
+
+def render_csv(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Gera o CSV (com cabeçalho) em pedaços de texto de até ``chunk_size`` linhas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in VOTE_EXPORT_COLUMNS])
+    for block in _blocks(_formatted(rows), chunk_size):
+        writer.writerows(block)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue() # Só o cabeçalho: nenhum voto exportado
+
+
+def render_ndjson(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Gera um objeto JSON por linha, em pedaços de texto de até ``chunk_size`` linhas."""
+    headers = [header for header, _ in VOTE_EXPORT_COLUMNS]
+    for block in _blocks(_formatted(rows), chunk_size):
+        yield ''.join(json.dumps(dict(zip(headers, row)), ensure_ascii=False) + '\n' for row in block)
+
+
+async def async_chunks(chunks):
+    """
+    Versão assíncrona de um gerador de pedaços de texto, para o ``StreamingHttpResponse`` sob
+    ASGI: cada pedaço é produzido na thread síncrona (onde fica a conexão com o banco).
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+# formato -> (content type, renderizador, extensão do arquivo)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', render_csv, 'csv'),
+    'ndjson': ('application/x-ndjson', render_ndjson, 'ndjson'),
+}
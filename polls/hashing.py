@@ -0,0 +1,124 @@
+"""
+Hash de senhas fora da thread da requisição.
+
+Cada ``make_password``/``check_password`` roda o PBKDF2 inteiro (centenas de
+milhares de iterações, centenas de milissegundos de CPU). Dois usos:
+
+* login e registro (``hash_password``, ``verify_password`` e as variantes
+  assíncronas) passam por um pool de threads limitado a
+  ``PASSWORD_HASH_CONCURRENCY`` hashes simultâneos: um surto de logins espera na
+  fila do pool em vez de ocupar todos os núcleos, e as leituras baratas da API
+  continuam sendo atendidas. O PBKDF2 do hashlib libera o GIL, então as threads
+  do pool rodam de fato em paralelo. Sob ASGI as views aguardam o pool sem
+  prender o event loop. O tempo de fila e de hash de cada requisição vai no
+  cabeçalho ``Server-Timing`` (polls.middleware);
+* o cadastro em massa (``PasswordHasher``) usa um pool de processos próprio,
+  um por núcleo, para não disputar o pool das requisições.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+# Tempos (fila, hash) dos hashes da requisição atual; definida por polls.middleware
+hash_timings = ContextVar('hash_timings', default=None)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hash_pool():
+    """Pool de threads (um por processo) que executa os hashes de login e registro."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(settings.PASSWORD_HASH_CONCURRENCY, thread_name_prefix='password-hash')
+        return _pool
+
+
+def _timed(func, args, submitted_at):
+    started_at = time.perf_counter()
+    result = func(*args)
+    return result, started_at - submitted_at, time.perf_counter() - started_at
+
+
+def _record(wait, duration):
+    timings = hash_timings.get()
+    if timings is not None:
+        timings.append((wait, duration))
+
+
+def _offload(func, *args):
+    result, wait, duration = get_hash_pool().submit(_timed, func, args, time.perf_counter()).result()
+    _record(wait, duration)
+    return result
+
+
+async def _aoffload(func, *args):
+    future = get_hash_pool().submit(_timed, func, args, time.perf_counter())
+    result, wait, duration = await asyncio.wrap_future(future)
+    _record(wait, duration)
+    return result
+
+
+def _check(raw_password, encoded):
+    # O setter só registra que o hash precisa ser atualizado: o save fica com quem chamou
+    updates = []
+    return check_password(raw_password, encoded, setter=updates.append), bool(updates)
+
+
+def hash_password(raw_password):
+    """``make_password`` no pool de hashes."""
+    return _offload(make_password, raw_password)
+
+
+async def ahash_password(raw_password):
+    return await _aoffload(make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """
+    ``check_password`` no pool de hashes. Retorna ``(válida, precisa_atualizar)``: o segundo
+    indica que o hash usa um algoritmo ou número de iterações antigo e deve ser refeito.
+    """
+    return _offload(_check, raw_password, encoded)
+
+
+async def averify_password(raw_password, encoded):
+    return await _aoffload(_check, raw_password, encoded)
+
+
+class PasswordHasher:
+    """
+    Context manager que calcula ``make_password`` para listas de senhas, em ``workers``
+    processos (padrão: um por núcleo). Com um único worker tudo roda no próprio processo.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def hash(self, passwords):
+        """Hashes das senhas, na mesma ordem; ``None`` gera uma senha inutilizável, como em ``make_password``."""
+        passwords = list(passwords)
+        if self.workers == 1 or len(passwords) < 2:
+            return [make_password(password) for password in passwords]
+        if self._pool is None:
+            # spawn em vez de fork: o processo do servidor pode ter threads (e locks) em uso
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._pool.map(make_password, passwords, chunksize=chunksize))
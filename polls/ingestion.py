@@ -0,0 +1,195 @@
+"""
+Ingestão em massa de votos coletados offline (quiosques de votação).
+
+Os registros ``{user, poll, choice, voted_at}`` são processados em lotes: cada
+lote é validado com um punhado de consultas por conjunto (usuários, enquetes,
+opções e votos já existentes), em vez de uma ida ao banco por voto, e os votos
+aceitos são gravados com um único ``bulk_create`` na mesma transação que
+atualiza os contadores e invalida os resultados em cache.
+
+As regras são as mesmas do voto pela API (``VoteSerializer.create`` e
+``Vote.clean``): a opção precisa pertencer à enquete, a enquete precisa estar
+ativa e o voto precisa ter sido dado até o prazo — aqui comparado com o
+``voted_at`` do registro, e não com o horário da ingestão. Uma enquete encerrada
+pela varredura de polls.expiry (que grava ``closed_at``) continua aceitando os
+votos dados até o encerramento e o prazo, e o snapshot dos seus resultados
+finais é regravado; uma encerrada por um admin não aceita mais votos. Um segundo voto do mesmo usuário na mesma
+enquete (já gravado ou repetido no arquivo) é reportado como duplicado.
+"""
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .caching import bump_results_version
+from .counters import increment_vote_count
+from .models import Choice, Poll, Vote
+from .serializers import (
+    ALREADY_VOTED_MESSAGE,
+    CHOICE_NOT_IN_POLL_MESSAGE,
+    POLL_CLOSED_MESSAGE,
+    BulkVoteRecordSerializer,
+)
+from .snapshots import refresh_results_snapshots
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+
+FUTURE_VOTE_MESSAGE = "A data do voto não pode estar no futuro."
+_DOES_NOT_EXIST_MESSAGE = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+
+
+def ingest_votes(records, chunk_size=None, check_active=True):
+    """
+    Ingere os registros e gera um resultado por registro, na ordem de entrada.
+
+    Cada resultado é ``{'index': i, 'status': 'accepted' | 'duplicate' | 'invalid'}``,
+    com ``'errors'`` (no formato dos erros do DRF) quando o voto não foi aceito.
+    Os registros são consumidos sob demanda, um lote de ``chunk_size`` por vez, e
+    cada lote é gravado na sua própria transação antes que seus resultados sejam gerados.
+
+    Com ``check_active=False`` (votos já confirmados ao cliente, como os do buffer de
+    polls.vote_buffer) uma enquete encerrada depois do voto não o rejeita: só o prazo,
+    comparado com ``voted_at``, decide.
+    """
+    chunk_size = chunk_size or settings.BULK_VOTE_CHUNK_SIZE
+    records = iter(records)
+    start = 0
+    while chunk := list(islice(records, chunk_size)):
+        yield from _ingest_chunk(chunk, start, check_active)
+        start += len(chunk)
+
+
+def summarize(results):
+    """Conta os resultados por status: ``{'accepted': n, 'duplicate': n, 'invalid': n}``."""
+    totals = Counter({ACCEPTED: 0, DUPLICATE: 0, INVALID: 0})
+    totals.update(result['status'] for result in results)
+    return dict(totals)
+
+
+def _ingest_chunk(chunk, start, check_active):
+    results = [None] * len(chunk)
+    parsed = []
+    for position, record in enumerate(chunk):
+        serializer = BulkVoteRecordSerializer(data=record)
+        if serializer.is_valid():
+            parsed.append((position, serializer.validated_data))
+        else:
+            results[position] = _result(start + position, INVALID, serializer.errors)
+
+    now = timezone.now()
+    user_ids = _resolve_users(data['user'] for _, data in parsed)
+    poll_ids = {data['poll'] for _, data in parsed}
+    choice_ids = {data['choice'] for _, data in parsed}
+    polls = {
+        pk: (is_active, deadline, closed_at)
+        for pk, is_active, deadline, closed_at in Poll.objects.filter(pk__in=poll_ids).values_list(
+            'pk', 'is_active', 'deadline', 'closed_at',
+        )
+    }
+    choice_polls = dict(Choice.objects.filter(pk__in=choice_ids).values_list('pk', 'poll_id'))
+    voted = set(
+        Vote.objects.filter(poll_id__in=polls, user_id__in=user_ids.values()).values_list('user_id', 'poll_id')
+    )
+
+    votes = {}
+    for position, data in parsed:
+        user_id = user_ids.get(data['user'])
+        poll_id, choice_id = data['poll'], data['choice']
+        voted_at = data.get('voted_at', now)
+
+        # Mesma ordem de verificação de raise_vote_rejection (polls.serializers)
+        if user_id is None:
+            errors = {'user': [_DOES_NOT_EXIST_MESSAGE.format(pk_value=data['user'])]}
+        elif poll_id not in polls:
+            errors = {'poll': [_DOES_NOT_EXIST_MESSAGE.format(pk_value=poll_id)]}
+        elif choice_id not in choice_polls:
+            errors = {'choice': [_DOES_NOT_EXIST_MESSAGE.format(pk_value=choice_id)]}
+        elif choice_polls[choice_id] != poll_id:
+            errors = {'choice': [CHOICE_NOT_IN_POLL_MESSAGE]}
+        elif voted_at > now:
+            errors = {'voted_at': [FUTURE_VOTE_MESSAGE]}
+        elif not _is_open(*polls[poll_id], voted_at, check_active):
+            errors = {'non_field_errors': [POLL_CLOSED_MESSAGE]}
+        elif (user_id, poll_id) in voted:
+            results[position] = _result(start + position, DUPLICATE, {'non_field_errors': [ALREADY_VOTED_MESSAGE]})
+            continue
+        else:
+            voted.add((user_id, poll_id)) # Um segundo registro do mesmo par no lote é duplicado
+            votes[position] = Vote(user_id=user_id, poll_id=poll_id, choice_id=choice_id, voted_at=voted_at)
+            continue
+        results[position] = _result(start + position, INVALID, errors)
+
+    if votes:
+        with transaction.atomic():
+            inserted = _insert_votes(votes)
+            for choice_id, amount in Counter(votes[position].choice_id for position in inserted).items():
+                increment_vote_count(choice_id, amount)
+            voted_polls = {votes[position].poll_id for position in inserted}
+            for poll_id in voted_polls:
+                bump_results_version(poll_id)
+            # Votos atrasados numa enquete já encerrada entram nos seus resultados finais
+            refresh_results_snapshots(poll_id for poll_id in voted_polls if not polls[poll_id][0])
+        for position in votes:
+            if position in inserted:
+                results[position] = _result(start + position, ACCEPTED)
+            else:
+                results[position] = _result(start + position, DUPLICATE, {'non_field_errors': [ALREADY_VOTED_MESSAGE]})
+    return results
+
+
+def _insert_votes(votes):
+    """
+    Grava os votos (``{posição: Vote}``) com um único ``bulk_create`` e retorna as
+    posições dos que de fato entraram.
+
+    ``ignore_conflicts`` cobre um voto pela API gravado entre a checagem do lote e o
+    INSERT, mas não diz quais linhas foram descartadas: os votos são relidos na mesma
+    transação, e só os que voltam com a mesma opção e o mesmo ``voted_at`` contam.
+    """
+    Vote.objects.bulk_create(votes.values(), ignore_conflicts=True)
+    stored = set(
+        Vote.objects.filter(
+            user_id__in={vote.user_id for vote in votes.values()},
+            poll_id__in={vote.poll_id for vote in votes.values()},
+        ).values_list('user_id', 'poll_id', 'choice_id', 'voted_at')
+    )
+    return {
+        position for position, vote in votes.items()
+        if (vote.user_id, vote.poll_id, vote.choice_id, vote.voted_at) in stored
+    }
+
+
+def _resolve_users(references):
+    """Mapeia cada referência (id ou username) para o id do usuário, com uma única consulta."""
+    references = set(references)
+    ids = {reference for reference in references if isinstance(reference, int)}
+    usernames = references - ids
+    resolved = {}
+    for pk, username in User.objects.filter(Q(pk__in=ids) | Q(username__in=usernames)).values_list('pk', 'username'):
+        if pk in ids:
+            resolved[pk] = pk
+        if username in usernames:
+            resolved[username] = pk
+    return resolved
+
+
+def _is_open(is_active, deadline, closed_at, voted_at, check_active=True):
+    if deadline is not None and voted_at > deadline:
+        return False
+    # Encerrada pela varredura: valem os votos dados até o encerramento. Uma enquete
+    # encerrada por um admin (sem closed_at) não aceita mais votos.
+    return is_active or not check_active or (closed_at is not None and voted_at <= closed_at)
+
+
+def _result(index, status, errors=None):
+    result = {'index': index, 'status': status}
+    if errors:
+        result['errors'] = errors
+    return result
@@ -0,0 +1,171 @@
+"""
+Resultados ao vivo das enquetes (Server-Sent Events).
+
+Cada enquete com pelo menos um assinante tem um ``ResultsChannel``: uma tarefa
+no event loop que, a cada ``LIVE_RESULTS_TICK`` segundos, pergunta ao broker se
+os resultados mudaram e, se sim, calcula o payload uma única vez e o distribui
+a todos os assinantes — o primeiro evento de cada um traz os resultados
+completos (``results``), os seguintes só os campos que mudaram (``delta``).
+
+O broker (``LIVE_RESULTS_BROKER``) diz se houve mudança desde o último tick:
+
+* ``LocalBroker`` conta as notificações do sinal ``results_changed`` no próprio
+  processo — suficiente com um único worker;
+* ``CacheBroker`` compara a versão dos resultados guardada no cache do Django,
+  que todo processo troca a cada mudança; com um cache compartilhado
+  (``CACHE_BACKEND=file`` ou ``db``, no lugar de um Redis) vários workers
+  enxergam os votos uns dos outros.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from .caching import get_results_version, results_changed
+from .snapshots import cached_poll_results
+
+
+class LocalBroker:
+    """Broker do próprio processo: um contador de mudanças por enquete."""
+
+    def __init__(self):
+        self._changes = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def publish(self, poll_id):
+        # Chamado após o commit, em qualquer thread
+        with self._lock:
+            self._changes[int(poll_id)] += 1
+
+    async def token(self, poll_id):
+        return self._changes[poll_id]
+
+
+class CacheBroker:
+    """Broker compartilhado pelo cache do Django: a versão dos resultados já muda a cada alteração."""
+
+    def publish(self, poll_id):
+        pass # bump_results_version já trocou a versão no cache
+
+    async def token(self, poll_id):
+        return await sync_to_async(get_results_version)(poll_id)
+
+
+@cache
+def get_broker():
+    return import_string(settings.LIVE_RESULTS_BROKER)()
+
+
+def _on_results_changed(sender, poll_id, **kwargs):
+    get_broker().publish(poll_id)
+
+
+results_changed.connect(_on_results_changed, dispatch_uid='polls.live')
+
+
+def load_results(poll_id):
+    """Payload atual de resultados da enquete (pelo cache versionado), ou None se ela não existir mais."""
+    payload = cached_poll_results(poll_id)[1]
+    if payload is None:
+        return None
+    # Passa pelo JSON para que datas e listas do DRF fiquem como na resposta da API
+    return json.loads(json.dumps(payload, cls=JSONEncoder))
+
+
+def results_delta(previous, current):
+    """Campos de primeiro nível de ``current`` que diferem de ``previous``."""
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+class ResultsChannel:
+    """Distribui os resultados de uma enquete aos seus assinantes, calculando-os uma vez por tick."""
+
+    def __init__(self, poll_id):
+        self.poll_id = poll_id
+        self.subscribers = set() # Filas dos assinantes que já receberam os resultados completos
+        self.pending = set() # Filas recém-inscritas, à espera do primeiro evento
+        self.payload = None
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        if self.payload is not None:
+            queue.put_nowait(sse_event('results', self.payload))
+            self.subscribers.add(queue)
+        else:
+            self.pending.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        self.pending.discard(queue)
+        if not (self.subscribers or self.pending) and self.task is not None:
+            self.task.cancel()
+
+    async def run(self):
+        broker = get_broker()
+        token = object() # Força o cálculo no primeiro tick
+        while self.subscribers or self.pending:
+            current_token = await broker.token(self.poll_id)
+            if current_token != token or self.pending:
+                token = current_token
+                await self.refresh()
+            await asyncio.sleep(settings.LIVE_RESULTS_TICK)
+
+    async def refresh(self):
+        payload = await sync_to_async(load_results)(self.poll_id)
+        if payload is None:
+            # A enquete foi excluída: encerra todos os streams
+            for queue in self.subscribers | self.pending:
+                queue.put_nowait(None)
+            self.subscribers.clear()
+            self.pending.clear()
+            return
+
+        delta = results_delta(self.payload or {}, payload)
+        self.payload = payload
+        if delta:
+            message = sse_event('delta', delta)
+            for queue in self.subscribers:
+                queue.put_nowait(message)
+        for queue in self.pending:
+            queue.put_nowait(sse_event('results', payload))
+        self.subscribers |= self.pending
+        self.pending.clear()
+
+
+_channels = {}
+
+
+async def stream_results(poll_id):
+    """Gera os eventos SSE dos resultados da enquete até o cliente desconectar."""
+    channel = _channels.get(poll_id)
+    if channel is None:
+        channel = _channels[poll_id] = ResultsChannel(poll_id)
+    queue = channel.subscribe()
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=settings.LIVE_RESULTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n' # Comentário SSE: mantém proxies e o cliente conectados
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        channel.unsubscribe(queue)
+        if not (channel.subscribers or channel.pending) and _channels.get(poll_id) is channel:
+            del _channels[poll_id]
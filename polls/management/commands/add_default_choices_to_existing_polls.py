@@ -1,55 +1,83 @@
-from django.core.management.base import BaseCommand
-from django.db.models import Q # Importar Q para consultas complexas
+from functools import reduce
+from operator import or_
 
-from polls.models import Poll, Choice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q # Importar Q para consultas complexas
 
-class Command(BaseCommand):
-    help = 'Adds default "Concordo", "Discordo", "Neutro" choices to existing polls/proposals that do not have them.'
-
-    def handle(self, *args, **options):
-        default_texts = ["Concordo", "Discordo", "Neutro"]
-        polls_updated_count = 0
-        choices_added_count = 0
+from polls.caching import bump_results_version
+from polls.models import DEFAULT_CHOICE_TEXTS, Poll, Choice
+from polls.snapshots import snapshot_results
 
-        # Encontrar todas as enquetes/propostas existentes
-        all_polls = Poll.objects.all()
-        total_polls = all_polls.count()
+class Command(BaseCommand):
+    help = (
+        'Adds default "Concordo", "Discordo", "Neutro" choices to existing polls/proposals that do not have them. '
+        'Missing choices are found with one anti-join query per batch and inserted with bulk_create.'
+    )
 
-        self.stdout.write(self.style.SUCCESS(f'Checking {total_polls} existing polls/proposals for missing default choices...'))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Polls examined (and their missing choices inserted) per batch, each in its own short transaction.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many choices would be added, without writing anything.',
+        )
 
-        for poll in all_polls:
-            self.stdout.write(f'Processing Poll "{poll.title}" (ID: {poll.id})...', ending='')
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer.')
+        dry_run = options['dry_run']
 
-            # Obter as opções padrão que JÁ existem para esta enquete
-            existing_default_choices = Choice.objects.filter(
-                poll=poll,
-                choice_text__in=default_texts
-            ).values_list('choice_text', flat=True)
+        # Uma coluna booleana por texto padrão indica se a enquete já tem essa opção;
+        # só interessam as enquetes às quais falta pelo menos uma
+        flags = {
+            f'has_default_{index}': Exists(Choice.objects.filter(poll=OuterRef('pk'), choice_text=text))
+            for index, text in enumerate(DEFAULT_CHOICE_TEXTS)
+        }
+        missing = (
+            Poll.objects.annotate(**flags)
+            .filter(reduce(or_, (Q(**{flag: False}) for flag in flags)))
+            .order_by('pk')
+            .values_list('pk', 'is_active', *flags)
+        )
+        total_polls = missing.count()
+        self.stdout.write(self.style.SUCCESS(f'{total_polls} polls/proposals are missing default choices.'))
 
-            # Identificar quais opções padrão estão faltando
-            missing_default_texts = [
-                text for text in default_texts if text not in existing_default_choices
+        polls_updated_count = 0
+        choices_added_count = 0
+        last_pk = 0
+        while rows := list(missing.filter(pk__gt=last_pk)[:batch_size]):
+            last_pk = rows[-1][0]
+            choices_to_create = [
+                Choice(poll_id=poll_id, choice_text=text)
+                for poll_id, _is_active, *present in rows
+                for text, exists in zip(DEFAULT_CHOICE_TEXTS, present)
+                if not exists
             ]
+            if options['verbosity'] >= 2:
+                for poll_id, _is_active, *present in rows:
+                    texts = [text for text, exists in zip(DEFAULT_CHOICE_TEXTS, present) if not exists]
+                    self.stdout.write(f'Poll {poll_id}: {", ".join(texts)}')
 
-            if missing_default_texts:
-                # Criar as opções padrão que estão faltando
-                choices_to_create = [
-                    Choice(poll=poll, choice_text=text) for text in missing_default_texts
-                ]
-                created_choices = Choice.objects.bulk_create(choices_to_create)
+            if not dry_run:
+                with transaction.atomic():
+                    # ignore_conflicts: uma opção criada por outro processo desde a consulta é apenas ignorada
+                    Choice.objects.bulk_create(choices_to_create, batch_size=batch_size, ignore_conflicts=True)
+                    for poll_id, *_ in rows:
+                        bump_results_version(poll_id) # As novas opções aparecem nos resultados
+                    # ...inclusive nos resultados congelados das enquetes encerradas (só elas têm snapshot)
+                    closed = [poll_id for poll_id, is_active, *_ in rows if not is_active]
+                    if closed:
+                        snapshot_results(closed)
 
-                self.stdout.write(self.style.SUCCESS(f' Added {len(created_choices)} missing default choice(s): {", ".join(missing_default_texts)}'))
-                polls_updated_count += 1
-                choices_added_count += len(created_choices)
-            else:
-                self.stdout.write(self.style.SUCCESS(' All default choices already exist.'))
+            polls_updated_count += len(rows)
+            choices_added_count += len(choices_to_create)
+            self.stdout.write(f'Processed {polls_updated_count}/{total_polls} polls/proposals...')
 
+        action = 'would be added' if dry_run else 'added'
         self.stdout.write(self.style.SUCCESS(
-            f'\nFinished adding default choices.'
+            f'Finished: {choices_added_count} default choice(s) {action} to {polls_updated_count} poll(s)/proposal(s).'
         ))
-        self.stdout.write(self.style.SUCCESS(
-            f'Total polls/proposals updated: {polls_updated_count}'
-        ))
-        self.stdout.write(self.style.SUCCESS(
-            f'Total default choices added: {choices_added_count}'
-        ))
\ No newline at end of file
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory
+from rest_framework.authtoken.models import Token
+
+from polls.async_views import poll_results, poll_vote
+from polls.benchmarking import simulated_db_latency, throwaway_database
+from polls.models import Choice, Poll, Vote
+from polls.views import PollViewSet
+from polls.voted_index import voted_index
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks throughput of the sync (DRF) and async vote/results views under concurrent load, '
+        'with a simulated per-query database latency. Runs on a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per measurement.')
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 8, 32],
+            help='In-flight requests (threads for the sync views, tasks for the async views).',
+        )
+        parser.add_argument(
+            '--db-latency', type=float, default=2.0,
+            help='Milliseconds added to every query, standing in for the network round trip to the database.',
+        )
+        parser.add_argument('--polls', type=int, default=50, help='Polls the requests are spread over.')
+
+    def handle(self, *args, **options):
+        test_name = None
+        if connection.vendor == 'sqlite':
+            # Um arquivo em vez do banco em memória: as threads esperam o lock de escrita em vez de falhar
+            test_name = os.path.join(tempfile.mkdtemp(), 'bench_async_views.sqlite3')
+        with throwaway_database(test_name):
+            self._seed(options['polls'], options['requests'])
+            with simulated_db_latency(options['db_latency'] / 1000):
+                for concurrency in options['concurrency']:
+                    for endpoint in ('results', 'vote'):
+                        self._measure(endpoint, concurrency, options['requests'])
+
+    def _seed(self, poll_count, voter_count):
+        creator = User.objects.create_user(username='bench')
+        self.polls = Poll.objects.bulk_create(
+            Poll(title=f'Poll {i}', description='', created_by=creator) for i in range(poll_count)
+        )
+        choices = Choice.objects.bulk_create(
+            Choice(poll=poll, choice_text=f'Option {j}') for poll in self.polls for j in range(3)
+        )
+        self.choice_ids = {poll.pk: choice.pk for poll, choice in zip(self.polls, choices[::3])}
+        voters = User.objects.bulk_create(User(username=f'voter{i}') for i in range(voter_count))
+        tokens = Token.objects.bulk_create(Token(user=voter, key=Token.generate_key()) for voter in voters)
+        self.tokens = [token.key for token in tokens]
+
+    def _requests(self, endpoint, count):
+        # Cada voto é de um usuário diferente; os votos são apagados antes de cada medição
+        for i in range(count):
+            poll = self.polls[i % len(self.polls)]
+            path = f'/api/polls/{poll.pk}/{endpoint}/'
+            yield path, poll.pk, {'choice': self.choice_ids[poll.pk]}, self.tokens[i]
+
+    def _measure(self, endpoint, concurrency, count):
+        sync_rate = self._timed(endpoint, count, lambda requests: self._run_sync(endpoint, requests, concurrency))
+        async_rate = self._timed(endpoint, count, lambda requests: asyncio.run(self._run_async(endpoint, requests, concurrency)))
+        self.stdout.write(
+            f'{endpoint:>7} x{concurrency:<4} sync {sync_rate:9.1f} req/s | '
+            f'async {async_rate:9.1f} req/s | ratio {async_rate / sync_rate:5.2f}x'
+        )
+
+    def _timed(self, endpoint, count, run):
+        Vote.objects.all().delete()
+        voted_index.clear() # Os votos foram apagados sem passar pelo admin
+        Choice.objects.update(vote_count=0)
+        requests = list(self._requests(endpoint, count))
+        start = time.perf_counter()
+        statuses = run(requests)
+        elapsed = time.perf_counter() - start
+        expected = 201 if endpoint == 'vote' else 200
+        failed = [status for status in statuses if status != expected]
+        if failed:
+            raise CommandError(f'{len(failed)} {endpoint} request(s) failed (e.g. HTTP {failed[0]}).')
+        return count / elapsed
+
+    def _run_sync(self, endpoint, requests, concurrency):
+        factory = RequestFactory()
+        view = PollViewSet.as_view({'post': 'vote'} if endpoint == 'vote' else {'get': 'results'})
+
+        def call(request_args):
+            path, poll_id, data, token = request_args
+            if endpoint == 'vote':
+                request = factory.post(path, data, content_type='application/json', HTTP_AUTHORIZATION=f'Token {token}')
+            else:
+                request = factory.get(path, HTTP_AUTHORIZATION=f'Token {token}')
+            return view(request, pk=str(poll_id)).status_code
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(call, requests))
+
+    async def _run_async(self, endpoint, requests, concurrency):
+        factory = AsyncRequestFactory()
+        view = poll_vote if endpoint == 'vote' else poll_results
+        slots = asyncio.Semaphore(concurrency)
+
+        async def call(path, poll_id, data, token):
+            async with slots:
+                # Como o ASGIHandler: cada request tem sua própria thread para o código síncrono
+                async with ThreadSensitiveContext():
+                    headers = {'Authorization': f'Token {token}'}
+                    if endpoint == 'vote':
+                        request = factory.post(path, data, content_type='application/json', headers=headers)
+                    else:
+                        request = factory.get(path, headers=headers)
+                    return (await view(request, pk=poll_id)).status_code
+
+        return await asyncio.gather(*(call(*request_args) for request_args in requests))
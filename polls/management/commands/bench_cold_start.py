@@ -0,0 +1,61 @@
+import os
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.coldstart import measure_cold_start
+
+class Command(BaseCommand):
+    help = (
+        'Measures cold starts: each run is a fresh interpreter that imports cyber_civics_api.wsgi and serves '
+        'one request. Reports wall time and peak RSS, and fails if the medians exceed the given budgets.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-module', nargs='+', default=[os.environ.get('DJANGO_SETTINGS_MODULE')],
+            help='DJANGO_SETTINGS_MODULE(s) to compare (default: the current one), e.g. '
+                 'cyber_civics_api.settings cyber_civics_api.settings_api.',
+        )
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts per settings module.')
+        parser.add_argument('--path', default='/api/polls/', help='URL of the first request.')
+        parser.add_argument(
+            '--token', default=os.environ.get('COLD_START_TOKEN'),
+            help='API token sent with the first request, so it authenticates and queries the database '
+                 '(default: $COLD_START_TOKEN). Without it the request is rejected with 401 before any database work.',
+        )
+        # Medianas medidas num núcleo: ~390-600 ms e ~55 MB nos dois perfis; os padrões deixam folga para ruído
+        parser.add_argument(
+            '--max-wall-ms', type=float, default=800, help='Budget for the median wall time, in milliseconds (default: 800).',
+        )
+        parser.add_argument('--max-rss-mb', type=float, default=80, help='Budget for the median peak RSS, in MB (default: 80).')
+
+    def handle(self, *args, **options):
+        over_budget = []
+        for settings_module in options['settings_module']:
+            try:
+                runs = [
+                    measure_cold_start(settings_module, options['path'], options['token']) for _ in range(options['runs'])
+                ]
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+            if runs[0]['status'].startswith('5'):
+                raise CommandError(f"{settings_module}: the first request failed with {runs[0]['status']}.")
+            median = {key: statistics.median(run[key] for run in runs) for key in ('wall_ms', 'ready_ms', 'request_ms', 'rss_mb')}
+            self.stdout.write(
+                f"{settings_module}: wall {median['wall_ms']:.0f} ms (max {max(run['wall_ms'] for run in runs):.0f}), "
+                f"setup {median['ready_ms']:.0f} ms, first request {median['request_ms']:.0f} ms "
+                f"[{runs[0]['status']}], peak RSS {median['rss_mb']:.1f} MB over {len(runs)} run(s)."
+            )
+            if median['wall_ms'] > options['max_wall_ms']:
+                over_budget.append(f"{settings_module}: wall time {median['wall_ms']:.0f} ms > {options['max_wall_ms']:g} ms")
+            if median['rss_mb'] > options['max_rss_mb']:
+                over_budget.append(f"{settings_module}: peak RSS {median['rss_mb']:.1f} MB > {options['max_rss_mb']:g} MB")
+        if not options['token']:
+            self.stdout.write(self.style.WARNING(
+                'The first request was anonymous and rejected before touching the database (no driver import, '
+                'connection or query); pass --token to measure a complete cold start.'
+            ))
+        if over_budget:
+            raise CommandError('Cold start over budget: ' + '; '.join(over_budget))
+        self.stdout.write(self.style.SUCCESS('Cold start within budget.'))
@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from polls.benchmarking import best_of, throwaway_database
+from polls.models import Poll, Choice
+from polls.serializers import PollListSerializer, PollValuesSerializer
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the poll listing serialization: DRF PollListSerializer over model instances '
+        'versus PollValuesSerializer over .values() rows. Runs on a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polls', type=int, nargs='+', default=[1000, 10000], help='Poll counts to benchmark.')
+        parser.add_argument('--choices', type=int, default=3, help='Choices per poll.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported).')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            creator = User.objects.create_user(username='bench')
+            seeded = 0
+            for total in sorted(options['polls']):
+                self._seed(creator, total - seeded, options['choices'])
+                seeded = total
+                self._measure(total, options['repeat'])
+
+    def _seed(self, creator, count, choices_per_poll):
+        polls = Poll.objects.bulk_create(
+            Poll(title=f'Poll {i}', description='Lorem ipsum dolor sit amet. ' * 20, created_by=creator)
+            for i in range(count)
+        )
+        Choice.objects.bulk_create(
+            Choice(poll=poll, choice_text=f'Option {j}') for poll in polls for j in range(choices_per_poll)
+        )
+
+    def _measure(self, total, repeat):
+        renderer = JSONRenderer()
+        fields = [field for field in PollListSerializer.Meta.fields if field not in ('choices', 'created_by')]
+
+        def model_serializer():
+            queryset = (
+                Poll.objects.order_by('-created_at', '-id')
+                .select_related('created_by')
+                .only(*fields, 'created_by', 'created_by__username')
+                .prefetch_related(Prefetch('choices', queryset=Choice.objects.only('id', 'choice_text', 'poll').order_by('id')))
+            )
+            return renderer.render(PollListSerializer(queryset, many=True).data)
+
+        def values_serializer():
+            serializer = PollValuesSerializer(PollListSerializer)
+            rows = list(Poll.objects.order_by('-created_at', '-id').values(*serializer.values_columns()))
+            return renderer.render(serializer.to_representation(rows))
+
+        slow, slow_output = best_of(repeat, model_serializer)
+        fast, fast_output = best_of(repeat, values_serializer)
+        if slow_output != fast_output:
+            raise CommandError(f'Outputs differ for {total} polls.')
+
+        self.stdout.write(
+            f'{total:>7} polls: PollListSerializer {slow * 1000:9.1f} ms | '
+            f'PollValuesSerializer {fast * 1000:9.1f} ms | speedup {slow / fast:5.2f}x'
+        )
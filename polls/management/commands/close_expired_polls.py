@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from polls.expiry import close_expired_polls, expired_polls
+
+class Command(BaseCommand):
+    help = (
+        'Closes active polls whose deadline has passed (one bulk UPDATE) and freezes their final results. '
+        'Meant to run from cron, e.g. every minute.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only list the polls that would be closed.',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            poll_ids = list(expired_polls().order_by('deadline').values_list('pk', flat=True))
+            for poll_id in poll_ids:
+                self.stdout.write(f'Poll {poll_id} would be closed.')
+            self.stdout.write(self.style.SUCCESS(f'{len(poll_ids)} expired poll(s) found.'))
+            return
+
+        poll_ids = close_expired_polls()
+        if options['verbosity'] >= 2:
+            for poll_id in poll_ids:
+                self.stdout.write(f'Poll {poll_id} closed.')
+        self.stdout.write(self.style.SUCCESS(f'Closed {len(poll_ids)} expired poll(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from polls.counters import compact_vote_shards
+
+class Command(BaseCommand):
+    help = 'Folds the sharded vote counters (VOTE_COUNTER_SHARDS) back into Choice.vote_count. Meant to run periodically, e.g. from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', dest='poll_ids', type=int, action='append', default=[],
+            help='Restrict the compaction to this poll ID (may be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        compacted = compact_vote_shards(options['poll_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Compacted vote counter shards for {compacted} choice(s).'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, vote_rows
+
+class Command(BaseCommand):
+    help = 'Streams every vote (optionally of the given polls) as CSV or NDJSON, using constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', dest='poll_ids', type=int, action='append', default=[],
+            help='Restrict the export to this poll ID (may be repeated).',
+        )
+        parser.add_argument('--output', choices=sorted(EXPORT_FORMATS), default='csv', help='Output format.')
+        parser.add_argument('--file', help='Write to this file instead of stdout.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Rows fetched from the database and written per batch.',
+        )
+
+    def handle(self, *args, **options):
+        _, render, _ = EXPORT_FORMATS[options['output']]
+        chunks = render(vote_rows(options['poll_ids'] or None, options['chunk_size']), options['chunk_size'])
+
+        if not options['file']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        try:
+            with open(options['file'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        except OSError as exc:
+            raise CommandError(f'Cannot write {options["file"]}: {exc}')
+        self.stderr.write(self.style.SUCCESS(f'Votes exported to {options["file"]}.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from polls.vote_buffer import VoteBuffer, flush_vote_buffer, get_vote_buffer
+
+class Command(BaseCommand):
+    help = (
+        'Writes the votes waiting in the write-behind vote buffer (VOTE_BUFFER_PATH) to the database in batches. '
+        'Use it to replay a buffer left behind by a server that is no longer running with VOTE_WRITE_BEHIND.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Buffer file to flush (default: VOTE_BUFFER_PATH).')
+        parser.add_argument('--batch-size', type=int, help='Votes per batch (default: BULK_VOTE_CHUNK_SIZE).')
+
+    def handle(self, *args, **options):
+        buffer = VoteBuffer(options['path']) if options['path'] else get_vote_buffer()
+        pending = len(buffer)
+        totals = flush_vote_buffer(buffer, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Flushed {pending} buffered vote(s): {totals['accepted']} accepted, "
+            f"{totals['duplicate']} duplicate, {totals['invalid']} invalid."
+        ))
@@ -0,0 +1,78 @@
+import csv
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.provisioning import CREATED, import_voters, summarize
+
+class Command(BaseCommand):
+    help = (
+        'Registers voters in bulk from a CSV file (header: username,email,password) or a JSONL file '
+        '(one {"username", "email", "password"} object per line). email and password are optional. '
+        'Passwords are hashed in a process pool; users and their auth tokens are inserted in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import ("-" reads from stdin).')
+        parser.add_argument(
+            '--input-format', choices=['csv', 'jsonl'], default=None,
+            help='File format (defaults to the file extension; stdin defaults to jsonl).',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Records validated and inserted per batch (defaults to settings.VOTER_IMPORT_CHUNK_SIZE).',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Processes hashing passwords (defaults to settings.VOTER_IMPORT_WORKERS, or one per CPU core).',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['input_format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        if path == '-':
+            self._import(sys.stdin, input_format, options)
+            return
+        try:
+            with open(path, encoding='utf-8', newline='') as lines:
+                self._import(lines, input_format, options)
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def _import(self, lines, input_format, options):
+        line_numbers = []
+        records = self._csv_records(lines, line_numbers) if input_format == 'csv' else self._jsonl_records(lines, line_numbers)
+        results = import_voters(records, options['chunk_size'], options['workers'])
+        progress_every = options['chunk_size'] or settings.VOTER_IMPORT_CHUNK_SIZE
+        totals = summarize(self._report(results, line_numbers, progress_every))
+        self.stdout.write(self.style.SUCCESS(
+            f'{totals["created"]} voter(s) created, {totals["duplicate"]} duplicate(s), {totals["invalid"]} invalid.'
+        ))
+
+    def _jsonl_records(self, lines, line_numbers):
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            line_numbers.append(number)
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield line # Rejeitado pela validação como registro inválido
+
+    def _csv_records(self, lines, line_numbers):
+        reader = csv.DictReader(lines)
+        for row in reader:
+            line_numbers.append(reader.line_num)
+            # Colunas vazias valem como omitidas (sem email, sem senha)
+            yield {key: value for key, value in row.items() if key and value}
+
+    def _report(self, results, line_numbers, progress_every):
+        for count, result in enumerate(results, start=1):
+            if result['status'] != CREATED:
+                line = line_numbers[result['index']]
+                self.stdout.write(f'Line {line}: {result["status"]} {json.dumps(result["errors"], ensure_ascii=False)}')
+            if count % progress_every == 0:
+                self.stdout.write(f'Processed {count} record(s)...')
+            yield result
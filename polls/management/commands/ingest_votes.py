@@ -0,0 +1,54 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.ingestion import ACCEPTED, ingest_votes, summarize
+
+class Command(BaseCommand):
+    help = (
+        'Ingests votes collected offline from a JSONL file, one {"user", "poll", "choice", "voted_at"} '
+        'object per line (user is an ID or a username). Rejected lines are reported with their line number.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file to ingest ("-" reads from stdin).')
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Records validated and inserted per batch (defaults to settings.BULK_VOTE_CHUNK_SIZE).',
+        )
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            self._ingest(sys.stdin, options['chunk_size'])
+            return
+        try:
+            with open(options['path'], encoding='utf-8') as lines:
+                self._ingest(lines, options['chunk_size'])
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+
+    def _ingest(self, lines, chunk_size):
+        line_numbers = []
+
+        def records():
+            for number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                line_numbers.append(number)
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield line # Rejeitado pela validação como registro inválido
+
+        totals = summarize(self._report(ingest_votes(records(), chunk_size), line_numbers))
+        self.stdout.write(self.style.SUCCESS(
+            f'{totals["accepted"]} vote(s) accepted, {totals["duplicate"]} duplicate(s), {totals["invalid"]} invalid.'
+        ))
+
+    def _report(self, results, line_numbers):
+        for result in results:
+            if result['status'] != ACCEPTED:
+                line = line_numbers[result['index']]
+                self.stdout.write(f'Line {line}: {result["status"]} {json.dumps(result["errors"], ensure_ascii=False)}')
+            yield result
@@ -0,0 +1,52 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.coldstart import package_totals, profile_imports
+
+class Command(BaseCommand):
+    help = (
+        'Profiles a cold start (fresh interpreter importing cyber_civics_api.wsgi and serving one request) '
+        'with python -X importtime and reports the import cost per package and the most expensive modules.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-module', default=os.environ.get('DJANGO_SETTINGS_MODULE'),
+            help='DJANGO_SETTINGS_MODULE of the profiled process (default: the current one), e.g. cyber_civics_api.settings_api.',
+        )
+        parser.add_argument('--path', default='/api/polls/', help='URL of the first request.')
+        parser.add_argument(
+            '--token', default=os.environ.get('COLD_START_TOKEN'),
+            help='API token sent with the first request, so the database driver is imported too (default: $COLD_START_TOKEN).',
+        )
+        parser.add_argument('--limit', type=int, default=25, help='Modules to list.')
+        parser.add_argument(
+            '--sort', choices=('self', 'cumulative'), default='cumulative',
+            help='Order modules by their own import time or including the modules they import.',
+        )
+        parser.add_argument('--package', help='Only list modules of this top-level package (e.g. polls).')
+
+    def handle(self, *args, **options):
+        try:
+            timings = profile_imports(options['settings_module'], options['path'], options['token'])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        total_us = sum(timing.self_us for timing in timings)
+        self.stdout.write(
+            f"{len(timings)} modules imported in {total_us / 1000:.1f} ms ({options['settings_module']})."
+        )
+
+        self.stdout.write('\nBy package (self time):')
+        for package, self_us in package_totals(timings)[:options['limit']]:
+            self.stdout.write(f'  {self_us / 1000:8.1f} ms  {self_us / total_us:6.1%}  {package}')
+
+        if options['package']:
+            prefix = options['package'] + '.'
+            timings = [timing for timing in timings if timing.module == options['package'] or timing.module.startswith(prefix)]
+        key = 'self_us' if options['sort'] == 'self' else 'cumulative_us'
+        timings = sorted(timings, key=lambda timing: getattr(timing, key), reverse=True)
+        self.stdout.write(f"\nTop modules ({options['sort']} time):")
+        self.stdout.write(f"  {'self':>8}  {'cumulative':>10}  module")
+        for timing in timings[:options['limit']]:
+            self.stdout.write(f'  {timing.self_us / 1000:5.1f} ms  {timing.cumulative_us / 1000:7.1f} ms  {timing.module}')
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.counters import find_vote_count_mismatches, rebuild_vote_counts
+from polls.models import Choice
+from polls.snapshots import refresh_results_snapshots
+
+class Command(BaseCommand):
+    help = 'Rebuilds (or, with --verify, only checks) the denormalized per-choice vote counters from the Vote rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', dest='poll_ids', type=int, action='append', default=[],
+            help='Restrict the operation to this poll ID (may be repeated).',
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report choices whose counter differs from the Vote rows; exits with an error if any is found.',
+        )
+
+    def handle(self, *args, **options):
+        poll_ids = options['poll_ids'] or None
+
+        mismatches = find_vote_count_mismatches(poll_ids)
+        for choice_id, stored, actual in mismatches:
+            self.stdout.write(f'Choice {choice_id}: counter={stored} votes={actual}')
+
+        if options['verify']:
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} choice counter(s) out of sync with the Vote table.')
+            self.stdout.write(self.style.SUCCESS('All vote counters match the Vote table.'))
+            return
+
+        updated = rebuild_vote_counts(poll_ids)
+        # Os resultados finais congelados das enquetes encerradas com contadores corrigidos são regravados
+        choice_ids = [choice_id for choice_id, _, _ in mismatches]
+        refresh_results_snapshots(Choice.objects.filter(pk__in=choice_ids).values_list('poll_id', flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt vote counters for {updated} choice(s); {len(mismatches)} were out of sync.'
+        ))
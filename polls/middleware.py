@@ -0,0 +1,54 @@
+"""
+Métricas de hash de senha no cabeçalho ``Server-Timing``.
+
+Login e registro calculam o hash da senha no pool de hashes (polls.hashing).
+Quando a requisição passou pelo pool, a resposta informa quanto tempo ela
+esperou na fila (``hash-wait``) e quanto durou o hash (``hash``), em
+milissegundos: ``Server-Timing: hash-wait;dur=12.3, hash;dur=410.5``. Visível
+no painel de rede dos navegadores e fácil de extrair dos logs do proxy.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .hashing import hash_timings
+
+
+def _server_timing(timings):
+    wait = sum(wait for wait, _ in timings) * 1000
+    duration = sum(duration for _, duration in timings) * 1000
+    return f'hash-wait;dur={wait:.1f}, hash;dur={duration:.1f}'
+
+
+class HashTimingMiddleware:
+    """Acrescenta ``Server-Timing`` às respostas de requisições que calcularam hashes de senha."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = []
+        reset = hash_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            hash_timings.reset(reset)
+        if timings:
+            response['Server-Timing'] = _server_timing(timings)
+        return response
+
+    async def __acall__(self, request):
+        timings = []
+        reset = hash_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            hash_timings.reset(reset)
+        if timings:
+            response['Server-Timing'] = _server_timing(timings)
+        return response
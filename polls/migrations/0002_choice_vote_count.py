@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 01:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_vote_counts(apps, schema_editor):
+    """Preenche o contador de votos das opções existentes a partir da tabela de votos."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    votes_per_choice = (
+        Vote.objects.filter(choice=OuterRef('pk'))
+        .order_by()
+        .values('choice')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Choice.objects.update(vote_count=Coalesce(Subquery(votes_per_choice), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_vote_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceVoteShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('vote_count', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_shards', to='polls.choice')),
+            ],
+            options={
+                'unique_together': {('choice', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 01:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['-created_at', '-id'], name='polls_poll_created_id_idx'),
+        ),
+    ]
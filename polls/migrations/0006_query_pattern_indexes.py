@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 01:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_poll_created_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='polls_poll_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['is_proposal', '-created_at', '-id'], name='polls_poll_proposal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(condition=models.Q(('deadline__isnull', False), ('is_active', True)), fields=['deadline'], name='polls_poll_open_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['poll', 'choice'], name='polls_vote_poll_choice_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['voted_at'], name='polls_vote_voted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 01:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
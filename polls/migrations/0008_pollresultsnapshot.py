@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 01:32
+
+import django.db.models.deletion
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_vote_voted_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollResultSnapshot',
+            fields=[
+                ('poll', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result_snapshot', serialize=False, to='polls.poll')),
+                ('payload', models.JSONField(encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_pollresultsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
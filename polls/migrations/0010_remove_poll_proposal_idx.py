@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 03:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_poll_closed_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='poll',
+            name='polls_poll_proposal_idx',
+        ),
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import connections, models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 
 class Poll(models.Model):
     """Representa uma enquete ou proposta."""
@@ -9,23 +10,53 @@ class Poll(models.Model):
     description = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_polls')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True) # Usado para o ETag da listagem/detalhe
     deadline = models.DateTimeField(null=True, blank=True) # Data limite para votar
     is_active = models.BooleanField(default=True) # Indica se a enquete está aberta para votação
     is_proposal = models.BooleanField(default=False) # True se for uma proposta de usuário, False se for uma enquete de admin
+    # Quando a varredura de prazos (polls.expiry) encerrou a enquete; None se está ativa ou foi encerrada
+    # por um admin. Votos offline dados até esse instante (e até o prazo) ainda são aceitos pela ingestão
+    closed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Suporta a paginação por cursor da listagem (ORDER BY created_at DESC, id DESC)
+            models.Index(fields=['-created_at', '-id'], name='polls_poll_created_id_idx'),
+            # Listagem das enquetes abertas, na mesma ordem (índice parcial: só as ativas)
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_active=True), name='polls_poll_active_created_idx'),
+            # Varredura de enquetes abertas que já passaram do prazo (índice parcial: só as ativas com prazo)
+            models.Index(
+                fields=['deadline'],
+                condition=models.Q(is_active=True, deadline__isnull=False),
+                name='polls_poll_open_deadline_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self.is_active:
+            self.closed_at = None # Reaberta: um novo encerramento não herda o da varredura
+        super().save(*args, **kwargs)
+
     def clean(self):
         # Validação simples: a data limite não pode ser no passado (a menos que já esteja inativa)
         if self.deadline and self.deadline < timezone.now() and self.is_active:
              raise ValidationError('A data limite não pode ser no passado para uma enquete ativa.')
 
 
+# Opções criadas com toda enquete/proposta (e adicionadas às antigas por add_default_choices_to_existing_polls)
+DEFAULT_CHOICE_TEXTS = ("Concordo", "Discordo", "Neutro")
+
+
 class Choice(models.Model):
     """Representa uma opção de voto em uma enquete."""
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='choices')
     choice_text = models.CharField(max_length=255)
+    # Contador desnormalizado de votos, mantido por polls.counters na mesma transação do voto
+    vote_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True) # Usado para o ETag da listagem/detalhe
 
     def __str__(self):
         return f"{self.poll.title}: {self.choice_text}"
@@ -34,15 +65,77 @@ class Choice(models.Model):
         unique_together = ('poll', 'choice_text') # Garante que não há opções duplicadas na mesma enquete
 
 
+class ChoiceVoteShard(models.Model):
+    """Fatia do contador de votos de uma opção, usada no modo de contadores distribuídos (VOTE_COUNTER_SHARDS)."""
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='vote_shards')
+    shard = models.PositiveSmallIntegerField()
+    vote_count = models.IntegerField(default=0) # Delta ainda não consolidado em Choice.vote_count (pode ser negativo)
+
+    class Meta:
+        unique_together = ('choice', 'shard') # Uma linha por fatia de cada opção
+
+    def __str__(self):
+        return f"{self.choice_id}#{self.shard}: {self.vote_count}"
+
+
+class VoteManager(models.Manager):
+    """Manager de Vote com o caminho rápido de inserção usado pela API de votação."""
+
+    def insert_if_open(self, user_id, poll_id, choice_id, voted_at):
+        """
+        Grava o voto com um único ``INSERT ... SELECT`` que só produz uma linha se a
+        opção pertence à enquete e a enquete está ativa e dentro do prazo.
+
+        Retorna o id do voto criado, ou None se nenhuma linha foi inserida. A regra de
+        um voto por usuário continua a cargo da constraint (user, poll): um voto
+        duplicado levanta IntegrityError.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        vote, choice, poll = self.model._meta, Choice._meta, Poll._meta
+
+        def col(opts, name):
+            return qn(opts.get_field(name).column)
+
+        sql = (
+            f"INSERT INTO {qn(vote.db_table)} "
+            f"({col(vote, 'user')}, {col(vote, 'poll')}, {col(vote, 'choice')}, {col(vote, 'voted_at')}) "
+            f"SELECT %s, c.{col(choice, 'poll')}, c.{col(choice, 'id')}, %s "
+            f"FROM {qn(choice.db_table)} c "
+            f"INNER JOIN {qn(poll.db_table)} p ON p.{col(poll, 'id')} = c.{col(choice, 'poll')} "
+            f"WHERE c.{col(choice, 'id')} = %s AND c.{col(choice, 'poll')} = %s "
+            f"AND p.{col(poll, 'is_active')} = %s "
+            f"AND (p.{col(poll, 'deadline')} IS NULL OR p.{col(poll, 'deadline')} >= %s)"
+        )
+        now = connection.ops.adapt_datetimefield_value(voted_at)
+        params = [user_id, now, choice_id, poll_id, True, now]
+
+        with connection.cursor() as cursor:
+            if connection.features.can_return_columns_from_insert:
+                cursor.execute(f"{sql} RETURNING {col(vote, 'id')}", params)
+                row = cursor.fetchone()
+                return row[0] if row else None
+            cursor.execute(sql, params)
+            return cursor.lastrowid if cursor.rowcount else None
+
+
 class Vote(models.Model):
     """Registra o voto de um usuário em uma opção de uma enquete."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='votes')
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='votes_for_poll') # Relação para facilitar consultas
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='votes')
-    voted_at = models.DateTimeField(auto_now_add=True)
+    voted_at = models.DateTimeField(default=timezone.now) # Não é auto_now_add: a ingestão em massa grava o horário original do voto
+
+    objects = VoteManager()
 
     class Meta:
         unique_together = ('user', 'poll') # Garante que um usuário vota apenas uma vez por enquete
+        indexes = [
+            # Índice de cobertura para contar votos por opção de uma enquete (rebuild_vote_counts, exportações)
+            models.Index(fields=['poll', 'choice'], name='polls_vote_poll_choice_idx'),
+            # Filtro por data de voto no admin
+            models.Index(fields=['voted_at'], name='polls_vote_voted_at_idx'),
+        ]
 
     def clean(self):
         # Validação para garantir que o voto é para uma opção da enquete correta
@@ -50,4 +143,15 @@ class Vote(models.Model):
              raise ValidationError('A opção de voto não pertence a esta enquete.')
 
     def __str__(self):
-        return f"{self.user.username} votou em '{self.choice.choice_text}' na enquete '{self.poll.title}'"
\ No newline at end of file
+        return f"{self.user.username} votou em '{self.choice.choice_text}' na enquete '{self.poll.title}'"
+
+
+class PollResultSnapshot(models.Model):
+    """Resultados finais congelados de uma enquete encerrada (gravados por polls.snapshots)."""
+    poll = models.OneToOneField(Poll, on_delete=models.CASCADE, primary_key=True, related_name='result_snapshot')
+    # Payload completo do endpoint de resultados; o encoder do DRF grava datas no mesmo formato da resposta
+    payload = models.JSONField(encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Snapshot de {self.poll_id} ({self.created_at:%Y-%m-%d %H:%M})"
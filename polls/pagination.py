@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+class PollCursorPagination(CursorPagination):
+    """
+    Paginação por cursor para a listagem de enquetes.
+
+    O cursor do DRF guarda o ``created_at`` da última enquete da página e quantas enquetes
+    com esse mesmo ``created_at`` já foram entregues. Cada página é buscada com
+    ``WHERE created_at < <cursor> ORDER BY created_at DESC, id DESC LIMIT n OFFSET k`` sobre o
+    índice (created_at, id): o filtro é só no ``created_at`` e o ``id`` apenas desempata a
+    ordem, com ``k`` pulando os empates já entregues. Como ``created_at`` tem microssegundos,
+    ``k`` é quase sempre 0 e páginas profundas custam o mesmo que a primeira, ao contrário de
+    LIMIT/OFFSET; só uma rajada de enquetes com o mesmo instante faria o OFFSET crescer.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size' # Permite ao cliente escolher o tamanho da página...
+    max_page_size = 100 # ...até este limite
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator do admin para tabelas grandes.
+
+    Sem filtros, o total de linhas vem da estimativa do banco (``estimated_row_count``) em
+    vez de um ``COUNT(*)`` que percorre a tabela inteira; a última página pode ficar vazia
+    se a estimativa passar do total real. Com filtros (busca, ``date_hierarchy``) o total é
+    exato, contado pelos índices do filtro. Tabelas com menos de ``ADMIN_EXACT_COUNT_LIMIT``
+    linhas também são contadas.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        estimate = estimated_row_count(queryset.model)
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+def estimated_row_count(model):
+    """
+    Número aproximado de linhas da tabela do modelo, sem percorrê-la: ``reltuples`` das
+    estatísticas do PostgreSQL ou, nos demais bancos, o maior id (votos excluídos fazem a
+    estimativa passar do total). None se o banco ainda não tem estimativa.
+    """
+    connection = connections[router.db_for_read(model)]
+    qn = connection.ops.quote_name
+    opts = model._meta
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [opts.db_table])
+        else:
+            cursor.execute(f'SELECT MAX({qn(opts.pk.column)}) FROM {qn(opts.db_table)}')
+        row = cursor.fetchone()
+    # reltuples é -1 numa tabela que ainda não passou por ANALYZE
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
@@ -0,0 +1,126 @@
+"""
+Cadastro em massa de eleitores (listas de eleitores de um município).
+
+Os registros ``{username, email, password}`` são processados em lotes: cada lote
+é validado por conjunto (uma consulta para os usernames já cadastrados; os
+emails cadastrados são lidos uma vez por importação), as senhas são
+transformadas em hash em paralelo (polls.hashing) e os usuários e seus tokens
+de autenticação são gravados com dois ``bulk_create`` na mesma transação.
+
+Um username já cadastrado, ou repetido na própria lista, é reportado como
+duplicado; o mesmo vale para o email (sem diferenciar maiúsculas), quando
+informado.
+"""
+import os
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from rest_framework.authtoken.models import Token
+
+from .hashing import PasswordHasher
+from .ingestion import DUPLICATE, INVALID
+from .serializers import VoterRecordSerializer
+
+CREATED = 'created'
+
+DUPLICATE_USERNAME_MESSAGE = "Já existe um usuário com este username."
+DUPLICATE_EMAIL_MESSAGE = "Já existe um usuário com este email."
+
+
+def import_voters(records, chunk_size=None, workers=None):
+    """
+    Cadastra os eleitores e gera um resultado por registro, na ordem de entrada.
+
+    Cada resultado é ``{'index': i, 'status': 'created' | 'duplicate' | 'invalid'}``,
+    com ``'errors'`` (no formato dos erros do DRF) quando o usuário não foi criado. Os
+    registros são consumidos sob demanda, um lote de ``chunk_size`` por vez; os hashes
+    usam ``workers`` processos (padrão: ``VOTER_IMPORT_WORKERS``, ou um por núcleo).
+    """
+    chunk_size = chunk_size or settings.VOTER_IMPORT_CHUNK_SIZE
+    workers = workers or settings.VOTER_IMPORT_WORKERS or os.cpu_count()
+    # Os emails não têm índice: uma leitura só, em vez de uma varredura por lote
+    emails = set(User.objects.exclude(email='').annotate(email_lower=Lower('email')).values_list('email_lower', flat=True))
+    usernames = set() # Usernames já vistos nesta importação
+    records = iter(records)
+    start = 0
+    with PasswordHasher(workers) as hasher:
+        while chunk := list(islice(records, chunk_size)):
+            yield from _import_chunk(chunk, start, hasher, usernames, emails)
+            start += len(chunk)
+
+
+def summarize(results):
+    """Conta os resultados por status: ``{'created': n, 'duplicate': n, 'invalid': n}``."""
+    totals = Counter({CREATED: 0, DUPLICATE: 0, INVALID: 0})
+    totals.update(result['status'] for result in results)
+    return dict(totals)
+
+
+def _import_chunk(chunk, start, hasher, usernames, emails):
+    results = [None] * len(chunk)
+    parsed = []
+    for position, record in enumerate(chunk):
+        serializer = VoterRecordSerializer(data=record)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            # As mesmas normalizações de create_user
+            data['username'] = User.normalize_username(data['username'])
+            data['email'] = User.objects.normalize_email(data.get('email', ''))
+            parsed.append((position, data))
+        else:
+            results[position] = _result(start + position, INVALID, serializer.errors)
+
+    taken = set(User.objects.filter(username__in=[data['username'] for _, data in parsed]).values_list('username', flat=True))
+    accepted = []
+    for position, data in parsed:
+        username, email = data['username'], data['email']
+        if username in taken or username in usernames:
+            results[position] = _result(start + position, DUPLICATE, {'username': [DUPLICATE_USERNAME_MESSAGE]})
+        elif email and email.lower() in emails:
+            results[position] = _result(start + position, DUPLICATE, {'email': [DUPLICATE_EMAIL_MESSAGE]})
+        else:
+            usernames.add(username)
+            if email:
+                emails.add(email.lower())
+            accepted.append((position, data))
+
+    hashes = hasher.hash(data.get('password') for _, data in accepted)
+    users = {
+        position: User(username=data['username'], email=data['email'], password=password_hash)
+        for (position, data), password_hash in zip(accepted, hashes)
+    }
+    try:
+        _create_users(users.values())
+    except IntegrityError:
+        # Um username cadastrado por outro caminho (ex.: registro pela API) desde a consulta acima
+        raced = set(User.objects.filter(username__in=[user.username for user in users.values()]).values_list('username', flat=True))
+        for position, user in list(users.items()):
+            if user.username in raced:
+                results[position] = _result(start + position, DUPLICATE, {'username': [DUPLICATE_USERNAME_MESSAGE]})
+                del users[position]
+            else:
+                user.pk = None # Id atribuído pelo INSERT desfeito
+        _create_users(users.values())
+    for position in users:
+        results[position] = _result(start + position, CREATED)
+    return results
+
+
+def _create_users(users):
+    users = list(users)
+    if not users:
+        return
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        Token.objects.bulk_create(Token(user=user, key=Token.generate_key()) for user in users)
+
+
+def _result(index, status, errors=None):
+    result = {'index': index, 'status': status}
+    if errors:
+        result['errors'] = errors
+    return result
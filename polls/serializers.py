@@ -1,8 +1,15 @@
 from rest_framework import serializers
+from rest_framework.authtoken.serializers import AuthTokenSerializer
 from django.contrib.auth.models import User
-from django.db import IntegrityError
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from django.http import Http404
 from django.utils import timezone
 from .models import Poll, Choice, Vote
+from .counters import increment_vote_count
+from .caching import bump_results_version
+from .hashing import hash_password
+from .voted_index import voted_index
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer para registro de usuário."""
@@ -13,13 +20,22 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         fields = ('username', 'email', 'password')
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data.get('email', ''), # Email opcional
-            password=validated_data['password']
+        # Como create_user, mas com o hash no pool de hashes (polls.hashing); a view assíncrona
+        # de registro já calcula o hash fora do event loop e o envia em password_hash
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data.get('email', '')), # Email opcional
         )
+        user.password = validated_data.get('password_hash') or hash_password(validated_data['password'])
+        user.save()
         return user
 
+class LoginSerializer(AuthTokenSerializer):
+    """Os campos do login do DRF, sem autenticar em ``validate``: a view assíncrona de login autentica com ``aauthenticate``."""
+
+    def validate(self, attrs):
+        return attrs
+
 class ChoiceSerializer(serializers.ModelSerializer):
     """Serializer para opções de voto."""
     class Meta:
@@ -38,6 +54,60 @@ class PollSerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'description', 'created_by', 'created_at', 'deadline', 'is_active', 'is_proposal', 'choices')
         read_only_fields = ('created_at',) # created_at é gerado automaticamente
 
+class PollListSerializer(PollSerializer):
+    """Representação compacta das Enquetes/Propostas na listagem (sem a descrição, que pode ser longa)."""
+    class Meta(PollSerializer.Meta):
+        fields = ('id', 'title', 'created_by', 'created_at', 'deadline', 'is_active', 'is_proposal', 'choices')
+
+class PollValuesSerializer:
+    """
+    Serialização de leitura de alto desempenho para PollSerializer / PollListSerializer.
+
+    Em vez de instanciar modelos e campos de serializer por objeto, trabalha sobre as
+    linhas de ``.values(*serializer.values_columns())`` e busca as opções de todas as
+    enquetes da página em uma única consulta, montando dicts simples. A saída é
+    idêntica à do serializer de modelo correspondente (mesmos campos, mesma ordem,
+    mesmo formato de datas).
+    """
+    _datetime = serializers.DateTimeField() # Reaproveita a formatação de datas do DRF
+    _datetime_fields = ('created_at', 'deadline')
+    _choice_columns = {'id': 'id', 'choice_text': 'choice_text', 'poll': 'poll_id'}
+
+    def __init__(self, serializer_class):
+        self.fields = serializer_class.Meta.fields
+        self.choice_fields = ChoiceSerializer.Meta.fields
+
+    def values_columns(self):
+        """Colunas a pedir em ``.values()`` para alimentar ``to_representation``."""
+        columns = [field for field in self.fields if field not in ('choices', 'created_by')]
+        return [*columns, 'created_by__username']
+
+    def to_representation(self, rows):
+        choices_by_poll = {row['id']: [] for row in rows}
+        choice_columns = [self._choice_columns[field] for field in self.choice_fields]
+        choices = (
+            Choice.objects.filter(poll_id__in=list(choices_by_poll))
+            .order_by('id')
+            .values_list(*choice_columns)
+        )
+        for choice in choices:
+            choice = dict(zip(self.choice_fields, choice))
+            choices_by_poll[choice['poll']].append(choice)
+        return [self._poll(row, choices_by_poll[row['id']]) for row in rows]
+
+    def _poll(self, row, choices):
+        data = {}
+        for field in self.fields:
+            if field == 'choices':
+                data[field] = choices
+            elif field == 'created_by':
+                data[field] = row['created_by__username']
+            elif field in self._datetime_fields:
+                data[field] = self._datetime.to_representation(row[field])
+            else:
+                data[field] = row[field]
+        return data
+
 class PollCreateSerializer(serializers.ModelSerializer):
     """Serializer para criação de Enquetes/Propostas (para diferenciar a lógica de permissão/is_proposal)."""
     # Note que choices não está aqui, pois serão criadas separadamente ou por outra view/action
@@ -45,9 +115,36 @@ class PollCreateSerializer(serializers.ModelSerializer):
         model = Poll
         fields = ('title', 'description', 'deadline') # Campos que podem ser definidos na criação
 
+# Mensagens de erro da votação (reaproveitadas por outros caminhos de gravação de votos)
+CHOICE_NOT_IN_POLL_MESSAGE = "Esta opção não pertence a esta enquete."
+POLL_CLOSED_MESSAGE = "Não é possível votar em uma enquete inativa ou expirada."
+ALREADY_VOTED_MESSAGE = "Você já votou nesta enquete."
+
+def raise_vote_rejection(poll_id, choice_id):
+    """Descobre por que o voto não foi aceito (só roda no caminho de erro) e levanta o erro adequado."""
+    poll = Poll.objects.filter(pk=poll_id).values('is_active', 'deadline').first()
+    if poll is None:
+        raise Http404(f"No {Poll._meta.object_name} matches the given query.")
+
+    choice_poll_id = Choice.objects.filter(pk=choice_id).values_list('poll_id', flat=True).first()
+    if choice_poll_id is None:
+        message = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+        raise serializers.ValidationError({"choice": [message.format(pk_value=choice_id)]})
+
+    # Validar se a opção pertence à enquete fornecida no contexto
+    if choice_poll_id != poll_id:
+        raise serializers.ValidationError({"choice": [CHOICE_NOT_IN_POLL_MESSAGE]}) # Use lista para consistência com outros erros
+
+    # Caso contrário a enquete está inativa ou expirada
+    raise serializers.ValidationError({"non_field_errors": [POLL_CLOSED_MESSAGE]}) # Use non_field_errors para erros gerais
+
+
 class VoteSerializer(serializers.ModelSerializer):
     """Serializer para registrar um voto."""
     user = serializers.ReadOnlyField(source='user.username') # Exibe o nome do usuário (somente leitura)
+    # A opção é validada apenas como inteiro: a existência e a posse pela enquete são
+    # verificadas pelo próprio INSERT em create(), sem uma consulta extra para carregar a Choice
+    choice = serializers.IntegerField(source='choice_id')
 
     class Meta:
         model = Vote
@@ -58,37 +155,70 @@ class VoteSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = self.context['request'].user
-        # Obtenha o objeto poll do contexto que a view passou
-        poll = self.context.get('poll') # Use .get() para segurança, embora a view o forneça
+        # Obtenha o id da enquete do contexto que a view passou (a view não carrega a enquete)
+        poll_id = self.context.get('poll_id')
 
         # Verificação caso o poll não esteja no contexto (não deve acontecer com a view correta)
-        if not poll:
+        if poll_id is None:
              raise serializers.ValidationError("Erro interno: Enquete não fornecida no contexto.")
 
-        choice = validated_data['choice']
+        choice_id = validated_data['choice_id']
+        voted_at = timezone.now()
 
-        # Validar se a opção pertence à enquete fornecida no contexto
-        if choice.poll != poll:
-            raise serializers.ValidationError({"choice": ["Esta opção não pertence a esta enquete."]}) # Use lista para consistência com outros erros
+        # Nova tentativa de quem já votou (retry, clique duplo): recusada sem ir ao banco
+        if voted_index.get(user.pk, poll_id) is not None:
+            raise serializers.ValidationError({"non_field_errors": [ALREADY_VOTED_MESSAGE]})
 
-        # Validar se a enquete está ativa (agora usa o objeto poll do contexto)
-        if not poll.is_active or (poll.deadline and poll.deadline < timezone.now()):
-             raise serializers.ValidationError({"non_field_errors": ["Não é possível votar em uma enquete inativa ou expirada."]}) # Use non_field_errors para erros gerais
+        # Caminho rápido: um único INSERT ... SELECT valida posse da opção, enquete ativa e prazo,
+        # e a constraint unique_together (user, poll) impede o voto duplicado.
+        try:
+            with transaction.atomic():
+                vote_id = Vote.objects.insert_if_open(user.pk, poll_id, choice_id, voted_at)
+                if vote_id is None:
+                    raise_vote_rejection(poll_id, choice_id)
+                # Atualiza o contador da opção na mesma transação, para que os resultados nunca divirjam dos votos
+                increment_vote_count(choice_id)
+                bump_results_version(poll_id) # Invalida os resultados em cache após o commit
+                transaction.on_commit(lambda: voted_index.add(user.pk, poll_id, vote_id, choice_id, voted_at))
+        except IntegrityError:
+            voted_index.load(user.pk, poll_id) # As próximas tentativas param no índice
+            raise serializers.ValidationError({"non_field_errors": [ALREADY_VOTED_MESSAGE]}) # Use non_field_errors
 
-        # Validar se o usuário já votou nesta enquete (agora usa o objeto poll do contexto)
-        if Vote.objects.filter(user=user, poll=poll).exists():
-            raise serializers.ValidationError({"non_field_errors": ["Você já votou nesta enquete."]}) # Use non_field_errors
+        return Vote(pk=vote_id, user=user, poll_id=poll_id, choice_id=choice_id, voted_at=voted_at)
 
 
-        # Tentar criar o voto
-        try:
-            # Crie o voto usando o objeto poll obtido do contexto
-            vote = Vote.objects.create(user=user, poll=poll, choice=choice)
-            return vote
-        except IntegrityError:
-             # Esta exceção é menos provável agora com as validações acima, mas é uma garantia extra.
-             raise serializers.ValidationError({"non_field_errors": ["Erro ao registrar o voto. Possível problema de duplicidade."]})
+class UserReferenceField(serializers.Field):
+    """Usuário informado pelo id (inteiro) ou pelo username (texto)."""
+    default_error_messages = {
+        'invalid': 'Informe o id (inteiro) ou o username do usuário.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)) or data == '':
+            self.fail('invalid')
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+class BulkVoteRecordSerializer(serializers.Serializer):
+    """Formato de um registro da ingestão em massa de votos (polls.ingestion)."""
+    user = UserReferenceField()
+    poll = serializers.IntegerField()
+    choice = serializers.IntegerField()
+    voted_at = serializers.DateTimeField(required=False) # Se omitido, vale o horário da ingestão
+
 
+class VoterRecordSerializer(serializers.Serializer):
+    """
+    Formato de um registro do cadastro em massa de eleitores (polls.provisioning). Só valida o
+    formato: usernames e emails já existentes são verificados por conjunto, não um a um.
+    """
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(required=False, allow_blank=True) # Email opcional, como no registro
+    # Sem senha, o usuário é criado com senha inutilizável (entra depois por redefinição de senha)
+    password = serializers.CharField(required=False, allow_null=True, trim_whitespace=False, write_only=True)
 
 
 class PollResultSerializer(serializers.Serializer):
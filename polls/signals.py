@@ -0,0 +1,31 @@
+"""
+Receptores de sinais que mantêm os contadores de votos em dia (registrados em PollsConfig.ready).
+
+Os caminhos de voto e de exclusão do próprio app (API, ingestão, admin de votos)
+ajustam os contadores explicitamente. A exclusão de um usuário apaga os seus
+votos em cascata, sem passar por nenhum deles: sem este receptor os contadores
+e os resultados ficariam inflados para sempre.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_delete
+
+from .caching import bump_results_version
+from .counters import decrement_vote_counts
+from .models import Vote
+from .snapshots import refresh_results_snapshots
+
+
+def _on_user_deleting(sender, instance, **kwargs):
+    # pre_delete: os votos ainda existem e podem ser contados por opção
+    votes = Vote.objects.filter(user=instance)
+    poll_ids = set(votes.values_list('poll_id', flat=True))
+    if not poll_ids:
+        return
+    decrement_vote_counts(votes)
+    for poll_id in poll_ids:
+        bump_results_version(poll_id)
+    # As enquetes do próprio usuário saem na mesma cascata
+    refresh_results_snapshots(poll_ids - set(instance.created_polls.values_list('pk', flat=True)))
+
+
+pre_delete.connect(_on_user_deleting, sender=User, dispatch_uid='polls.signals.user_deleting')
@@ -0,0 +1,102 @@
+"""
+Payload de resultados das enquetes e snapshots dos resultados finais.
+
+``results_payload`` monta a resposta do endpoint de resultados a partir dos
+contadores das opções. Quando uma enquete é encerrada (pela varredura de prazos
+ou por um admin), o mesmo payload é congelado em PollResultSnapshot e passa a
+ser servido como está, com cabeçalhos de cache de longa duração.
+
+Os snapshots existem exatamente para as enquetes inativas: alterações que
+mudariam o payload (reabrir a enquete, editar suas opções ou votos no admin)
+passam por ``refresh_results_snapshots``.
+"""
+from django.db import transaction
+
+from .caching import get_cached_results, get_results_version, set_cached_results
+from .counters import polls_vote_counts
+from .models import Poll, PollResultSnapshot
+from .serializers import PollResultSerializer
+
+
+def results_payload(poll, counts):
+    """
+    Monta o payload de resultados de ``poll`` a partir de ``counts``
+    (``[{'choice_text': ..., 'vote_count': ...}]``, como em polls.counters).
+    """
+    # O total de votos da enquete é a soma dos contadores das opções
+    total_votes = sum(row['vote_count'] for row in counts)
+    # O serializer usa o total no contexto para calcular a porcentagem
+    serializer = PollResultSerializer(counts, many=True, context={'total_votes': total_votes})
+    return {
+        'poll_id': poll.id,
+        'poll_title': poll.title,
+        'total_votes': total_votes,
+        'choices_results': serializer.data,
+        'is_active': poll.is_active, # Pode ser útil saber se ainda está ativa
+        'deadline': poll.deadline,
+    }
+
+
+def poll_results_payload(poll):
+    """
+    Payload de resultados de ``poll`` (carregada com ``select_related('result_snapshot')``):
+    o snapshot congelado se a enquete está encerrada, senão os contadores atuais.
+    """
+    snapshot = getattr(poll, 'result_snapshot', None)
+    if not poll.is_active and snapshot is not None:
+        return snapshot.payload
+    # Lê os contadores desnormalizados das opções (sem varrer a tabela de votos)
+    payload = results_payload(poll, polls_vote_counts([poll.pk]).get(poll.pk, []))
+    if not poll.is_active:
+        # Encerrada antes de existirem snapshots: congela os resultados agora
+        PollResultSnapshot.objects.update_or_create(poll=poll, defaults={'payload': payload})
+    return payload
+
+
+def cached_poll_results(poll_id):
+    """
+    ``(etag, payload)`` dos resultados da enquete pelo cache versionado, calculando e
+    guardando o payload se faltar; ``(None, None)`` se a enquete não existir.
+    """
+    version = get_results_version(poll_id)
+    cached = get_cached_results(poll_id, version)
+    if cached is None:
+        poll = Poll.objects.select_related('result_snapshot').filter(pk=poll_id).first()
+        if poll is None:
+            return None, None
+        cached = set_cached_results(poll_id, version, poll_results_payload(poll))
+    return cached
+
+
+def snapshot_results(poll_ids):
+    """
+    Grava (ou regrava) o snapshot dos resultados das enquetes informadas.
+
+    Usa uma consulta para as enquetes, uma para os contadores de todas as opções e
+    um único upsert. Retorna o número de snapshots gravados.
+    """
+    polls = list(Poll.objects.filter(pk__in=poll_ids).only('id', 'title', 'is_active', 'deadline'))
+    counts = polls_vote_counts([poll.pk for poll in polls])
+    snapshots = [
+        PollResultSnapshot(poll=poll, payload=results_payload(poll, counts.get(poll.pk, [])))
+        for poll in polls
+    ]
+    with transaction.atomic():
+        PollResultSnapshot.objects.bulk_create(
+            snapshots, update_conflicts=True, unique_fields=['poll'], update_fields=['payload', 'created_at'],
+        )
+    return len(snapshots)
+
+
+def refresh_results_snapshots(poll_ids):
+    """
+    Mantém os snapshots em dia depois de uma alteração nas enquetes informadas (ou nas
+    suas opções/votos): regrava os das enquetes encerradas e remove os das reabertas.
+    """
+    poll_ids = set(poll_ids) - {None}
+    if not poll_ids:
+        return
+    closed = list(Poll.objects.filter(pk__in=poll_ids, is_active=False).values_list('pk', flat=True))
+    PollResultSnapshot.objects.filter(poll_id__in=poll_ids - set(closed)).delete()
+    if closed:
+        snapshot_results(closed)
@@ -1,17 +1,63 @@
 from django.urls import reverse
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from contextlib import contextmanager
+from django.contrib.auth.models import Permission, User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.utils import timezone
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from datetime import timedelta
-
-from .models import Poll, Choice, Vote
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import sync_to_async
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+
+from .coldstart import profile_imports
+from .expiry import close_expired_polls
+from .exports import vote_export_queryset
+from .hashing import get_hash_pool
+from .ingestion import ingest_votes
+from .async_views import login, poll_results, poll_vote, register
+from .authentication import CachedTokenAuthentication, TokenCache, token_cache
+from .caching import results_etag
+from .models import Poll, PollResultSnapshot, Choice, Vote
+from .serializers import VoteSerializer
+from .snapshots import snapshot_results
+from .vote_buffer import VoteBuffer, flush_vote_buffer, get_vote_buffer
+from .voted_index import VotedIndex, voted_index
+
+
+@contextmanager
+def _temporary_file(content, suffix='.jsonl'):
+    """Grava ``content`` num arquivo temporário e retorna o caminho, removendo-o ao final."""
+    with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as handle:
+        handle.write(content)
+    try:
+        yield handle.name
+    finally:
+        os.remove(handle.name)
 
 class PollsAPITestCase(APITestCase):
     """Classe de testes para a API de Enquetes."""
 
     def setUp(self):
         """Configura o ambiente de teste."""
+        cache.clear() # O cache (LocMem) sobrevive entre testes, mas os ids do banco se repetem
+        voted_index.clear() # Idem para o índice de quem já votou
         # Criar usuário administrador
         self.admin_user = User.objects.create_superuser(username='admin', password='adminpassword')
         self.admin_client = APIClient()
@@ -117,11 +163,71 @@ class PollsAPITestCase(APITestCase):
         """Usuário autenticado (admin ou comum) pode listar enquetes/propostas."""
         response_admin = self.admin_client.get(self.poll_list_create_url, format='json')
         self.assertEqual(response_admin.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response_admin.data), 2) # Deve listar pelo menos a enquete e a proposta criadas no setup
+        self.assertGreaterEqual(len(response_admin.data['results']), 2) # Deve listar pelo menos a enquete e a proposta criadas no setup
 
         response_regular = self.regular_client.get(self.poll_list_create_url, format='json')
         self.assertEqual(response_regular.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response_regular.data), 2)
+        self.assertGreaterEqual(len(response_regular.data['results']), 2)
+
+
+    def test_poll_list_is_compact(self):
+        """A listagem omite a descrição (e nem a carrega do banco); o detalhe a mantém."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.regular_client.get(self.poll_list_create_url, format='json')
+        poll = response.data['results'][0]
+        self.assertNotIn('description', poll)
+        self.assertEqual(poll['created_by'], 'regular')
+        self.assertEqual(len(poll['choices']), 1)
+        self.assertFalse(any('"description"' in query['sql'] for query in queries.captured_queries))
+
+        response = self.regular_client.get(reverse('poll-detail', args=[self.admin_poll.id]), format='json')
+        self.assertEqual(response.data['description'], self.admin_poll.description)
+        self.assertEqual(response.data['created_by'], 'admin')
+
+
+    def test_fast_poll_reads_match_model_serializer(self):
+        """O caminho rápido (linhas de .values()) gera exatamente o mesmo JSON que o PollSerializer."""
+        Choice.objects.create(poll=self.regular_proposal, choice_text="Prop Option 0") # Ordem alfabética != ordem de id
+        urls = [self.poll_list_create_url, reverse('poll-detail', args=[self.admin_poll.id]), reverse('poll-detail', args=[self.regular_proposal.id])]
+        for url in urls:
+            with override_settings(FAST_POLL_READS=True):
+                fast = self.regular_client.get(url, format='json')
+            with override_settings(FAST_POLL_READS=False):
+                regular = self.regular_client.get(url, format='json')
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, regular.content)
+
+
+    def test_poll_list_cursor_pagination(self):
+        """A listagem é paginada por cursor, da enquete mais recente para a mais antiga."""
+        response = self.regular_client.get(self.poll_list_create_url, {'page_size': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([poll['id'] for poll in response.data['results']], [self.regular_proposal.id])
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('cursor=', response.data['next'])
+
+        response = self.regular_client.get(response.data['next'], format='json')
+        self.assertEqual([poll['id'] for poll in response.data['results']], [self.admin_poll.id])
+        self.assertIsNone(response.data['next'])
+
+
+    def test_poll_list_and_detail_conditional_get(self):
+        """Listagem e detalhe trazem ETag; o mesmo ETag gera 304 até que uma enquete ou opção mude."""
+        detail_url = reverse('poll-detail', args=[self.admin_poll.id])
+        for url in (self.poll_list_create_url, detail_url):
+            response = self.regular_client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('Last-Modified', response)
+            etag = response['ETag']
+
+            response = self.regular_client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+
+            Choice.objects.create(poll=self.admin_poll, choice_text=f"New option for {url}")
+            response = self.regular_client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
 
 
     def test_unauthenticated_user_cannot_list_polls(self):
@@ -341,6 +447,82 @@ class PollsAPITestCase(APITestCase):
         self.assertIn('Esta opção não pertence a esta enquete', response.data.get('choice', [''])[0])
 
 
+    def test_vote_on_missing_poll_or_choice(self):
+        """Votar em enquete inexistente retorna 404; opção inexistente retorna erro no campo choice."""
+        response = self.regular_client.post(reverse('poll-vote', args=[999999]), {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        url = reverse('poll-vote', args=[self.admin_poll.id])
+        response = self.regular_client.post(url, {'choice': 999999}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('choice', response.data)
+        self.assertFalse(Vote.objects.exists())
+
+
+    def test_vote_is_a_single_insert_round_trip(self):
+        """O caminho de voto não faz SELECTs: um INSERT ... SELECT e a atualização do contador."""
+        client = APIClient()
+        client.force_authenticate(user=self.regular_user) # Evita a consulta do token
+        url = reverse('poll-vote', args=[self.admin_poll.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(url, {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['vote']['choice'], self.admin_choice1.id)
+        self.assertEqual(response.data['vote']['user'], 'regular')
+        statements = [query['sql'].split()[0].upper() for query in queries.captured_queries]
+        self.assertNotIn('SELECT', statements)
+        self.assertEqual(statements.count('INSERT'), 1)
+
+
+    def test_repeated_vote_attempts_stop_at_voted_index(self):
+        """Depois do voto (ou de uma tentativa duplicada), novas tentativas são recusadas sem consultas."""
+        client = APIClient()
+        client.force_authenticate(user=self.regular_user)
+        url = reverse('poll-vote', args=[self.admin_poll.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(url, {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(url, {'choice': self.admin_choice2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['non_field_errors'], ["Você já votou nesta enquete."])
+        self.assertEqual(len(queries), 0)
+
+        # Voto gravado por outro caminho: a primeira duplicata vai ao banco e registra o voto no índice
+        Vote.objects.create(user=self.admin_user, poll=self.admin_poll, choice=self.admin_choice2)
+        admin_client = APIClient()
+        admin_client.force_authenticate(user=self.admin_user)
+        self.assertEqual(admin_client.post(url, {'choice': self.admin_choice1.id}, format='json').status_code, 400)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(admin_client.post(url, {'choice': self.admin_choice1.id}, format='json').status_code, 400)
+        self.assertEqual(len(queries), 0)
+
+    def test_my_vote_endpoint(self):
+        """GET my-vote diz se o usuário votou e em qual opção, pelo índice de quem já votou."""
+        url = reverse('poll-my-vote', args=[self.admin_poll.id])
+        response = self.regular_client.get(url, format='json')
+        self.assertEqual(response.data, {'voted': False, 'vote': None})
+        self.assertEqual(self.regular_client.get(reverse('poll-my-vote', args=[999999])).status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.regular_client.post(reverse('poll-vote', args=[self.admin_poll.id]), {'choice': self.admin_choice2.id}, format='json')
+        vote = Vote.objects.get(user=self.regular_user, poll=self.admin_poll)
+        client = APIClient()
+        client.force_authenticate(user=self.regular_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, format='json')
+        self.assertEqual(len(queries), 0)
+        self.assertTrue(response.data['voted'])
+        self.assertEqual(response.data['vote']['id'], vote.id)
+        self.assertEqual(response.data['vote']['choice'], self.admin_choice2.id)
+
+        # Voto excluído no admin sai do índice
+        self.admin_client.force_login(self.admin_user)
+        self.admin_client.post(reverse('admin:polls_vote_delete', args=[vote.id]), {'post': 'yes'})
+        self.assertFalse(Vote.objects.filter(pk=vote.id).exists())
+        self.assertEqual(self.regular_client.get(url, format='json').data['voted'], False)
+
+
     def test_unauthenticated_user_cannot_vote(self):
         """Usuário não autenticado NÃO pode votar."""
         url = reverse('poll-vote', args=[self.admin_poll.id])
@@ -353,33 +535,1110 @@ class PollsAPITestCase(APITestCase):
 
     def test_authenticated_user_can_view_results(self):
         """Usuário autenticado pode ver resultados."""
-        # Registrar alguns votos
-        Vote.objects.create(user=self.regular_user, poll=self.admin_poll, choice=self.admin_choice1)
-        Vote.objects.create(user=self.admin_user, poll=self.admin_poll, choice=self.admin_choice1) # Admin também pode votar
+        # Registrar alguns votos pela API (que mantém os contadores das opções)
+        vote_url = reverse('poll-vote', args=[self.admin_poll.id])
+        self.regular_client.post(vote_url, {'choice': self.admin_choice1.id}, format='json')
+        self.admin_client.post(vote_url, {'choice': self.admin_choice1.id}, format='json') # Admin também pode votar
         user3 = User.objects.create_user(username='user3', password='pass3')
-        Vote.objects.create(user=user3, poll=self.admin_poll, choice=self.admin_choice2)
+        user3_client = APIClient()
+        user3_client.force_authenticate(user=user3)
+        user3_client.post(vote_url, {'choice': self.admin_choice2.id}, format='json')
 
         url = reverse('poll-results', args=[self.admin_poll.id]) # URL da action results
         response_regular = self.regular_client.get(url, format='json')
         self.assertEqual(response_regular.status_code, status.HTTP_200_OK)
 
         # Verificar a estrutura e contagem dos resultados
-        self.assertIsInstance(response_regular.data, list)
-        self.assertEqual(len(response_regular.data), 2) # Duas opções com votos
+        self.assertEqual(response_regular.data['total_votes'], 3)
+        choices_results = response_regular.data['choices_results']
+        self.assertEqual(len(choices_results), 2) # Duas opções com votos
 
         # Encontrar a opção 1 nos resultados e verificar a contagem
-        option1_result = next((item for item in response_regular.data if item['choice_text'] == self.admin_choice1.choice_text), None)
+        option1_result = next((item for item in choices_results if item['choice_text'] == self.admin_choice1.choice_text), None)
         self.assertIsNotNone(option1_result)
         self.assertEqual(option1_result['vote_count'], 2)
+        self.assertEqual(option1_result['percentage'], 66.67)
 
         # Encontrar a opção 2 nos resultados e verificar a contagem
-        option2_result = next((item for item in response_regular.data if item['choice_text'] == self.admin_choice2.choice_text), None)
+        option2_result = next((item for item in choices_results if item['choice_text'] == self.admin_choice2.choice_text), None)
         self.assertIsNotNone(option2_result)
         self.assertEqual(option2_result['vote_count'], 1)
 
 
+    def test_results_conditional_get_and_invalidation(self):
+        """Resultados trazem ETag; o mesmo ETag gera 304 sem consultas, e um voto invalida a versão."""
+        url = reverse('poll-results', args=[self.admin_poll.id])
+        client = APIClient()
+        client.force_authenticate(user=self.regular_user) # Evita a consulta do token
+
+        response = client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertEqual(etag, results_etag(response.data)) # Do conteúdo, não de uma versão local ao processo
+
+        with self.assertNumQueries(0):
+            response = client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0): # Sem ETag, mas o payload da versão atual está em cache
+            response = client.get(url, format='json')
+        self.assertEqual(response.data['total_votes'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('poll-vote', args=[self.admin_poll.id]), {'choice': self.admin_choice1.id}, format='json')
+
+        response = client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['total_votes'], 1)
+
+        # Um pk com zeros à esquerda usa a mesma chave de cache, invalidada pelo voto
+        padded_url = url.replace(f'/{self.admin_poll.id}/', f'/0{self.admin_poll.id}/')
+        self.assertEqual(client.get(padded_url, format='json').data['total_votes'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.force_authenticate(user=self.admin_user)
+            client.post(reverse('poll-vote', args=[self.admin_poll.id]), {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(client.get(padded_url, format='json').data['total_votes'], 2)
+
+
     def test_unauthenticated_user_cannot_view_results(self):
         """Usuário não autenticado NÃO pode ver resultados."""
         url = reverse('poll-results', args=[self.admin_poll.id])
         response = self.unauthenticated_client.get(url, format='json')
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+    # --- Testes dos Contadores de Votos ---
+
+    def test_vote_increments_choice_counter(self):
+        """Votar atualiza o contador desnormalizado da opção na mesma transação."""
+        url = reverse('poll-vote', args=[self.admin_poll.id])
+        response = self.regular_client.post(url, {'choice': self.admin_choice2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.admin_choice1.refresh_from_db()
+        self.admin_choice2.refresh_from_db()
+        self.assertEqual(self.admin_choice1.vote_count, 0)
+        self.assertEqual(self.admin_choice2.vote_count, 1)
+
+
+    def test_deleting_user_discounts_their_votes(self):
+        """Excluir um usuário apaga os seus votos em cascata e desconta-os dos contadores."""
+        url = reverse('poll-vote', args=[self.admin_poll.id])
+        self.regular_client.post(url, {'choice': self.admin_choice2.id}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.regular_user.delete()
+        self.admin_choice2.refresh_from_db()
+        self.assertEqual(self.admin_choice2.vote_count, 0)
+        call_command('rebuild_vote_counts', '--verify', stdout=StringIO())
+        results = self.admin_client.get(reverse('poll-results', args=[self.admin_poll.id]))
+        self.assertEqual(results.data['total_votes'], 0)
+
+
+    def test_rebuild_vote_counts_command(self):
+        """O comando rebuild_vote_counts detecta (--verify) e corrige contadores divergentes."""
+        Vote.objects.create(user=self.regular_user, poll=self.admin_poll, choice=self.admin_choice1) # Sem passar pelo contador
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counts', '--verify', stdout=StringIO())
+
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.admin_choice1.refresh_from_db()
+        self.assertEqual(self.admin_choice1.vote_count, 1)
+        call_command('rebuild_vote_counts', '--verify', stdout=StringIO()) # Não deve lançar erro
+
+
+    @override_settings(VOTE_COUNTER_SHARDS=4)
+    def test_sharded_vote_counters(self):
+        """No modo distribuído, votos vão para fatias que os resultados somam e a compactação consolida."""
+        vote_url = reverse('poll-vote', args=[self.admin_poll.id])
+        self.regular_client.post(vote_url, {'choice': self.admin_choice1.id}, format='json')
+        self.admin_client.post(vote_url, {'choice': self.admin_choice1.id}, format='json')
+
+        self.admin_choice1.refresh_from_db()
+        self.assertEqual(self.admin_choice1.vote_count, 0) # A linha da opção não é tocada
+        self.assertEqual(sum(self.admin_choice1.vote_shards.values_list('vote_count', flat=True)), 2)
+
+        response = self.regular_client.get(reverse('poll-results', args=[self.admin_poll.id]), format='json')
+        self.assertEqual(response.data['total_votes'], 2)
+        self.assertEqual(response.data['choices_results'][0]['vote_count'], 2)
+
+        call_command('compact_vote_shards', stdout=StringIO())
+        self.admin_choice1.refresh_from_db()
+        self.assertEqual(self.admin_choice1.vote_count, 2)
+        self.assertFalse(self.admin_choice1.vote_shards.exclude(vote_count=0).exists())
+        call_command('rebuild_vote_counts', '--verify', stdout=StringIO())
+
+
+    # --- Testes de Ingestão em Massa ---
+
+    def test_bulk_vote_ingestion(self):
+        """A ingestão em massa grava os votos válidos com o horário original e reporta cada registro."""
+        kiosk_user = User.objects.create_user(username='kiosk', password='kioskpassword')
+        Vote.objects.create(user=self.admin_user, poll=self.admin_poll, choice=self.admin_choice1) # Voto já existente
+        voted_at = timezone.now() - timedelta(hours=3)
+        records = [
+            {'user': 'regular', 'poll': self.admin_poll.id, 'choice': self.admin_choice2.id, 'voted_at': voted_at.isoformat()},
+            {'user': kiosk_user.id, 'poll': self.admin_poll.id, 'choice': self.admin_choice2.id},
+            {'user': 'regular', 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id}, # Repetido no lote
+            {'user': self.admin_user.id, 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id}, # Já votou
+            {'user': 'regular', 'poll': self.regular_proposal.id, 'choice': self.admin_choice1.id}, # Opção de outra enquete
+            {'user': 'ghost', 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id},
+            {'user': 'regular', 'poll': self.admin_poll.id}, # Sem opção
+        ]
+        url = reverse('vote_bulk_ingest')
+
+        response = self.regular_client.post(url, records, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.admin_client.post(url, records, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['accepted'], response.data['duplicate'], response.data['invalid']), (2, 2, 3))
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['accepted', 'accepted', 'duplicate', 'duplicate', 'invalid', 'invalid', 'invalid'],
+        )
+        self.assertIn('choice', response.data['results'][4]['errors'])
+        self.assertIn('user', response.data['results'][5]['errors'])
+
+        self.assertEqual(Vote.objects.get(user=self.regular_user, poll=self.admin_poll).voted_at, voted_at)
+        self.admin_choice2.refresh_from_db()
+        self.assertEqual(self.admin_choice2.vote_count, 2)
+        results = self.regular_client.get(reverse('poll-results', args=[self.admin_poll.id]), format='json')
+        self.assertEqual(results.data['total_votes'], 2) # O voto criado direto no banco não passou pelo contador
+
+    def test_bulk_vote_ingestion_checks_deadline_at_vote_time(self):
+        """Votos dados antes do prazo são aceitos mesmo após o prazo; os posteriores são rejeitados."""
+        self.admin_poll.deadline = timezone.now() - timedelta(hours=1)
+        self.admin_poll.save()
+        records = [
+            {'user': 'regular', 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id,
+             'voted_at': (timezone.now() - timedelta(hours=2)).isoformat()},
+            {'user': 'admin', 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id,
+             'voted_at': (timezone.now() - timedelta(minutes=30)).isoformat()},
+        ]
+        response = self.admin_client.post(reverse('vote_bulk_ingest'), records, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['accepted', 'invalid'])
+
+    def test_bulk_vote_ingestion_after_expiry_sweep(self):
+        """Enquete encerrada pela varredura ainda aceita votos offline dados até o encerramento; uma encerrada por admin, não."""
+        deadline = timezone.now() - timedelta(hours=1)
+        self.admin_poll.deadline = deadline
+        self.admin_poll.save()
+        call_command('close_expired_polls', stdout=StringIO())
+        self.regular_proposal.is_active = False # Encerrada por um admin antes do prazo...
+        self.regular_proposal.deadline = deadline
+        self.regular_proposal.save()
+        self.regular_proposal.title = 'Editada depois do prazo' # ...e editada depois dele
+        self.regular_proposal.save()
+        records = [
+            {'user': 'regular', 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id,
+             'voted_at': (deadline - timedelta(minutes=10)).isoformat()},
+            {'user': 'admin', 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id,
+             'voted_at': (deadline + timedelta(minutes=10)).isoformat()},
+            {'user': 'regular', 'poll': self.regular_proposal.id, 'choice': self.proposal_choice1.id,
+             'voted_at': (deadline - timedelta(minutes=10)).isoformat()},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            results = list(ingest_votes(records))
+        self.assertEqual([result['status'] for result in results], ['accepted', 'invalid', 'invalid'])
+        self.assertEqual(PollResultSnapshot.objects.get(poll=self.admin_poll).payload['total_votes'], 1)
+        response = self.regular_client.get(reverse('poll-results', args=[self.admin_poll.id]), format='json')
+        self.assertEqual((response.data['is_active'], response.data['total_votes']), (False, 1))
+
+        # Reaberta, a enquete perde o closed_at: um novo encerramento por um admin não herda o da varredura
+        self.admin_poll.refresh_from_db()
+        self.assertIsNotNone(self.admin_poll.closed_at)
+        self.admin_poll.is_active = True
+        self.admin_poll.save()
+        self.assertIsNone(Poll.objects.get(pk=self.admin_poll.pk).closed_at)
+
+    def test_bulk_vote_ingestion_reports_votes_lost_to_a_race(self):
+        """Um voto pela API gravado entre a checagem do lote e o INSERT faz o registro sair como duplicado."""
+        bulk_create = Vote.objects.bulk_create
+
+        def vote_through_api_first(votes, **kwargs):
+            Vote.objects.create(user=self.regular_user, poll=self.admin_poll, choice=self.admin_choice1)
+            return bulk_create(votes, **kwargs)
+
+        records = [
+            {'user': 'regular', 'poll': self.admin_poll.id, 'choice': self.admin_choice2.id},
+            {'user': 'admin', 'poll': self.admin_poll.id, 'choice': self.admin_choice2.id},
+        ]
+        with mock.patch.object(Vote.objects, 'bulk_create', vote_through_api_first):
+            results = list(ingest_votes(records))
+        self.assertEqual([result['status'] for result in results], ['duplicate', 'accepted'])
+        self.admin_choice2.refresh_from_db()
+        self.assertEqual(self.admin_choice2.vote_count, 1) # Só o voto que de fato entrou
+
+    def test_ingest_votes_command(self):
+        """O comando ingest_votes lê JSONL em lotes e reporta as linhas rejeitadas."""
+        lines = '\n'.join([
+            '{"user": "regular", "poll": %d, "choice": %d}' % (self.admin_poll.id, self.admin_choice1.id),
+            'not json',
+            '{"user": "admin", "poll": %d, "choice": %d}' % (self.admin_poll.id, self.admin_choice2.id),
+            '{"user": "admin", "poll": %d, "choice": %d}' % (self.admin_poll.id, self.admin_choice1.id),
+        ])
+        path = self.enterContext(_temporary_file(lines))
+        out = StringIO()
+        call_command('ingest_votes', path, '--chunk-size', '2', stdout=out)
+
+        self.assertEqual(Vote.objects.filter(poll=self.admin_poll).count(), 2)
+        self.assertIn('Line 2: invalid', out.getvalue())
+        self.assertIn('Line 4: duplicate', out.getvalue())
+        self.assertIn('2 vote(s) accepted, 1 duplicate(s), 1 invalid.', out.getvalue())
+        call_command('rebuild_vote_counts', '--verify', stdout=StringIO())
+
+    def test_import_voters_command(self):
+        """import_voters cria usuários e tokens em lote e reporta duplicados e inválidos por linha."""
+        self.regular_user.email = 'Regular@Example.com'
+        self.regular_user.save()
+        content = '\n'.join([
+            'username,email,password',
+            'maria,maria@example.com,s3nha-forte',
+            'joao,,outra-senha',
+            'regular,,x', # Username já cadastrado
+            'maria,,x', # Repetido no arquivo
+            'ana,regular@example.com,', # Email já cadastrado (sem diferenciar maiúsculas)
+            'not valid!,,x',
+            'pedro,,', # Sem senha: senha inutilizável
+        ])
+        path = self.enterContext(_temporary_file(content, suffix='.csv'))
+        out = StringIO()
+        call_command('import_voters', path, '--workers', '2', '--chunk-size', '4', stdout=out)
+
+        self.assertIn('3 voter(s) created, 3 duplicate(s), 1 invalid.', out.getvalue())
+        self.assertIn('Line 4: duplicate', out.getvalue())
+        self.assertIn('Line 6: duplicate {"email"', out.getvalue())
+        self.assertIn('Line 7: invalid {"username"', out.getvalue())
+        self.assertIn('Processed 4 record(s)...', out.getvalue())
+        maria = User.objects.get(username='maria')
+        self.assertTrue(maria.check_password('s3nha-forte'))
+        self.assertFalse(User.objects.get(username='pedro').has_usable_password())
+        self.assertEqual(Token.objects.filter(user__username__in=['maria', 'joao', 'pedro']).count(), 3)
+        response = self.client.post(reverse('api_token_auth'), {'username': 'maria', 'password': 's3nha-forte'})
+        self.assertEqual(response.data['token'], maria.auth_token.key)
+
+    @override_settings(VOTER_IMPORT_WORKERS=1)
+    def test_user_bulk_import_endpoint(self):
+        """POST users/bulk (somente admin) cadastra a lista e retorna um resultado por registro."""
+        voters = [{'username': 'carla', 'email': 'carla@example.com', 'password': 'senha-123'}, {'username': 'regular'}, 'x']
+        url = reverse('user_bulk_import')
+        self.assertEqual(self.regular_client.post(url, voters, format='json').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.admin_client.post(url, {'username': 'carla'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.admin_client.post(url, voters, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['duplicate'], response.data['invalid']), (1, 1, 1))
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'duplicate', 'invalid'])
+        self.assertTrue(User.objects.get(username='carla').check_password('senha-123'))
+
+    def _enable_write_behind(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            VOTE_WRITE_BEHIND=True, VOTE_BUFFER_PATH=os.path.join(directory, 'votes.sqlite3'),
+        ))
+        return get_vote_buffer()
+
+    def test_write_behind_vote_is_queued_then_flushed(self):
+        """Com VOTE_WRITE_BEHIND o voto é confirmado com 202 e gravado em lote na descarga do buffer."""
+        buffer = self._enable_write_behind()
+        url = reverse('poll-vote', args=[self.admin_poll.id])
+
+        response = self.regular_client.post(url, {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(len(buffer), 1)
+
+        # Um voto por usuário vale também para os votos ainda no buffer; as demais regras continuam
+        response = self.regular_client.post(url, {'choice': self.admin_choice2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.admin_client.post(url, {'choice': self.proposal_choice1.id}, format='json')
+        self.assertEqual(response.data['choice'], ["Esta opção não pertence a esta enquete."])
+        response = self.admin_client.post(reverse('poll-vote', args=[9999]), {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.admin_client.post(url, {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = flush_vote_buffer()
+        self.assertEqual(totals, {'accepted': 2, 'duplicate': 0, 'invalid': 0})
+        self.assertEqual(len(buffer), 0)
+        results = self.regular_client.get(reverse('poll-results', args=[self.admin_poll.id]), format='json')
+        self.assertEqual(results.data['total_votes'], 2)
+        response = self.regular_client.post(url, {'choice': self.admin_choice1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST) # Já gravado no banco
+
+    def test_write_behind_vote_survives_poll_closing_before_flush(self):
+        """Um voto confirmado com 202 entra nos resultados finais mesmo se a enquete for encerrada antes da descarga."""
+        buffer = self._enable_write_behind()
+        response = self.regular_client.post(
+            reverse('poll-vote', args=[self.admin_poll.id]), {'choice': self.admin_choice1.id}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.regular_client.post(
+            reverse('poll-vote', args=[self.regular_proposal.id]), {'choice': self.proposal_choice1.id}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # O prazo vence e a varredura roda entre o 202 e a descarga (o voto chegou depois da
+        # descarga que a própria varredura faz); a proposta é encerrada por um admin
+        Poll.objects.filter(pk=self.admin_poll.pk).update(deadline=timezone.now())
+        with override_settings(VOTE_WRITE_BEHIND=False):
+            self.assertEqual(close_expired_polls(timezone.now() + timedelta(seconds=1)), [self.admin_poll.id])
+        Poll.objects.filter(pk=self.regular_proposal.pk).update(is_active=False)
+        self.assertEqual(len(buffer), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = flush_vote_buffer()
+        self.assertEqual(totals, {'accepted': 2, 'duplicate': 0, 'invalid': 0})
+        self.assertEqual(PollResultSnapshot.objects.get(poll=self.admin_poll).payload['total_votes'], 1)
+        response = self.regular_client.get(reverse('poll-results', args=[self.admin_poll.id]), format='json')
+        self.assertEqual((response.data['is_active'], response.data['total_votes']), (False, 1))
+
+    def test_write_behind_buffer_accepts_votes_during_flush(self):
+        """A descarga não trava o buffer: um voto chega na hora durante a gravação e fica para o próximo lote."""
+        buffer = self._enable_write_behind()
+        self.regular_client.post(reverse('poll-vote', args=[self.admin_poll.id]), {'choice': self.admin_choice1.id}, format='json')
+
+        with buffer.batch(10) as records:
+            started = time.monotonic()
+            # Outra conexão (outro processo do servidor, por exemplo): antes esperaria o fim do lote
+            self.assertTrue(VoteBuffer(buffer.path).append(self.admin_user.pk, self.admin_poll.id, self.admin_choice2.id, timezone.now()))
+            self.assertLess(time.monotonic() - started, 1)
+            list(ingest_votes(records, check_active=False))
+        self.assertEqual(len(buffer), 1)
+        self.assertEqual(flush_vote_buffer(), {'accepted': 1, 'duplicate': 0, 'invalid': 0})
+        self.assertEqual(Vote.objects.filter(poll=self.admin_poll).count(), 2)
+
+    def test_write_behind_buffer_survives_failed_flush(self):
+        """Um lote só sai do buffer após o commit no banco; regravá-lo não duplica votos nem contadores."""
+        buffer = self._enable_write_behind()
+        self.regular_client.post(reverse('poll-vote', args=[self.admin_poll.id]), {'choice': self.admin_choice1.id}, format='json')
+
+        with self.assertRaises(RuntimeError):
+            with buffer.batch(10) as records:
+                self.assertEqual(len(records), 1)
+                raise RuntimeError('queda no meio da descarga')
+        self.assertEqual(len(buffer), 1)
+
+        # Queda depois do commit no banco e antes da remoção do lote: o voto volta como duplicado
+        list(ingest_votes([{'user': self.regular_user.pk, 'poll': self.admin_poll.id, 'choice': self.admin_choice1.id}]))
+        buffer.append(self.admin_user.pk, self.admin_poll.id, self.admin_choice1.id, timezone.now())
+        out = StringIO()
+        call_command('flush_vote_buffer', stdout=out)
+        self.assertIn('Flushed 2 buffered vote(s): 1 accepted, 1 duplicate, 0 invalid.', out.getvalue())
+        self.assertEqual(Vote.objects.filter(poll=self.admin_poll).count(), 2)
+        call_command('rebuild_vote_counts', '--verify', stdout=StringIO())
+
+
+    # --- Testes de Comandos de Manutenção ---
+
+    def test_add_default_choices_to_existing_polls(self):
+        """O comando adiciona só as opções padrão que faltam, em lotes, e respeita --dry-run."""
+        Choice.objects.create(poll=self.admin_poll, choice_text='Concordo')
+        extra_polls = Poll.objects.bulk_create(
+            Poll(title=f'Old Poll {i}', description='', created_by=self.admin_user) for i in range(5)
+        )
+
+        call_command('add_default_choices_to_existing_polls', '--dry-run', stdout=StringIO())
+        self.assertFalse(Choice.objects.filter(choice_text='Neutro').exists())
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('add_default_choices_to_existing_polls', '--batch-size', '3', stdout=out)
+        self.assertIn('Finished: 20 default choice(s) added to 7 poll(s)/proposal(s).', out.getvalue())
+        self.assertLess(len(queries), 20) # Consultas por lote, não por enquete
+        for poll in [self.admin_poll, self.regular_proposal, *extra_polls]:
+            self.assertEqual(
+                set(poll.choices.filter(choice_text__in=['Concordo', 'Discordo', 'Neutro']).values_list('choice_text', flat=True)),
+                {'Concordo', 'Discordo', 'Neutro'},
+            )
+
+        out = StringIO()
+        call_command('add_default_choices_to_existing_polls', stdout=out)
+        self.assertIn('Finished: 0 default choice(s) added', out.getvalue())
+
+    def test_add_default_choices_refreshes_closed_poll_snapshots(self):
+        """As opções padrão adicionadas a uma enquete encerrada entram no snapshot dos seus resultados."""
+        Poll.objects.filter(pk=self.admin_poll.pk).update(is_active=False)
+        snapshot_results([self.admin_poll.pk])
+        call_command('add_default_choices_to_existing_polls', stdout=StringIO())
+        payload = PollResultSnapshot.objects.get(poll=self.admin_poll).payload
+        self.assertTrue({'Concordo', 'Discordo', 'Neutro'} <= {row['choice_text'] for row in payload['choices_results']})
+
+    def test_close_expired_polls_command(self):
+        """A varredura encerra só as enquetes vencidas, congela os resultados e invalida o cache."""
+        expired = Poll.objects.create(
+            title="Expired Poll", description="", created_by=self.admin_user,
+            deadline=timezone.now() - timedelta(minutes=5),
+        )
+        choice = Choice.objects.create(poll=expired, choice_text="Yes", vote_count=3)
+        Choice.objects.create(poll=expired, choice_text="No", vote_count=1)
+        results_url = reverse('poll-results', args=[expired.id])
+        stale = self.regular_client.get(results_url, format='json')
+        self.assertTrue(stale.data['is_active'])
+
+        out = StringIO()
+        call_command('close_expired_polls', '--dry-run', stdout=out)
+        self.assertIn(f'Poll {expired.id} would be closed.', out.getvalue())
+        self.assertTrue(Poll.objects.get(pk=expired.pk).is_active)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('close_expired_polls', stdout=out)
+        self.assertIn('Closed 1 expired poll(s).', out.getvalue())
+
+        expired.refresh_from_db()
+        self.assertFalse(expired.is_active)
+        self.assertGreater(expired.updated_at, choice.updated_at)
+        self.admin_poll.refresh_from_db()
+        self.assertTrue(self.admin_poll.is_active) # Prazo ainda não venceu
+        self.regular_proposal.refresh_from_db()
+        self.assertTrue(self.regular_proposal.is_active) # Sem prazo
+
+        snapshot = PollResultSnapshot.objects.get(poll=expired)
+        self.assertEqual(snapshot.payload['total_votes'], 4)
+        self.assertEqual(snapshot.payload['choices_results'][0], {'choice_text': 'Yes', 'vote_count': 3, 'percentage': 75.0})
+        self.assertFalse(snapshot.payload['is_active'])
+
+        response = self.regular_client.get(results_url, HTTP_IF_NONE_MATCH=stale['ETag'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['is_active'])
+
+    def _save_poll_in_admin(self, poll, **changes):
+        """Envia o formulário de edição da enquete no admin do Django, com ``changes`` aplicadas."""
+        data = {
+            'title': poll.title, 'description': poll.description, 'created_by': poll.created_by_id,
+            'deadline_0': '', 'deadline_1': '', 'is_active': poll.is_active, 'is_proposal': poll.is_proposal,
+            **changes,
+        }
+        data = {field: value for field, value in data.items() if value is not False} # Checkbox desmarcado não é enviado
+        response = self.client.post(reverse('admin:polls_poll_change', args=[poll.pk]), data)
+        self.assertEqual(response.status_code, 302) # Redireciona após salvar
+
+    def test_poll_admin_creator_field_for_staff(self):
+        """Staff sem superusuário escolhe o criador num <select> só com ele mesmo, não pelo autocomplete."""
+        staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='change_poll'))
+        self.client.force_login(staff)
+        form = self.client.get(reverse('admin:polls_poll_change', args=[self.admin_poll.pk])).context['adminform'].form
+        self.assertEqual(list(form.fields['created_by'].queryset), [staff])
+        self.assertNotIn('admin-autocomplete', str(form['created_by']))
+
+        self.client.force_login(self.admin_user)
+        form = self.client.get(reverse('admin:polls_poll_change', args=[self.admin_poll.pk])).context['adminform'].form
+        self.assertIn('admin-autocomplete', str(form['created_by']))
+
+    def test_closed_poll_results_served_from_snapshot(self):
+        """Encerrar a enquete congela os resultados, servidos do snapshot com cache de longa duração."""
+        Vote.objects.create(user=self.regular_user, poll=self.admin_poll, choice=self.admin_choice1)
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        results_url = reverse('poll-results', args=[self.admin_poll.id])
+
+        self.client.force_login(self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._save_poll_in_admin(self.admin_poll, is_active=False) # is_active só é editável no admin
+        snapshot = PollResultSnapshot.objects.get(poll=self.admin_poll)
+        self.assertEqual(snapshot.payload['total_votes'], 1)
+
+        cache.clear() # Mesmo sem cache, a enquete encerrada não consulta as opções
+        with CaptureQueriesContext(connection) as queries:
+            response = self.regular_client.get(results_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_votes'], 1)
+        self.assertFalse(response.data['is_active'])
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertFalse(any('polls_choice' in query['sql'] for query in queries.captured_queries))
+
+        # Editar uma opção da enquete encerrada regrava o snapshot
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin_client.patch(
+                reverse('choice_detail_update_delete', args=[self.admin_choice1.id]), {'choice_text': 'Option A+'}, format='json',
+            )
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.payload['choices_results'][0]['choice_text'], 'Option A+')
+
+        # Reabrir descarta o snapshot e volta à revalidação a cada uso
+        with self.captureOnCommitCallbacks(execute=True):
+            self._save_poll_in_admin(self.admin_poll, is_active=True)
+        self.assertFalse(PollResultSnapshot.objects.filter(poll=self.admin_poll).exists())
+        response = self.regular_client.get(results_url, format='json')
+        self.assertTrue(response.data['is_active'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_results_snapshot_created_for_previously_closed_poll(self):
+        """Uma enquete encerrada sem snapshot (anterior a eles) ganha um na primeira consulta aos resultados."""
+        Poll.objects.filter(pk=self.admin_poll.pk).update(is_active=False, updated_at=timezone.now())
+        response = self.regular_client.get(reverse('poll-results', args=[self.admin_poll.id]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            PollResultSnapshot.objects.get(poll=self.admin_poll).payload['choices_results'][0]['choice_text'], 'Option A',
+        )
+
+    def test_poll_list_is_active_filter(self):
+        """A listagem aceita ?is_active= para separar enquetes abertas e encerradas."""
+        Poll.objects.create(title="Closed Poll", description="", created_by=self.admin_user, is_active=False)
+
+        response = self.regular_client.get(self.poll_list_create_url, {'is_active': 'false'}, format='json')
+        self.assertEqual([poll['title'] for poll in response.data['results']], ['Closed Poll'])
+        response = self.regular_client.get(self.poll_list_create_url, {'is_active': 'true'}, format='json')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.regular_client.get(self.poll_list_create_url, {'is_active': 'maybe'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # --- Testes de Exportação ---
+
+    def test_export_votes(self):
+        """A exportação de votos é restrita a admins e gera CSV ou NDJSON em streaming."""
+        Vote.objects.create(user=self.regular_user, poll=self.admin_poll, choice=self.admin_choice2)
+        Vote.objects.create(user=self.admin_user, poll=self.admin_poll, choice=self.admin_choice1)
+        Vote.objects.create(user=self.regular_user, poll=self.regular_proposal, choice=self.proposal_choice1)
+        url = reverse('poll-export-votes', args=[self.admin_poll.id])
+
+        self.assertEqual(self.regular_client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.admin_client.get(url, {'output': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.admin_client.get(reverse('poll-export-votes', args=[9999])).status_code, status.HTTP_404_NOT_FOUND,
+        )
+
+        response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['vote_id', 'poll_id', 'choice_id', 'choice_text', 'user_id', 'username', 'voted_at'])
+        self.assertEqual([row[3] for row in rows[1:]], ['Option A', 'Option B']) # Ordenado por opção
+
+        response = self.admin_client.get(url, {'output': 'ndjson'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['username'] for record in records], ['admin', 'regular'])
+
+    async def test_export_votes_streams_asynchronously_under_asgi(self):
+        """Sob ASGI a exportação usa um iterador assíncrono, enviado bloco a bloco."""
+        await Vote.objects.acreate(user=self.regular_user, poll=self.admin_poll, choice=self.admin_choice2)
+        response = await self.async_client.get(
+            reverse('poll-export-votes', args=[self.admin_poll.id]), headers={'Authorization': f'Token {self.admin_token}'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        rows = list(csv.reader(StringIO(b''.join([chunk async for chunk in response.streaming_content]).decode())))
+        self.assertEqual([row[5] for row in rows[1:]], ['regular'])
+
+    def test_export_votes_command(self):
+        """O comando export_votes exporta todas as enquetes (ou as escolhidas) e só o cabeçalho se não houver votos."""
+        Vote.objects.create(user=self.regular_user, poll=self.admin_poll, choice=self.admin_choice1)
+        Vote.objects.create(user=self.regular_user, poll=self.regular_proposal, choice=self.proposal_choice1)
+
+        out = StringIO()
+        call_command('export_votes', '--output', 'ndjson', '--chunk-size', '1', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+        Vote.objects.all().delete()
+        out = StringIO()
+        call_command('export_votes', '--poll', str(self.admin_poll.id), stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['vote_id,poll_id,choice_id,choice_text,user_id,username,voted_at'])
+
+
+class QueryPlanTestCase(TestCase):
+    """Garante que as consultas principais continuam usando os índices criados para elas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Uma distribuição realista (poucas enquetes abertas entre muitas encerradas) com
+        # estatísticas atualizadas, para que o planejador escolha como faria em produção
+        user = User.objects.create_user(username='planner')
+        now = timezone.now()
+        Poll.objects.bulk_create(
+            Poll(title=f'Poll {i}', description='', created_by=user, is_active=(i % 20 == 0),
+                 deadline=now + timedelta(days=i % 7 - 3))
+            for i in range(400)
+        )
+        polls = list(Poll.objects.order_by('id')[:40])
+        choices = Choice.objects.bulk_create(Choice(poll=poll, choice_text=f'Option {i}') for poll in polls for i in range(2))
+        voters = User.objects.bulk_create(User(username=f'voter{i}') for i in range(50))
+        Vote.objects.bulk_create(
+            Vote(user=voter, poll_id=choice.poll_id, choice=choice)
+            for index, voter in enumerate(voters) for choice in choices[index % 2::2]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # Com tabelas quase vazias o Postgres prefere varredura sequencial; força o uso de índices
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f'Plano sem {index_name}:\n{plan}')
+
+    def test_poll_listing_uses_cursor_index(self):
+        self.assertUsesIndex(Poll.objects.order_by('-created_at', '-id')[:20], 'polls_poll_created_id_idx')
+
+    def test_active_poll_listing_uses_active_index(self):
+        queryset = Poll.objects.filter(is_active=True).order_by('-created_at', '-id')[:20]
+        self.assertUsesIndex(queryset, 'polls_poll_active_created_idx')
+
+    def test_expired_poll_scan_uses_partial_deadline_index(self):
+        queryset = Poll.objects.filter(is_active=True, deadline__isnull=False, deadline__lt=timezone.now())
+        self.assertUsesIndex(queryset, 'polls_poll_open_deadline_idx')
+
+    def test_vote_count_per_choice_uses_covering_index(self):
+        queryset = Vote.objects.filter(poll_id=1).order_by().values('choice_id').annotate(total=Count('id'))
+        self.assertUsesIndex(queryset, 'polls_vote_poll_choice_idx')
+
+    def test_vote_export_follows_poll_choice_index(self):
+        queryset = vote_export_queryset([1])
+        self.assertUsesIndex(queryset, 'polls_vote_poll_choice_idx')
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', queryset.explain()) # Sem ordenação à parte dos votos
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Orçamento de consultas por endpoint sobre um volume realista de dados.
+
+    Cada endpoint tem um teto fixo de consultas que não depende do número de enquetes,
+    opções ou votos: se uma mudança introduzir uma consulta por linha (N+1), o teste falha.
+    """
+    POLLS = 2000
+    CHOICES_PER_POLL = 3
+    VOTERS = 500
+    VOTES_PER_VOTER = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        creators = User.objects.bulk_create(User(username=f'creator{i}', password='!') for i in range(20))
+        voters = User.objects.bulk_create(User(username=f'voter{i}', password='!') for i in range(cls.VOTERS))
+        polls = Poll.objects.bulk_create(
+            Poll(title=f'Poll {i}', description='Lorem ipsum ' * 50, created_by=creators[i % len(creators)],
+                 deadline=timezone.now() + timedelta(days=30), is_proposal=bool(i % 2))
+            for i in range(cls.POLLS)
+        )
+        choices = Choice.objects.bulk_create(
+            Choice(poll=poll, choice_text=f'Option {j}', vote_count=0)
+            for poll in polls for j in range(cls.CHOICES_PER_POLL)
+        )
+        Vote.objects.bulk_create(
+            Vote(user=voter, poll=polls[(i * cls.VOTES_PER_VOTER + k) % cls.POLLS],
+                 choice=choices[((i * cls.VOTES_PER_VOTER + k) % cls.POLLS) * cls.CHOICES_PER_POLL + k % cls.CHOICES_PER_POLL])
+            for i, voter in enumerate(voters) for k in range(cls.VOTES_PER_VOTER)
+        )
+        call_command('rebuild_vote_counts', stdout=StringIO())
+
+        cls.poll = polls[0]
+        cls.choice = choices[0]
+        cls.admin = User.objects.create_user(username='budget_admin', is_staff=True)
+        cls.user = User.objects.create_user(username='budget_user')
+        cls.admin_token = Token.objects.create(user=cls.admin)
+        cls.user_token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        voted_index.clear()
+        # Tokens já no cache de autenticação, como num servidor em uso: a autenticação não consulta o banco
+        token_cache.clear()
+        for token in (self.user_token, self.admin_token):
+            CachedTokenAuthentication().authenticate_credentials(token.key)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with CaptureQueriesContext(connection) as queries:
+            yield
+        executed = [query['sql'] for query in queries.captured_queries]
+        self.assertLessEqual(
+            len(executed), budget,
+            msg=f'{len(executed)} consultas (orçamento: {budget}):\n' + '\n'.join(executed),
+        )
+
+    def test_poll_list_budget(self):
+        # 2 agregações do ETag + página + opções pré-buscadas
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('poll-list'), {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_poll_retrieve_budget(self):
+        # 2 consultas do ETag + enquete com criador + opções pré-buscadas
+        with self.assertMaxQueries(4):
+            response = self.client.get(reverse('poll-detail', args=[self.poll.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_poll_results_budget(self):
+        # enquete + contadores das opções
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('poll-results', args=[self.poll.id]))
+        self.assertGreater(response.data['total_votes'], 0)
+
+    def test_vote_budget(self):
+        # savepoint + INSERT ... SELECT + contador + release
+        with self.assertMaxQueries(4):
+            response = self.client.post(reverse('poll-vote', args=[self.poll.id]), {'choice': self.choice.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_choice_list_budget(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        # COUNT da paginação + página
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('choice_list_create'))
+        self.assertEqual(response.data['count'], self.POLLS * self.CHOICES_PER_POLL)
+
+    def test_vote_admin_changelist_budget(self):
+        superuser = User.objects.create_superuser(username='budget_superuser', password='x')
+        self.client.force_login(superuser)
+        url = reverse('admin:polls_vote_changelist')
+        with self.settings(ADMIN_EXACT_COUNT_LIMIT=1000), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        executed = [query['sql'] for query in queries.captured_queries]
+        # Sem COUNT(*) da tabela inteira (MAX(id) estima o total) e sem consultas por linha
+        self.assertFalse([sql for sql in executed if 'COUNT(' in sql.upper()], executed)
+        self.assertLessEqual(len(executed), 8, executed)
+        self.assertEqual(response.context['cl'].result_count, self.VOTERS * self.VOTES_PER_VOTER)
+
+        # Filtro pela enquete via URL, sem enumerar as enquetes na barra lateral
+        response = self.client.get(url, {'poll__id__exact': self.poll.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.context['cl'].result_count, Vote.objects.filter(poll=self.poll).count())
+
+
+class TokenAuthCacheTestCase(APITestCase):
+    """Cache de autenticação por token (polls.authentication.CachedTokenAuthentication)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cached_user')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.poll = Poll.objects.create(title='Auth Poll', description='', created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        voted_index.clear()
+        token_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('poll-results', args=[self.poll.id])
+
+    def test_cached_token_skips_auth_query(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url) # Resultados também em cache
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+
+    def test_logout_invalidates_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('user_logout'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_changes_invalidate_cache(self):
+        # Permissão de admin concedida depois do login vale na requisição seguinte
+        self.assertEqual(self.client.get(reverse('vote_bulk_ingest')).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('vote_bulk_ingest')).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_cache_is_bounded_lru_with_ttl(self):
+        users = [User(pk=i, username=f'u{i}') for i in range(3)]
+        lru = TokenCache(maxsize=2, ttl=60)
+        lru.set('a', users[0], None, lru.generation)
+        lru.set('b', users[1], None, lru.generation)
+        lru.get('a') # 'b' passa a ser o menos usado
+        lru.set('c', users[2], None, lru.generation)
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a')[0].username, 'u0')
+
+        generation = lru.generation
+        lru.discard_user(users[2].pk)
+        self.assertIsNone(lru.get('c'))
+        lru.set('c', users[2], None, generation) # Consulta anterior à invalidação: descartada
+        self.assertIsNone(lru.get('c'))
+
+        expired = TokenCache(maxsize=2, ttl=0.01)
+        expired.set('a', users[0], None, expired.generation)
+        time.sleep(0.02)
+        self.assertIsNone(expired.get('a'))
+
+
+    def test_voted_index_entries_expire(self):
+        index = VotedIndex(maxsize=2, ttl=0.01)
+        index.add(1, 1, 10, 100, timezone.now())
+        self.assertEqual(index.get(1, 1)[0], 10)
+        time.sleep(0.02)
+        self.assertIsNone(index.get(1, 1)) # Voto excluído em outro processo: o banco volta a decidir
+
+
+@override_settings(LIVE_RESULTS_TICK=0.01)
+class LiveResultsStreamTestCase(TestCase):
+    """Stream SSE dos resultados ao vivo (views assíncronas, somente ASGI)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='watcher')
+        cls.voter = User.objects.create_user(username='live_voter')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.poll = Poll.objects.create(title='Live Poll', description='', created_by=cls.user)
+        cls.choice = Choice.objects.create(poll=cls.poll, choice_text='Yes')
+        Choice.objects.create(poll=cls.poll, choice_text='No')
+
+    def setUp(self):
+        cache.clear()
+        voted_index.clear()
+        self.url = reverse('poll_results_stream', args=[self.poll.id])
+
+    def _vote(self):
+        with self.captureOnCommitCallbacks(execute=True): # Publica a mudança como após o commit
+            serializer = VoteSerializer(
+                data={'choice': self.choice.id},
+                context={'request': SimpleNamespace(user=self.voter), 'poll_id': self.poll.id},
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+    async def _next_event(self, stream):
+        event = await asyncio.wait_for(anext(stream), timeout=5)
+        name, data = event.decode().strip().split('\n')
+        return name.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    async def test_stream_sends_results_then_deltas(self):
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            name, data = await self._next_event(stream)
+            self.assertEqual(name, 'results')
+            self.assertEqual(data['total_votes'], 0)
+            self.assertEqual(data['poll_title'], 'Live Poll')
+
+            await sync_to_async(self._vote)()
+            name, data = await self._next_event(stream)
+            self.assertEqual(name, 'delta')
+            self.assertEqual(data['total_votes'], 1)
+            self.assertNotIn('poll_title', data) # Só o que mudou
+        finally:
+            await stream.aclose()
+
+    async def test_stream_requires_token_and_existing_poll(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(
+            reverse('poll_results_stream', args=[9999]), headers={'Authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_is_asgi_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 501)
+
+
+class AsyncPollViewsTestCase(TestCase):
+    """Variantes assíncronas de voto e resultados (ASYNC_POLL_VIEWS, ligadas pelo asgi.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='async_voter')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.poll = Poll.objects.create(title='Async Poll', description='', created_by=cls.user)
+        cls.choice = Choice.objects.create(poll=cls.poll, choice_text='Yes')
+        Choice.objects.create(poll=cls.poll, choice_text='No')
+
+    def setUp(self):
+        cache.clear()
+        voted_index.clear()
+        self.factory = AsyncRequestFactory()
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+
+    async def _vote(self, poll_id, data, headers=None):
+        request = self.factory.post(
+            f'/api/polls/{poll_id}/vote/', data, content_type='application/json',
+            headers=self.headers if headers is None else headers,
+        )
+        return await poll_vote(request, pk=poll_id)
+
+    async def test_vote_matches_sync_rules(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = await self._vote(self.poll.id, {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 201)
+        body = json.loads(response.content)
+        self.assertEqual(body['status'], 'voted')
+        self.assertEqual(body['vote']['choice'], self.choice.id)
+        await self.choice.arefresh_from_db()
+        self.assertEqual(self.choice.vote_count, 1)
+
+        response = await self._vote(self.poll.id, {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 400) # Voto duplicado
+        self.assertEqual(await Vote.objects.acount(), 1)
+
+        response = await self._vote(9999, {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 404)
+        response = await self._vote(self.poll.id, {'choice': self.choice.id}, headers={})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    async def test_vote_accepts_form_data(self):
+        request = self.factory.post(f'/api/polls/{self.poll.id}/vote/', {'choice': self.choice.id}, headers=self.headers)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = await poll_vote(request, pk=self.poll.id)
+        self.assertEqual(response.status_code, 201)
+
+    async def test_options_answered_by_drf_metadata(self):
+        request = self.factory.options(f'/api/polls/{self.poll.id}/vote/', headers=self.headers)
+        response = await poll_vote(request, pk=self.poll.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('application/json', json.loads(response.content)['parses'])
+        response = await register(self.factory.options('/api/auth/register/'))
+        self.assertIn('POST', json.loads(response.content)['actions'])
+
+    async def test_results_match_sync_view(self):
+        url = reverse('poll-results', args=[self.poll.id])
+        sync_response = await self.async_client.get(url, headers=self.headers) # Action do PollViewSet
+        response = await poll_results(self.factory.get(url, headers=self.headers), pk=self.poll.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), sync_response.json())
+        self.assertEqual(response['ETag'], sync_response['ETag'])
+
+        request = self.factory.get(url, headers={**self.headers, 'If-None-Match': response['ETag']})
+        self.assertEqual((await poll_results(request, pk=self.poll.id)).status_code, 304)
+        response = await poll_results(self.factory.get(url, headers=self.headers), pk=9999)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_authentication_errors_match_sync_views(self):
+        """Credenciais ausentes, malformadas ou inválidas recebem o mesmo 401 do TokenAuthentication."""
+        inactive = await User.objects.acreate(username='async_inactive', is_active=False)
+        inactive_token = await Token.objects.acreate(user=inactive)
+        for headers in ({}, {'Authorization': 'Token'}, {'Authorization': 'Token a b'}, {'Authorization': 'Token bogus'},
+                        {'Authorization': f'token {inactive_token.key}'}):
+            with self.subTest(headers=headers):
+                url = reverse('poll-results', args=[self.poll.id])
+                sync_response = await self.async_client.get(url, headers=headers)
+                response = await poll_results(self.factory.get(url, headers=headers), pk=self.poll.id)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(json.loads(response.content), sync_response.json())
+                self.assertEqual(response['WWW-Authenticate'], sync_response['WWW-Authenticate'])
+
+                url = reverse('poll-vote', args=[self.poll.id])
+                sync_response = await self.async_client.post(
+                    url, {'choice': self.choice.id}, content_type='application/json', headers=headers,
+                )
+                response = await self._vote(self.poll.id, {'choice': self.choice.id}, headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(json.loads(response.content), sync_response.json())
+
+
+class PasswordHashPoolTestCase(TestCase):
+    """Login e registro com o hash da senha no pool de hashes (polls.hashing)."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    def test_pool_is_bounded_by_setting(self):
+        self.assertEqual(get_hash_pool()._max_workers, settings.PASSWORD_HASH_CONCURRENCY)
+
+    def test_sync_login_and_register_report_hash_timing(self):
+        response = self.client.post(reverse('user_register'), {'username': 'ana', 'email': 'Ana@Example.COM', 'password': 's3nha-forte'})
+        self.assertEqual(response.status_code, 201)
+        self.assertRegex(response['Server-Timing'], r'^hash-wait;dur=[0-9.]+, hash;dur=[0-9.]+$')
+        user = User.objects.get(username='ana')
+        self.assertEqual(user.email, 'Ana@example.com') # Normalizado como em create_user
+        self.assertTrue(user.check_password('s3nha-forte'))
+
+        response = self.client.post(reverse('api_token_auth'), {'username': 'ana', 'password': 's3nha-forte'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], Token.objects.get(user=user).key)
+        self.assertIn('Server-Timing', response)
+
+        response = self.client.post(reverse('api_token_auth'), {'username': 'ana', 'password': 'errada'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('api_token_auth'), {'username': 'ninguem', 'password': 'errada'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Server-Timing', response) # Hash descartável: o tempo não revela se o usuário existe
+        self.assertNotIn('Server-Timing', self.client.get(reverse('poll-list')))
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        user = User.objects.create(username='antigo', password=make_password('s3nha-forte', hasher='pbkdf2_sha1'))
+        response = self.client.post(reverse('api_token_auth'), {'username': 'antigo', 'password': 's3nha-forte'})
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+    async def test_async_login_and_register(self):
+        request = self.factory.post(
+            '/api/auth/register/', {'username': 'bia', 'password': 's3nha-forte'}, content_type='application/json',
+        )
+        response = await register(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content), {'username': 'bia', 'email': ''})
+
+        request = self.factory.post(
+            '/api/auth/register/', {'username': 'bia', 'password': 'outra'}, content_type='application/json',
+        )
+        self.assertEqual((await register(request)).status_code, 400) # Username já cadastrado
+
+        async def ticks():
+            # O event loop continua atendendo enquanto o hash roda no pool
+            count = 0
+            while not login_task.done():
+                count += 1
+                await asyncio.sleep(0.001)
+            return count
+
+        request = self.factory.post('/api/auth/login/', {'username': 'bia', 'password': 's3nha-forte'})
+        login_task = asyncio.ensure_future(login(request))
+        loop_ticks = await ticks()
+        response = await login_task
+        self.assertEqual(response.status_code, 200)
+        token = await Token.objects.aget(user__username='bia')
+        self.assertEqual(json.loads(response.content), {'token': token.key})
+        self.assertGreater(loop_ticks, 1)
+
+        request = self.factory.post(
+            '/api/auth/login/', {'username': 'bia', 'password': 'errada'}, content_type='application/json',
+        )
+        response = await login(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'non_field_errors': ['Unable to log in with provided credentials.']})
+        request = self.factory.post('/api/auth/login/', {'username': 'bia'}, content_type='application/json')
+        self.assertEqual(json.loads((await login(request)).content), {'password': ['This field is required.']})
+
+
+class ColdStartTestCase(SimpleTestCase):
+    """Partida a frio com as settings só da API (cyber_civics_api.settings_api), medida em interpretadores novos."""
+
+    def test_api_profile_imports_only_what_the_api_needs(self):
+        modules = {timing.module for timing in profile_imports('cyber_civics_api.settings_api')}
+        self.assertIn('polls.views', modules) # A primeira requisição carregou as URLs e as views
+        # O django.contrib.admin em si ainda é importado pelos routers do DRF (schemas → admindocs)
+        for module in ('polls.admin', 'django.contrib.sessions.middleware', 'whitenoise.middleware', 'documentation.views'):
+            self.assertNotIn(module, modules)
+        # Endpoints raros importam os seus módulos sob demanda
+        for module in ('polls.ingestion', 'polls.provisioning', 'polls.exports', 'polls.vote_buffer', 'polls.live'):
+            self.assertNotIn(module, modules)
+
+    def test_cold_start_with_token_reaches_the_database(self):
+        # Um token (mesmo inválido) leva a primeira requisição à consulta do token no banco
+        anonymous = {timing.module for timing in profile_imports('cyber_civics_api.settings_api')}
+        with_token = {timing.module for timing in profile_imports('cyber_civics_api.settings_api', token='invalido')}
+        self.assertNotIn('django.db.models.sql.compiler', anonymous)
+        self.assertIn('django.db.models.sql.compiler', with_token)
+
+    def test_bench_cold_start_reports_over_budget(self):
+        # Só o caminho de erro, com limites impossíveis: tempo de relógio num teste dependeria da máquina
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, 'Cold start over budget') as raised:
+            call_command(
+                'bench_cold_start', '--settings-module', 'cyber_civics_api.settings_api', '--runs', '1',
+                '--max-wall-ms', '1', '--max-rss-mb', '1', stdout=out,
+            )
+        self.assertIn('wall time', str(raised.exception))
+        self.assertIn('peak RSS', str(raised.exception))
+        self.assertIn('[401 Unauthorized]', out.getvalue())
+        self.assertIn('pass --token', out.getvalue()) # A requisição anônima não mede o banco
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import UserRegistrationView, PollViewSet, ChoiceViewSet
+from .async_views import login, poll_results, poll_results_stream, poll_vote, register
+from .views import UserRegistrationView, UserLogoutView, UserBulkImportView, BulkVoteIngestView, PollViewSet, ChoiceViewSet
 
 # Cria um router para ViewSets
 router = DefaultRouter()
@@ -18,9 +20,23 @@ router.register(r'polls', PollViewSet) # Rota para PollViewSet
 
 urlpatterns = [
     path('auth/register/', UserRegistrationView.as_view(), name='user_register'), # Endpoint de registro
+    path('auth/logout/', UserLogoutView.as_view(), name='user_logout'), # Logout: exclui o token
+    path('users/bulk/', UserBulkImportView.as_view(), name='user_bulk_import'), # Cadastro em massa de eleitores (admin only)
+    path('votes/bulk/', BulkVoteIngestView.as_view(), name='vote_bulk_ingest'), # Ingestão em massa de votos offline (admin only)
+    path('polls/<int:pk>/results/stream/', poll_results_stream, name='poll_results_stream'), # Resultados ao vivo via SSE (somente ASGI)
     path('', include(router.urls)), # Inclui as URLs geradas pelo router (para Polls)
     path('choices/', ChoiceViewSet.as_view({'get': 'list', 'post': 'create'}), name='choice_list_create'), # Endpoint para listar/criar opções (admin only create)
     path('choices/<int:pk>/', ChoiceViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='choice_detail_update_delete'), # Endpoint para detalhe/atualizar/excluir opção (admin only)
     # O endpoint de voto está como uma @action em PollViewSet: /api/polls/{pk}/vote/
     # O endpoint de resultados está como uma @action em PollViewSet: /api/polls/{pk}/results/
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_POLL_VIEWS:
+    # Sob ASGI, login, registro, voto e resultados são atendidos pelas variantes assíncronas (mesmas
+    # URLs e respostas); vêm antes do router, e do login do projeto, para ter precedência
+    urlpatterns[:0] = [
+        path('auth/login/', login, name='user_login_async'),
+        path('auth/register/', register, name='user_register_async'),
+        path('polls/<int:pk>/vote/', poll_vote, name='poll_vote_async'),
+        path('polls/<int:pk>/results/', poll_results, name='poll_results_async'),
+    ]
\ No newline at end of file
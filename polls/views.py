@@ -1,21 +1,39 @@
-from rest_framework import generics, viewsets, status
+from rest_framework import generics, serializers, viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count # Importe para contagem de votos
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
 
-from .models import Poll, Choice, Vote
+from .models import DEFAULT_CHOICE_TEXTS, Poll, Choice, Vote
 from .serializers import (
     UserRegistrationSerializer,
     PollSerializer,
+    PollListSerializer,
+    PollValuesSerializer,
     PollCreateSerializer,
     ChoiceSerializer,
     VoteSerializer,
-    PollResultSerializer
 )
+from .pagination import PollCursorPagination
 from .permissions import IsAdminOnly, IsAdminOrPollCreatorForChoices, CanVote
+from .snapshots import poll_results_payload, refresh_results_snapshots
+from .voted_index import voted_index
+# Ingestão, cadastro e exportação em massa e o buffer de votos são importados nas views que os usam:
+# endpoints raros (ou desligados por padrão) que cada partida a frio não precisa pagar (polls.coldstart)
+from .caching import (
+    bump_results_version,
+    get_cached_results,
+    get_results_version,
+    not_modified_response,
+    poll_detail_validators,
+    poll_list_validators,
+    set_cached_results,
+    set_validators,
+)
 from rest_framework.exceptions import PermissionDenied
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -24,11 +42,51 @@ class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny] # Permite que qualquer um crie uma conta
 
+class UserLogoutView(generics.GenericAPIView):
+    """Endpoint de logout: exclui o token usado na requisição (e sua entrada no cache de autenticação)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        request.auth.delete() # O sinal post_delete do Token invalida o cache (polls.authentication)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class BulkVoteIngestView(generics.GenericAPIView):
+    """Endpoint (somente admin) para ingerir em massa votos coletados offline."""
+    permission_classes = [IsAdminOnly]
+
+    def post(self, request, *args, **kwargs):
+        # Corpo: lista de registros {user, poll, choice, voted_at}; user é o id ou o username
+        if not isinstance(request.data, list):
+            return Response(
+                {'non_field_errors': ['Envie uma lista de registros de voto.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        from .ingestion import ingest_votes, summarize
+        results = list(ingest_votes(request.data))
+        return Response({**summarize(results), 'results': results}, status=status.HTTP_200_OK)
+
+class UserBulkImportView(generics.GenericAPIView):
+    """Endpoint (somente admin) para cadastrar em massa uma lista de eleitores."""
+    permission_classes = [IsAdminOnly]
+
+    def post(self, request, *args, **kwargs):
+        # Corpo: lista de registros {username, email, password}; email e password são opcionais
+        if not isinstance(request.data, list):
+            return Response(
+                {'non_field_errors': ['Envie uma lista de eleitores.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        from .provisioning import import_voters, summarize
+        results = list(import_voters(request.data))
+        return Response({**summarize(results), 'results': results}, status=status.HTTP_200_OK)
+
 class PollViewSet(viewsets.ModelViewSet):
     """ViewSet para gerenciar Enquetes e Propostas."""
     queryset = Poll.objects.all().order_by('-created_at')
     serializer_class = PollSerializer
     permission_classes = [IsAuthenticated] # Default: exige autenticação
+    lookup_value_regex = r'\d+' # PKs são inteiros (a action vote usa o pk da URL diretamente)
+    pagination_class = PollCursorPagination # Cursor em created_at, desempatado por id
 
     def get_queryset(self):
         """
@@ -37,9 +95,31 @@ class PollViewSet(viewsets.ModelViewSet):
         """
         queryset = super().get_queryset() # Obtém o queryset base
 
-        # Para as ações 'list' e 'retrieve', pré-busca os objetos Choice relacionados
+        # Filtro opcional ?is_active=true|false na listagem: confiável porque a varredura de
+        # prazos (polls.expiry) encerra as enquetes vencidas, e indexado para as ativas
+        if self.action == 'list' and 'is_active' in self.request.query_params:
+            is_active = serializers.BooleanField().run_validation(self.request.query_params['is_active'])
+            queryset = queryset.filter(is_active=is_active)
+
+        # Para as ações 'list' e 'retrieve', pré-busca os objetos Choice relacionados,
+        # traz o criador na mesma consulta (PollSerializer exibe created_by.username)
+        # e carrega apenas as colunas que o serializer da ação de fato emite
+        if self.action == 'results':
+            return queryset.select_related('result_snapshot') # Snapshot dos resultados finais na mesma consulta
+
         if self.action in ['list', 'retrieve']:
-            queryset = queryset.prefetch_related('choices')
+            if settings.FAST_POLL_READS:
+                # Caminho rápido: linhas de .values() serializadas por PollValuesSerializer
+                return queryset.values(*PollValuesSerializer(self.get_serializer_class()).values_columns())
+            columns = [
+                field for field in self.get_serializer_class().Meta.fields
+                if field not in ('choices', 'created_by')
+            ]
+            queryset = (
+                queryset.select_related('created_by')
+                .only(*columns, 'created_by', 'created_by__username')
+                .prefetch_related(Prefetch('choices', queryset=Choice.objects.only('id', 'choice_text', 'poll').order_by('id')))
+            )
 
         return queryset
 
@@ -47,6 +127,8 @@ class PollViewSet(viewsets.ModelViewSet):
         """Retorna o serializer apropriado para a ação."""
         if self.action == 'create':
             return PollCreateSerializer
+        if self.action == 'list':
+            return PollListSerializer # Listagem compacta, sem a descrição
         return PollSerializer
 
     def get_permissions(self):
@@ -54,17 +136,46 @@ class PollViewSet(viewsets.ModelViewSet):
         # Permissão para criar é IsAuthenticated (qualquer usuário logado pode criar proposta/enquete via perform_create)
         if self.action == 'create':
             self.permission_classes = [IsAuthenticated]
-        # Permissão para update/delete/partial_update é IsAdminOnly (apenas admins podem editar/deletar)
-        elif self.action in ['update', 'partial_update', 'destroy']:
+        # Permissão para update/delete/partial_update/export_votes é IsAdminOnly (apenas admins podem editar/deletar/exportar)
+        elif self.action in ['update', 'partial_update', 'destroy', 'export_votes']:
             self.permission_classes = [IsAdminOnly]
-        # Permissão para list/retrieve/results/vote é IsAuthenticated
-        elif self.action in ['list', 'retrieve', 'results', 'vote']:
+        # Permissão para list/retrieve/results/vote/my_vote é IsAuthenticated
+        elif self.action in ['list', 'retrieve', 'results', 'vote', 'my_vote']:
             self.permission_classes = [IsAuthenticated] # Permite listar/ver detalhes/resultados/votar para qualquer autenticado
         else:
             self.permission_classes = [IsAuthenticated] # Permissão padrão
 
         return [permission() for permission in self.permission_classes]
 
+    def list(self, request, *args, **kwargs):
+        """Lista as enquetes; responde 304 (sem serializar nada) se o ETag do cliente ainda vale."""
+        etag, last_modified = poll_list_validators(request)
+        # Só o ETag decide o 304: exclusões não fazem o Last-Modified avançar
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        if not settings.FAST_POLL_READS:
+            return set_validators(super().list(request, *args, **kwargs), etag, last_modified)
+
+        rows = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        data = PollValuesSerializer(self.get_serializer_class()).to_representation(rows)
+        return set_validators(self.get_paginated_response(data), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Detalha uma enquete; responde 304 (sem serializar nada) se o ETag do cliente ainda vale."""
+        etag, last_modified = poll_detail_validators(request, kwargs[self.lookup_field])
+        if etag is None:
+            return super().retrieve(request, *args, **kwargs) # Enquete inexistente: deixa o 404 padrão
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        if not settings.FAST_POLL_READS:
+            return set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+        row = self.get_object()
+        data = PollValuesSerializer(self.get_serializer_class()).to_representation([row])[0]
+        return set_validators(Response(data), etag, last_modified)
+
     def create(self, request, *args, **kwargs):
         """
         Sobrescreve o método create para usar PollSerializer na resposta
@@ -97,9 +208,8 @@ class PollViewSet(viewsets.ModelViewSet):
         poll_instance = serializer.save(created_by=user, is_proposal=not user.is_staff)
 
         # Adicionar opções padrão à enquete/proposta recém-criada
-        default_choices = ["Concordo", "Discordo", "Neutro"]
         choices_to_create = [
-            Choice(poll=poll_instance, choice_text=text) for text in default_choices
+            Choice(poll=poll_instance, choice_text=text) for text in DEFAULT_CHOICE_TEXTS
         ]
         Choice.objects.bulk_create(choices_to_create) # Cria as opções em massa para eficiência
 
@@ -108,62 +218,101 @@ class PollViewSet(viewsets.ModelViewSet):
         """Permite que admins editem enquetes/propostas."""
         # A permissão IsAdminOnly já garante que apenas admins chegam aqui
         # Admins podem editar qualquer campo, incluindo is_active e deadline
-        serializer.save()
+        poll = serializer.save()
+        bump_results_version(poll.pk) # Título, is_active e deadline aparecem nos resultados
+        refresh_results_snapshots([poll.pk]) # Encerrar congela os resultados; reabrir descarta o snapshot
 
     def perform_destroy(self, instance):
         """Permite que admins excluam enquetes/propostas."""
         # A permissão IsAdminOnly já garante que apenas admins chegam aqui
+        poll_id = instance.pk # delete() zera o pk da instância
         instance.delete()
+        # Só depois da exclusão: sem transação aberta o on_commit roda na hora, e uma leitura
+        # entre a troca de versão e o delete guardaria os resultados antigos na versão nova
+        bump_results_version(poll_id)
 
     @action(detail=True, methods=['post'], permission_classes=[CanVote])
     def vote(self, request, pk=None):
         """Endpoint para votar em uma enquete/proposta."""
-        poll = self.get_object() # Obtém a enquete pelo PK
-
-        # Usa o VoteSerializer para validar e criar o voto
-        # Passamos a enquete encontrada para o serializer
-        serializer = VoteSerializer(data=request.data, context={'request': request, 'poll': poll})
+        # A enquete não é carregada aqui: o VoteSerializer valida enquete, opção e prazo
+        # no próprio INSERT do voto (e responde 404 se a enquete não existir)
+        serializer = VoteSerializer(data=request.data, context={'request': request, 'poll_id': int(pk)})
 
         if serializer.is_valid():
+            if settings.VOTE_WRITE_BEHIND:
+                # Voto validado e guardado no buffer local: é gravado no banco na próxima descarga
+                from .vote_buffer import enqueue_vote
+                vote = enqueue_vote(request.user, int(pk), serializer.validated_data['choice_id'])
+                return Response({'status': 'queued', 'vote': VoteSerializer(vote).data}, status=status.HTTP_202_ACCEPTED)
             # O serializer já tem a lógica de validação (enquete ativa, não votou, etc.)
             serializer.save()
             return Response({'status': 'voted', 'vote': serializer.data}, status=status.HTTP_201_CREATED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['get'], url_path='my-vote', permission_classes=[IsAuthenticated])
+    def my_vote(self, request, pk=None):
+        """Endpoint que diz se o usuário já votou na enquete e em qual opção."""
+        # Pelo índice de quem já votou (polls.voted_index): sem consultas para quem votou recentemente
+        entry = voted_index.load(request.user.pk, int(pk))
+        if entry is None:
+            if not Poll.objects.filter(pk=pk).exists():
+                raise Http404(f"No {Poll._meta.object_name} matches the given query.")
+            return Response({'voted': False, 'vote': None})
+        vote_id, choice_id, voted_at = entry
+        vote = Vote(pk=vote_id, user=request.user, poll_id=int(pk), choice_id=choice_id, voted_at=voted_at)
+        return Response({'voted': True, 'vote': VoteSerializer(vote).data})
+
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def results(self, request, pk=None):
         """Endpoint para visualizar os resultados de uma enquete/proposta, incluindo total e porcentagem."""
-        poll = self.get_object() # Obtém a enquete pelo PK
-
-        # Calcula o total de votos para esta enquete
-        total_poll_votes = Vote.objects.filter(poll=poll).count()
-
-        # Consulta as opções desta enquete, anota com a contagem de votos para cada opção,
-        # e seleciona apenas o texto da opção e a contagem.
-        results_data = Choice.objects.filter(poll=poll).annotate(vote_count=Count('votes')).values('choice_text', 'vote_count')
-
-        # Serializa os dados, passando o total de votos no contexto
-        # O serializer usará este contexto para calcular a porcentagem.
-        serializer = PollResultSerializer(results_data, many=True, context={'total_votes': total_poll_votes})
-
-        # Opcional: Adicionar o total de votos da enquete no nível superior da resposta
-        # Crie um dicionário combinando o total e os resultados detalhados.
-        response_data = {
-            'poll_id': poll.id,
-            'poll_title': poll.title,
-            'total_votes': total_poll_votes,
-            'choices_results': serializer.data,
-            'is_active': poll.is_active, # Pode ser útil saber se ainda está ativa
-            'deadline': poll.deadline,
-        }
-
-
-        return Response(response_data)
+        # O payload fica em cache sob a versão dos resultados (trocada a cada voto/alteração),
+        # junto com o hash que serve de ETag: se o cliente já tem o payload atual, responde
+        # 304 sem tocar no banco
+        pk = int(pk) # "05" e "5" são a mesma enquete: a mesma chave que o voto invalida
+        version = get_results_version(pk)
+        cached = get_cached_results(pk, version)
+        if cached is None:
+            poll = self.get_object() # Obtém a enquete pelo PK (já com o snapshot, se houver)
+            # Enquete encerrada: os resultados finais congelados, sem recalcular nada
+            cached = set_cached_results(pk, version, poll_results_payload(poll))
+        etag, response_data = cached
+
+        # Resultados de enquete encerrada não mudam mais: o cliente pode reutilizá-los sem revalidar
+        max_age = None if response_data['is_active'] else settings.POLL_SNAPSHOT_MAX_AGE
+        not_modified = not_modified_response(request, etag, max_age=max_age)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(Response(response_data), etag, max_age=max_age)
+
+    @action(detail=True, methods=['get'], url_path='votes/export', permission_classes=[IsAdminOnly])
+    def export_votes(self, request, pk=None):
+        """Endpoint (somente admin) que exporta todos os votos da enquete em CSV ou NDJSON, em streaming."""
+        from django.core.handlers.asgi import ASGIRequest
+
+        from .exports import EXPORT_FORMATS, async_chunks, vote_rows
+        # O parâmetro é `output` porque `format` é reservado pelo DRF para a negociação de conteúdo
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'output': [f"Formato inválido. Use um de: {', '.join(EXPORT_FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not Poll.objects.filter(pk=pk).exists():
+            raise Http404(f"No {Poll._meta.object_name} matches the given query.")
+
+        content_type, render, extension = EXPORT_FORMATS[output]
+        # As linhas são lidas e enviadas em blocos enquanto o cliente baixa: memória constante
+        chunks = render(vote_rows([pk]))
+        if isinstance(request._request, ASGIRequest):
+            chunks = async_chunks(chunks) # O Django acumularia um iterador síncrono antes de enviar
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="poll-{pk}-votes.{extension}"'
+        return response
 
 class ChoiceViewSet(viewsets.ModelViewSet):
     """ViewSet para gerenciar Opções de Voto."""
-    queryset = Choice.objects.all()
+    queryset = Choice.objects.all().order_by('id') # Ordem estável para a paginação
     serializer_class = ChoiceSerializer
     # Permissão padrão: apenas admins. Sobrescrevemos para ações específicas.
     permission_classes = [IsAdminOnly]
@@ -223,6 +372,23 @@ class ChoiceViewSet(viewsets.ModelViewSet):
         # - Ou porque não é administrador, mas passou pela checagem aninhada (é o dono da proposta).
         # Agora podemos salvar a opção.
         serializer.save()
+        bump_results_version(poll.pk)
+        refresh_results_snapshots([poll.pk])
+
+    def perform_update(self, serializer):
+        # A opção pode ter mudado de texto ou até de enquete: invalida os resultados das duas
+        previous_poll_id = serializer.instance.poll_id
+        choice = serializer.save()
+        bump_results_version(previous_poll_id)
+        if choice.poll_id != previous_poll_id:
+            bump_results_version(choice.poll_id)
+        refresh_results_snapshots([previous_poll_id, choice.poll_id])
+
+    def perform_destroy(self, instance):
+        # Exclui e regrava o snapshot antes de trocar a versão (ver PollViewSet.perform_destroy)
+        instance.delete()
+        refresh_results_snapshots([instance.poll_id])
+        bump_results_version(instance.poll_id)
 
     # Note: perform_update e perform_destroy não precisam ser sobrescritos aqui para permissão,
     # pois get_permissions já as restringe a IsAdminOnly, o que está correto com a regra
@@ -0,0 +1,194 @@
+"""
+Gravação adiada dos votos (write-behind), para picos de milhares de votos por segundo.
+
+Com ``VOTE_WRITE_BEHIND`` o endpoint de voto não grava o voto no banco: valida
+a enquete, a opção e o voto anterior do usuário com uma única leitura
+(``enqueue_vote``), acrescenta o voto a um buffer local durável e responde
+``202 Accepted``. O buffer é um arquivo SQLite em modo WAL (``VOTE_BUFFER_PATH``)
+com ``synchronous=FULL``: o voto confirmado ao cliente já está em disco.
+
+``flush_vote_buffer`` grava os votos do buffer em lotes pela ingestão em massa
+(polls.ingestion): um ``bulk_create`` e uma atualização de contador por opção
+por lote, com as mesmas regras do voto pela API, exceto ``is_active``: o voto já
+foi confirmado com 202 por ``enqueue_vote`` numa enquete ativa, e um encerramento
+posterior (pela varredura ou por um admin) não o descarta; o prazo continua
+comparado com o ``voted_at`` do voto. O lote é lido sem travar o buffer (novos
+votos continuam entrando durante a gravação no banco) e só sai dele depois do
+commit no banco, num DELETE curto; se o processo cair no meio, ou se duas
+descargas lerem o mesmo lote, os votos que já tinham entrado são descartados
+como duplicados. Uma thread por processo (``VoteBufferFlusher``)
+descarrega o buffer a cada ``VOTE_BUFFER_FLUSH_INTERVAL`` segundos, começando
+pelo que sobrou de uma execução anterior.
+
+A regra de um voto por usuário vale no buffer (UNIQUE (user_id, poll_id)) e no
+banco. Os resultados passam a refletir um voto só após a descarga.
+"""
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .ingestion import ACCEPTED, DUPLICATE, INVALID, ingest_votes, summarize
+from .models import Choice, Vote
+from .serializers import ALREADY_VOTED_MESSAGE, raise_vote_rejection
+from .voted_index import voted_index
+
+logger = logging.getLogger(__name__)
+
+
+class VoteBuffer:
+    """Fila durável de votos num arquivo SQLite, compartilhável entre threads e processos."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local() # Uma conexão por thread (o sqlite3 não as compartilha)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # isolation_level=None: cada comando faz seu próprio commit, salvo dentro de BEGIN ... COMMIT
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL') # O commit só retorna com o voto em disco
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS pending_vote ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, poll_id INTEGER NOT NULL, '
+                'choice_id INTEGER NOT NULL, voted_at TEXT NOT NULL, UNIQUE (user_id, poll_id))'
+            )
+            self._local.connection = connection
+        return connection
+
+    def append(self, user_id, poll_id, choice_id, voted_at):
+        """Acrescenta o voto ao buffer. Retorna False se o usuário já tem um voto pendente na enquete."""
+        try:
+            self._connection().execute(
+                'INSERT INTO pending_vote (user_id, poll_id, choice_id, voted_at) VALUES (?, ?, ?, ?)',
+                (user_id, poll_id, choice_id, voted_at.isoformat()),
+            )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM pending_vote').fetchone()[0]
+
+    @contextmanager
+    def batch(self, size):
+        """
+        Gera os ``size`` votos mais antigos como registros da ingestão em massa e os remove do
+        buffer se o bloco terminar sem erro. O buffer não fica travado durante o bloco: novos
+        votos (com ids maiores, pelo AUTOINCREMENT) entram normalmente e não são removidos.
+        """
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT id, user_id, poll_id, choice_id, voted_at FROM pending_vote ORDER BY id LIMIT ?', (size,),
+        ).fetchall()
+        yield [
+            {'user': user_id, 'poll': poll_id, 'choice': choice_id, 'voted_at': voted_at}
+            for _, user_id, poll_id, choice_id, voted_at in rows
+        ]
+        if rows:
+            connection.execute('DELETE FROM pending_vote WHERE id <= ?', (rows[-1][0],))
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """O buffer de ``VOTE_BUFFER_PATH`` (um objeto por arquivo no processo)."""
+    path = str(settings.VOTE_BUFFER_PATH)
+    with _buffers_lock:
+        if path not in _buffers:
+            _buffers[path] = VoteBuffer(path)
+        return _buffers[path]
+
+
+def enqueue_vote(user, poll_id, choice_id):
+    """
+    Valida o voto como ``VoteSerializer.create`` e o acrescenta ao buffer, sem gravar no banco.
+    Retorna o Vote não salvo (sem id); levanta ValidationError ou Http404 como o caminho síncrono.
+    """
+    if voted_index.get(user.pk, poll_id) is not None:
+        raise serializers.ValidationError({"non_field_errors": [ALREADY_VOTED_MESSAGE]})
+    voted_at = timezone.now()
+    # Uma leitura: opção da enquete, enquete ativa e no prazo, e se o usuário já votou nela
+    already_voted = (
+        Choice.objects.filter(pk=choice_id, poll_id=poll_id, poll__is_active=True)
+        .filter(Q(poll__deadline__isnull=True) | Q(poll__deadline__gte=voted_at))
+        .annotate(voted=Exists(Vote.objects.filter(user_id=user.pk, poll_id=OuterRef('poll_id'))))
+        .values_list('voted', flat=True)
+        .first()
+    )
+    if already_voted is None:
+        raise_vote_rejection(poll_id, choice_id)
+    if already_voted or not get_vote_buffer().append(user.pk, poll_id, choice_id, voted_at):
+        raise serializers.ValidationError({"non_field_errors": [ALREADY_VOTED_MESSAGE]})
+    return Vote(user=user, poll_id=poll_id, choice_id=choice_id, voted_at=voted_at)
+
+
+def flush_vote_buffer(buffer=None, batch_size=None):
+    """
+    Grava no banco todos os votos do buffer, um lote de ``batch_size`` (padrão:
+    ``BULK_VOTE_CHUNK_SIZE``) por vez. Retorna os totais por status, como ``summarize``.
+    """
+    buffer = buffer or get_vote_buffer()
+    batch_size = batch_size or settings.BULK_VOTE_CHUNK_SIZE
+    totals = summarize([])
+    while True:
+        with buffer.batch(batch_size) as records:
+            if not records:
+                break
+            results = list(ingest_votes(records, chunk_size=batch_size, check_active=False))
+        for status, count in summarize(results).items():
+            totals[status] += count
+        rejected = [(records[result['index']], result['errors']) for result in results if result['status'] == INVALID]
+        for record, errors in rejected:
+            # Ex.: a enquete ou a opção foi excluída entre a confirmação e a descarga
+            logger.warning('Dropped buffered vote %s: %s', record, errors)
+    if totals[ACCEPTED] or totals[DUPLICATE]:
+        logger.info('Flushed buffered votes: %s', totals)
+    return totals
+
+
+class VoteBufferFlusher(threading.Thread):
+    """Thread que chama ``flush_vote_buffer`` logo ao iniciar e depois a cada ``interval`` segundos."""
+
+    def __init__(self, interval):
+        super().__init__(name='vote-buffer-flusher', daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                flush_vote_buffer()
+            except Exception:
+                logger.exception('Vote buffer flush failed.')
+            finally:
+                close_old_connections() # A thread tem sua própria conexão com o banco
+            if self._stopped.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stopped.set()
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def start_vote_buffer_flusher(interval):
+    """Inicia (uma única vez por processo) a descarga periódica do buffer em segundo plano."""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = VoteBufferFlusher(interval)
+            _flusher.start()
+        return _flusher
@@ -0,0 +1,108 @@
+"""
+Índice em memória de quem já votou em cada enquete.
+
+Tentativas repetidas de voto (retries, clique duplo) são uma parte grande do
+tráfego de votação. O índice guarda, para os pares ``(usuário, enquete)`` vistos
+recentemente, o voto já gravado: a segunda tentativa é recusada sem ir ao
+banco, e ``GET /api/polls/{id}/my-vote/`` responde do mesmo índice.
+
+O índice só guarda votos que existiam no banco (registrados após o commit do
+voto ou lidos do banco); uma falta não diz nada e a decisão fica com o banco,
+como antes. É do próprio processo e limitado a ``VOTED_INDEX_SIZE`` pares (os
+menos usados saem primeiro). Votos excluídos (no admin ou em cascata com a
+enquete, a opção ou o usuário) saem do índice do processo que os excluiu; nos
+demais processos a entrada vale até expirar, após ``VOTED_INDEX_TTL`` segundos.
+Nesse intervalo um acerto pode ser de um voto que já não existe: o usuário
+recebe "já votou" e pode votar de novo quando a entrada expirar.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete
+
+from .models import Choice, Poll, Vote
+
+
+class VotedIndex:
+    """LRU com TTL de ``(user_id, poll_id) -> (vote_id, choice_id, voted_at)``, seguro entre threads."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict() # (usuário, enquete) -> (expira_em, voto)
+        self._lock = threading.Lock()
+
+    def get(self, user_id, poll_id):
+        with self._lock:
+            entry = self._entries.get((user_id, poll_id))
+            if entry is None:
+                return None
+            expires_at, vote = entry
+            if expires_at <= time.monotonic():
+                del self._entries[(user_id, poll_id)]
+                return None
+            self._entries.move_to_end((user_id, poll_id))
+            return vote
+
+    def add(self, user_id, poll_id, vote_id, choice_id, voted_at):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, poll_id)] = (time.monotonic() + self.ttl, (vote_id, choice_id, voted_at))
+            self._entries.move_to_end((user_id, poll_id))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def load(self, user_id, poll_id):
+        """Como ``get``, buscando no banco numa falta; retorna None se o usuário não votou."""
+        entry = self.get(user_id, poll_id)
+        if entry is not None:
+            return entry
+        row = Vote.objects.filter(user_id=user_id, poll_id=poll_id).values_list('id', 'choice_id', 'voted_at').first()
+        if row is not None:
+            self.add(user_id, poll_id, *row)
+        return row
+
+    def forget_polls(self, poll_ids):
+        # Percorre o índice inteiro: só roda em exclusões, raras perto dos votos
+        poll_ids = set(poll_ids)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] in poll_ids]:
+                del self._entries[key]
+
+    def forget_user(self, user_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+voted_index = VotedIndex(settings.VOTED_INDEX_SIZE, settings.VOTED_INDEX_TTL)
+
+
+def _on_poll_deleted(sender, instance, **kwargs):
+    voted_index.forget_polls([instance.pk])
+
+
+def _on_choice_deleted(sender, instance, **kwargs):
+    voted_index.forget_polls([instance.poll_id])
+
+
+def _on_user_deleted(sender, instance, **kwargs):
+    voted_index.forget_user(instance.pk)
+
+
+# Sinais da enquete, da opção e do usuário (e não do Vote): um receptor no Vote obrigaria o
+# Django a carregar cada voto excluído em cascata, em vez de apagá-los com um único DELETE
+post_delete.connect(_on_poll_deleted, sender=Poll, dispatch_uid='polls.voted_index.poll_deleted')
+post_delete.connect(_on_choice_deleted, sender=Choice, dispatch_uid='polls.voted_index.choice_deleted')
+post_delete.connect(_on_user_deleted, sender=User, dispatch_uid='polls.voted_index.user_deleted')